@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks do Video Transcriber
+- startup: tempo até o menu, tempo até a primeira transcrição e módulos
+  pesados já carregados quando o menu abre
+- stages: tempo de cada etapa do pipeline (extração, carga do modelo,
+  transcrição, speakers, exportadores) com áudio sintético, fator de tempo
+  real e pico de memória; roda offline com modelos falsos
+- compare: modelos x modos de inferência (default/int8) nos mesmos áudios,
+  com velocidade, memória e WER contra transcrições de referência
+"""
+import argparse
+import itertools
+import contextlib
+import importlib.util
+import io
+import json
+import math
+import os
+import re
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from datetime import datetime
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+VIDEO_SCRIPT = SCRIPT_DIR / 'video.py'
+HEAVY_MODULES = ['torch', 'torchaudio', 'whisper', 'pyannote.audio', 'librosa',
+                 'reportlab', 'yt_dlp', 'scipy', 'numpy', 'sounddevice']
+
+# Executado num processo novo: importa o script, monta o transcriber e faz a
+# verificação de dependências (o mesmo que run() faz antes do menu)
+MODULES_AT_MENU_SNIPPET = """
+import contextlib, io, json, sys
+sys.path.insert(0, {script_dir!r})
+with contextlib.redirect_stdout(io.StringIO()):
+    import video
+    app = video.EnhancedVideoTranscriber()
+    app.setup_dependencies()
+print(json.dumps([name for name in {heavy!r} if name in sys.modules]))
+"""
+
+FIRST_TRANSCRIPT_SNIPPET = """
+import contextlib, io, json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {script_dir!r})
+with contextlib.redirect_stdout(io.StringIO()):
+    import video
+    app = video.EnhancedVideoTranscriber()
+    app.use_result_cache = False
+    ready = time.perf_counter()
+    result, language = app.transcribe_audio({audio_path!r})
+done = time.perf_counter()
+print(json.dumps({{'init_seconds': ready - start, 'transcribe_seconds': done - ready,
+                  'ok': result is not None}}))
+"""
+
+
+# Executado num processo por configuração: memória e threads do torch ficam isoladas
+COMPARE_SNIPPET = """
+import contextlib, io, json, sys, time
+sys.path.insert(0, {script_dir!r})
+config = {config!r}
+with contextlib.redirect_stdout(io.StringIO()):
+    import benchmark, video
+    app = video.EnhancedVideoTranscriber()
+    app.use_result_cache = False
+    app.stub_model = config['stub_model']
+    app.model_name = config['model']
+    app.inference_mode = config['mode']
+    app.asr_backend = config['backend']
+    app.torch_threads = config['threads']
+    start = time.perf_counter()
+    app.get_asr_engine()
+    load_seconds = time.perf_counter() - start
+    files = []
+    for path in config['audio']:
+        audio = app.load_audio(path)
+        start = time.perf_counter()
+        data, language = app.transcribe_audio(audio)
+        files.append({{'path': path, 'audio_seconds': len(audio) / video.SAMPLE_RATE,
+                      'seconds': time.perf_counter() - start, 'language': language,
+                      'text': (data or {{}}).get('text', '').strip()}})
+print(json.dumps({{'load_seconds': load_seconds, 'files': files, 'peak_rss_mb': benchmark.peak_rss_mb()}}))
+"""
+
+
+def write_test_tone(path, seconds=5, sample_rate=16000):
+    """Gerar WAV curto com tons variando (sem depender de numpy)"""
+    frames = bytearray()
+    for i in range(int(seconds * sample_rate)):
+        t = i / sample_rate
+        # Envelope em "sílabas" de 250 ms para lembrar fala
+        envelope = 0.5 * (1 - math.cos(2 * math.pi * (t % 0.25) / 0.25))
+        value = envelope * 0.3 * math.sin(2 * math.pi * (180 + 40 * math.sin(2 * math.pi * t)) * t)
+        frames += struct.pack('<h', int(value * 32767))
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(bytes(frames))
+
+
+def write_silence(path, seconds=5, sample_rate=16000):
+    """Gerar WAV silencioso"""
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b'\x00\x00' * int(seconds * sample_rate))
+
+
+AUDIO_GENERATORS = {'speech': write_test_tone, 'silence': write_silence}
+
+
+def time_to_menu(timeout=120):
+    """Tempo (s) entre iniciar `python video.py` e o menu principal aparecer"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(VIDEO_SCRIPT)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, encoding='utf-8', errors='replace', cwd=str(SCRIPT_DIR),
+        env=dict(os.environ, PYTHONIOENCODING='utf-8', PYTHONUNBUFFERED='1')
+    )
+    elapsed = None
+    try:
+        # Respostas já enfileiradas: recusar instalação de dependências (se
+        # perguntado), sair do menu (9) e confirmar o "Pressione Enter para fechar"
+        process.stdin.write("n\n9\n\n")
+        process.stdin.flush()
+        process.stdin.close()
+        for line in process.stdout:
+            if "MENU PRINCIPAL" in line:
+                elapsed = time.perf_counter() - start
+                break
+        process.stdout.read()
+        process.wait(timeout=timeout)
+    except Exception:
+        process.kill()
+    return elapsed
+
+
+def modules_at_menu():
+    """Módulos pesados já importados quando o menu abre"""
+    code = MODULES_AT_MENU_SNIPPET.format(script_dir=str(SCRIPT_DIR), heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=str(SCRIPT_DIR))
+    try:
+        return json.loads(result.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return None
+
+
+def time_to_first_transcript():
+    """Tempo entre iniciar o processo e terminar a primeira transcrição (modelo frio)"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        audio_path = Path(temp_dir) / 'tone.wav'
+        write_test_tone(audio_path)
+        code = FIRST_TRANSCRIPT_SNIPPET.format(script_dir=str(SCRIPT_DIR), audio_path=str(audio_path))
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=str(SCRIPT_DIR))
+        total = time.perf_counter() - start
+    try:
+        data = json.loads(result.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return {'skipped': True, 'reason': (result.stderr.strip().splitlines() or ['sem saída'])[-1]}
+    data['total_seconds'] = total
+    return data
+
+
+def run_startup_benchmark(repeat=3, with_transcript=True):
+    print("⏱️ Medindo tempo até o menu...")
+    menu_times = [t for t in (time_to_menu() for _ in range(repeat)) if t is not None]
+    report = {
+        'benchmark': 'startup',
+        'generated_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'time_to_menu_seconds': {
+            'runs': menu_times,
+            'best': min(menu_times) if menu_times else None,
+            'mean': sum(menu_times) / len(menu_times) if menu_times else None
+        },
+        'heavy_modules_at_menu': modules_at_menu()
+    }
+    if with_transcript:
+        print("⏱️ Medindo tempo até a primeira transcrição...")
+        report['time_to_first_transcript'] = time_to_first_transcript()
+    return report
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo (MB), ou None se indisponível"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except Exception:
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(func, repeat=1, setup=None):
+    """Executar func `repeat` vezes sem a saída do transcriber; fica com a melhor rodada"""
+    best = None
+    result = None
+    for _ in range(max(1, repeat)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            if setup:
+                setup()
+            start, cpu_start = time.perf_counter(), time.process_time()
+            result = func()
+            elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, cpu)
+    return result, best[0], best[1]
+
+
+def stage_record(seconds, cpu_seconds, audio_seconds=None, ok=True, **extra):
+    """Métricas de uma etapa: tempo, RTF (tempo/duração) e throughput (x tempo real)"""
+    record = {'ok': bool(ok), 'seconds': round(seconds, 6), 'cpu_seconds': round(cpu_seconds, 6)}
+    if audio_seconds:
+        record['rtf'] = round(seconds / audio_seconds, 6)
+        record['throughput_x_realtime'] = round(audio_seconds / seconds, 2) if seconds > 0 else None
+    record['peak_rss_mb'] = round(peak_rss_mb() or 0, 1) or None
+    record.update(extra)
+    return record
+
+
+def exporter_calls(app, title, data, language):
+    """Os mesmos exportadores de save_all_formats, chamados um a um"""
+    text = data['text'] if isinstance(data, dict) else data
+    return {
+        'txt': lambda path: app.export_to_txt(title, data, language, path),
+        'json': lambda path: app.export_to_json(data, path),
+        'srt': lambda path: app.export_to_srt(data, path),
+        'vtt': lambda path: app.export_to_vtt(data, path),
+        'jsonl': lambda path: app.export_to_jsonl(data, path),
+        'pdf': lambda path: app.export_to_pdf(title, text, text, language, 'pt', path)
+    }
+
+
+def run_stage_benchmark(lengths=(5, 30, 120), kinds=('speech', 'silence'), repeat=3, model='stub'):
+    """Medir cada etapa do pipeline para cada áudio sintético"""
+    sys.path.insert(0, str(SCRIPT_DIR))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import video
+        app = video.EnhancedVideoTranscriber()
+        ffmpeg_cmd = app.setup_ffmpeg()
+    app.interactive = False
+    app.use_result_cache = False
+    app.parallel_diarization = False
+    app.stub_model = model == 'stub'
+    # Sem ffmpeg/numpy o áudio vai como caminho direto para o modelo (sem decodificar)
+    decoded = bool(ffmpeg_cmd) and importlib.util.find_spec('numpy') is not None
+    if not decoded:
+        app.long_form_min_seconds = 0
+    report = {
+        'benchmark': 'stages',
+        'generated_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'model': model,
+        'ffmpeg': bool(ffmpeg_cmd),
+        'decoded_input': decoded,
+        'repeat': repeat,
+        'stages': {},
+        'audio': {}
+    }
+    print("⏱️ Carga do modelo...")
+    try:
+        _, seconds, cpu = measure(lambda: app.get_asr_engine("base"), repeat, setup=app.release_models)
+        report['stages']['model_load'] = stage_record(seconds, cpu)
+    except Exception as e:
+        report['stages']['model_load'] = {'ok': False, 'skipped': True, 'reason': f"{type(e).__name__}: {e}"}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        for kind in kinds:
+            for length in lengths:
+                name = f"{kind}_{length:g}s"
+                print(f"⏱️ {name}...")
+                audio_path = temp_dir / f"{name}.wav"
+                AUDIO_GENERATORS[kind](audio_path, length)
+                stages = {}
+                report['audio'][name] = {'kind': kind, 'duration_seconds': length,
+                                         'bytes': audio_path.stat().st_size, 'stages': stages}
+                if ffmpeg_cmd:
+                    extracted, seconds, cpu = measure(
+                        lambda: app.extract_audio(str(audio_path), f"bench_{name}", ffmpeg_cmd), repeat)
+                    stages['extract_audio'] = stage_record(seconds, cpu, length, extracted is not None)
+                    if extracted:
+                        Path(extracted).unlink(missing_ok=True)
+                else:
+                    stages['extract_audio'] = {'ok': False, 'skipped': True, 'reason': "ffmpeg não encontrado"}
+                (data, language), seconds, cpu = measure(lambda: app.transcribe_audio(str(audio_path)), repeat)
+                segments = len(data.get('segments', [])) if isinstance(data, dict) else 0
+                # Silêncio sem texto é o resultado esperado, não uma falha
+                stages['transcribe_audio'] = stage_record(seconds, cpu, length, data is not None or kind == 'silence',
+                                                          segments=segments)
+                speakers, seconds, cpu = measure(lambda: app.detect_speakers(str(audio_path)), repeat)
+                stages['detect_speakers'] = stage_record(seconds, cpu, length, speakers is not None,
+                                                         turns=len(speakers or []))
+                if not data:
+                    continue
+                for fmt, export in exporter_calls(app, name, data, language).items():
+                    output = temp_dir / f"{name}{video.EXPORT_FORMATS[fmt]}"
+                    ok, seconds, cpu = measure(lambda: export(str(output)), repeat)
+                    size = output.stat().st_size if output.exists() else 0
+                    stages[f"export_{fmt}"] = stage_record(seconds, cpu, length, ok, bytes=size)
+    return report
+
+
+def flatten_stages(report):
+    """{'model_load': {...}, 'speech_5s/transcribe_audio': {...}, ...}"""
+    flat = dict(report.get('stages', {}))
+    for name, audio in report.get('audio', {}).items():
+        for stage, record in audio.get('stages', {}).items():
+            flat[f"{name}/{stage}"] = record
+    return flat
+
+
+def compare_with_baseline(report, baseline, tolerance=0.25, min_delta=0.005):
+    """Comparar tempos com um relatório salvo; regressão = mais lento que (1 + tolerance)x
+
+    Diferenças absolutas abaixo de min_delta segundos são ignoradas (ruído).
+    """
+    current, previous = flatten_stages(report), flatten_stages(baseline)
+    comparison = {}
+    regressions = []
+    for key, record in current.items():
+        base = previous.get(key)
+        if not record.get('ok') or not base or not base.get('ok') or not base.get('seconds'):
+            continue
+        ratio = record['seconds'] / base['seconds']
+        comparison[key] = {'baseline_seconds': base['seconds'], 'seconds': record['seconds'],
+                           'ratio': round(ratio, 3)}
+        if ratio > 1 + tolerance and record['seconds'] - base['seconds'] > min_delta:
+            regressions.append(key)
+    return {'tolerance': tolerance, 'stages': comparison, 'regressions': regressions}
+
+
+def normalize_words(text):
+    return re.findall(r"\w+(?:'\w+)?", (text or '').lower())
+
+
+def word_error_rate(reference, hypothesis):
+    """WER = (substituições + inserções + remoções) / palavras da referência"""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def run_config(config, timeout=3600):
+    code = COMPARE_SNIPPET.format(script_dir=str(SCRIPT_DIR), config=config)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=str(SCRIPT_DIR), timeout=timeout)
+    try:
+        return json.loads(result.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return {'error': (result.stderr.strip().splitlines() or ['sem saída'])[-1]}
+
+
+def run_compare_benchmark(models, modes, audio_paths=None, threads=None, stub_model=False, backends=('whisper',)):
+    """Mesmos áudios em cada combinação motor x modelo x modo; WER contra <áudio>.txt se existir
+
+    Sem transcrições de referência, a primeira configuração serve de referência
+    (mede quanto as outras divergem dela).
+    """
+    temp_dir = None
+    if not audio_paths:
+        temp_dir = tempfile.TemporaryDirectory()
+        audio_paths = [str(Path(temp_dir.name) / 'speech_30s.wav')]
+        write_test_tone(audio_paths[0], 30)
+        print("⚠️ Sem --audio: usando tom sintético (WER sem significado, só velocidade/memória)")
+    references = {}
+    for path in audio_paths:
+        reference_path = Path(path).with_suffix('.txt')
+        if reference_path.exists():
+            references[path] = reference_path.read_text(encoding='utf-8')
+    configs = []
+    try:
+        for backend, model, mode in itertools.product(backends, models, modes):
+            print(f"⏱️ {backend} / {model} / {mode}...")
+            config = {'backend': backend, 'model': model, 'mode': mode, 'threads': threads,
+                      'stub_model': stub_model, 'audio': list(audio_paths)}
+            result = run_config(config)
+            entry = {'backend': backend, 'model': model, 'mode': mode, 'threads': threads}
+            if 'error' in result:
+                entry['error'] = result['error']
+                configs.append(entry)
+                continue
+            files = result['files']
+            audio_seconds = sum(f['audio_seconds'] for f in files)
+            seconds = sum(f['seconds'] for f in files)
+            entry.update({
+                'load_seconds': round(result['load_seconds'], 3),
+                'transcribe_seconds': round(seconds, 3),
+                'audio_seconds': round(audio_seconds, 3),
+                'rtf': round(seconds / audio_seconds, 4) if audio_seconds else None,
+                'peak_rss_mb': round(result['peak_rss_mb'], 1) if result.get('peak_rss_mb') else None,
+                'files': files
+            })
+            configs.append(entry)
+    finally:
+        if temp_dir:
+            temp_dir.cleanup()
+    baseline = next((c for c in configs if 'files' in c), None)
+    for config in configs:
+        if 'files' not in config:
+            continue
+        rates = []
+        for index, f in enumerate(config['files']):
+            reference = references.get(f['path'])
+            if reference is None and baseline:
+                reference = baseline['files'][index]['text']
+            f['wer'] = round(word_error_rate(reference, f['text']), 4)
+            rates.append(f['wer'])
+        config['wer'] = round(sum(rates) / len(rates), 4) if rates else None
+    return {
+        'benchmark': 'compare',
+        'generated_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'reference': 'transcripts' if references else (
+            f"config:{baseline['backend']}/{baseline['model']}/{baseline['mode']}" if baseline else None),
+        'configs': configs
+    }
+
+
+def write_report(report, output):
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if output:
+        Path(output).write_text(text, encoding='utf-8')
+        print(f"📄 Relatório: {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do Video Transcriber")
+    subparsers = parser.add_subparsers(dest='command')
+    startup = subparsers.add_parser('startup', help="Tempo até o menu e até a primeira transcrição")
+    startup.add_argument('--repeat', type=int, default=3)
+    startup.add_argument('--no-transcript', action='store_true', help="Não medir a primeira transcrição")
+    startup.add_argument('--output', default=None, help="Salvar o relatório JSON neste caminho")
+    stages = subparsers.add_parser('stages', help="Tempo, RTF e memória de cada etapa do pipeline")
+    stages.add_argument('--lengths', default='5,30,120', help="Durações dos áudios sintéticos (s)")
+    stages.add_argument('--kinds', default='speech,silence', help=f"Tipos de áudio ({', '.join(AUDIO_GENERATORS)})")
+    stages.add_argument('--repeat', type=int, default=3, help="Rodadas por etapa (fica a melhor)")
+    stages.add_argument('--model', choices=['stub', 'whisper'], default='stub',
+                        help="stub: modelos falsos, offline (padrão); whisper: modelos reais")
+    stages.add_argument('--output', default=None, help="Salvar o relatório JSON neste caminho")
+    stages.add_argument('--baseline', default=None, help="Relatório anterior para comparação")
+    stages.add_argument('--tolerance', type=float, default=0.25,
+                        help="Lentidão aceita em relação ao baseline (0.25 = 25%%)")
+    compare = subparsers.add_parser('compare', help="Velocidade, memória e WER por modelo e modo de inferência")
+    compare.add_argument('--models', default='tiny,base', help="Modelos Whisper separados por vírgula")
+    compare.add_argument('--backends', default='whisper', help="Motores separados por vírgula (whisper, faster-whisper)")
+    compare.add_argument('--modes', default='default,int8', help="Modos de inferência (default, int8)")
+    compare.add_argument('--audio', nargs='*', default=None,
+                         help="Áudios de teste (referência opcional em <áudio>.txt)")
+    compare.add_argument('--threads', type=int, default=None, help="Threads intra-op do torch")
+    compare.add_argument('--stub-model', action='store_true', help="Modelo falso (testar o harness offline)")
+    compare.add_argument('--output', default=None, help="Salvar o relatório JSON neste caminho")
+    args = parser.parse_args()
+    if args.command == 'compare':
+        report = run_compare_benchmark([m.strip() for m in args.models.split(',') if m.strip()],
+                                       [m.strip() for m in args.modes.split(',') if m.strip()],
+                                       args.audio, args.threads, args.stub_model,
+                                       [b.strip() for b in args.backends.split(',') if b.strip()])
+        write_report(report, args.output)
+        print(f"\n{'motor':<15} {'modelo':<10} {'modo':<8} {'carga(s)':>9} {'RTF':>8} {'WER':>7} {'RSS(MB)':>8}")
+        for c in report['configs']:
+            if 'error' in c:
+                print(f"{c['backend']:<15} {c['model']:<10} {c['mode']:<8} ❌ {c['error']}")
+            else:
+                print(f"{c['backend']:<15} {c['model']:<10} {c['mode']:<8} {c['load_seconds']:>9.2f} {c['rtf']:>8.3f} "
+                      f"{c['wer']:>7.3f} {c['peak_rss_mb'] or 0:>8.0f}")
+    elif args.command == 'startup':
+        write_report(run_startup_benchmark(args.repeat, not args.no_transcript), args.output)
+    elif args.command == 'stages':
+        lengths = [float(value) for value in args.lengths.split(',') if value.strip()]
+        kinds = [kind.strip() for kind in args.kinds.split(',') if kind.strip() in AUDIO_GENERATORS]
+        report = run_stage_benchmark(lengths, kinds, args.repeat, args.model)
+        if args.baseline:
+            baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+            report['baseline'] = compare_with_baseline(report, baseline, args.tolerance)
+        write_report(report, args.output)
+        if report.get('baseline', {}).get('regressions'):
+            print(f"❌ Regressões: {', '.join(report['baseline']['regressions'])}")
+            sys.exit(1)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Fixtures compartilhadas dos testes do Video Transcriber"""
+import contextlib
+import io
+import sys
+import wave
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import video  # noqa: E402
+
+
+def write_tone(path, seconds, rate=video.SAMPLE_RATE, channels=1, frequency=440.0, amplitude=0.3):
+    """WAV PCM 16 bits com um tom senoidal (mesmo sinal em todos os canais)"""
+    import numpy as np
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (np.sin(2 * np.pi * frequency * t) * amplitude * 32767).astype('<i2')
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.repeat(samples, channels).tobytes())
+    return path
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Pastas de trabalho (downloads, cache, transcrições...) criadas em tmp_path"""
+    monkeypatch.setattr(video, '__file__', str(tmp_path / 'video.py'))
+    return tmp_path
+
+
+@pytest.fixture
+def transcriber(workdir):
+    """Transcriber sem interação e com modelos falsos"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = video.EnhancedVideoTranscriber()
+    app.interactive = False
+    app.stub_model = True
+    yield app
+    app.release_models()
+
+
+@pytest.fixture
+def random_whisper():
+    """Whisper minúsculo com pesos aleatórios (não precisa baixar modelo)"""
+    pytest.importorskip('whisper')
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+    torch.manual_seed(0)
+    dims = ModelDimensions(n_mels=80, n_audio_ctx=1500, n_audio_state=64, n_audio_head=2, n_audio_layer=1,
+                           n_vocab=51865, n_text_ctx=448, n_text_state=64, n_text_head=2, n_text_layer=1)
+    return Whisper(dims).eval()
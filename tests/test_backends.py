@@ -0,0 +1,89 @@
+"""Motores ASR: o mesmo esquema de resultado (text, segments, language) em todos"""
+from types import SimpleNamespace
+
+import pytest
+
+import video
+from conftest import write_tone
+
+
+@pytest.fixture
+def tone(workdir):
+    source = video.WavAudioSource.open(write_tone(workdir / 'tone.wav', 12))
+    return source[0:len(source)]
+
+
+def check_result(result, segments):
+    assert isinstance(result['text'], str)
+    assert isinstance(result['language'], str)
+    assert result['segments'] == segments
+    for segment in result['segments']:
+        assert {'id', 'start', 'end', 'text'} <= set(segment)
+        assert 0 <= segment['start'] <= segment['end']
+
+
+def test_stub_backend(tone):
+    engine = video.StubWhisperModel.load('tiny')
+    assert engine.model_name == 'tiny'
+    streamed = []
+    result = engine.transcribe(tone, on_segment=streamed.append)
+    check_result(result, streamed)
+    assert result['text'] == "Segmento 1. Segmento 2. Segmento 3."
+    assert result['language'] == 'pt'
+
+
+def test_whisper_backend_with_random_tiny_model(monkeypatch, random_whisper, tone):
+    import whisper
+    loaded = []
+    monkeypatch.setattr(whisper, 'load_model',
+                        lambda name, device=None: loaded.append((name, device)) or random_whisper)
+    engine = video.WhisperBackend.load('tiny', device='cpu')
+    assert loaded == [('tiny', 'cpu')]
+    streamed = []
+    # Só temperatura 0: o modelo aleatório não passa pelo fallback
+    result = engine.transcribe(tone, on_segment=streamed.append, temperature=0.0,
+                               condition_on_previous_text=False, fp16=False, verbose=None)
+    check_result(result, streamed)
+
+
+class FakeFasterWhisperModel:
+    """Mesma interface de faster_whisper.WhisperModel.transcribe"""
+
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self.kwargs = kwargs
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        self.calls.append(options)
+        word = SimpleNamespace(word=' olá', start=0.5, end=1.0, probability=0.9)
+        segments = (SimpleNamespace(seek=0, start=start, end=start + 2.0, text=f" Frase {i}.", tokens=(1, 2),
+                                    temperature=0.0, avg_logprob=-0.2, compression_ratio=1.1,
+                                    no_speech_prob=0.01, words=[word] if i == 1 else None)
+                    for i, start in enumerate((0.0, 4.0), 1))
+        return segments, SimpleNamespace(language='pt')
+
+
+def test_faster_whisper_backend_with_fake_model(monkeypatch, workdir, tone):
+    faster_whisper = pytest.importorskip('faster_whisper')
+    import faster_whisper.utils
+    model_dir = workdir / 'faster-whisper-tiny'
+    model_dir.mkdir()
+    (model_dir / 'model.bin').write_bytes(b'\0' * 2 * 1024 * 1024)
+    monkeypatch.setattr(faster_whisper.utils, 'download_model', lambda name: str(model_dir))
+    monkeypatch.setattr(faster_whisper, 'WhisperModel', FakeFasterWhisperModel)
+
+    engine = video.FasterWhisperBackend.load('tiny', device='cpu', threads=2)
+    assert engine.model.path == str(model_dir)
+    assert engine.model.kwargs == {'device': 'cpu', 'compute_type': 'int8', 'cpu_threads': 2}
+    # model.bin em float16 carregado em int8: metade do arquivo
+    assert engine.size_mb() == pytest.approx(1.0)
+
+    streamed = []
+    result = engine.transcribe(tone, on_segment=streamed.append, language='pt', logprob_threshold=-1.0,
+                               verbose=None, fp16=False)
+    check_result(result, streamed)
+    assert engine.model.calls == [{'language': 'pt', 'log_prob_threshold': -1.0}]
+    assert result['text'] == " Frase 1. Frase 2."
+    assert result['segments'][0]['words'] == [{'word': ' olá', 'start': 0.5, 'end': 1.0, 'probability': 0.9}]
+    assert 'words' not in result['segments'][1]
@@ -0,0 +1,71 @@
+"""Modo batch em processos: modelo falso e orçamento de threads chegam aos workers"""
+import contextlib
+import io
+import json
+import os
+
+import video
+from conftest import write_tone
+
+
+def test_process_workers_get_stub_model_and_thread_budget(monkeypatch, transcriber, workdir):
+    pools = []
+    real_pool = video.ProcessPoolExecutor
+
+    def spy_pool(*args, **kwargs):
+        pools.append(kwargs)
+        return real_pool(*args, **kwargs)
+
+    monkeypatch.setattr(video, 'ProcessPoolExecutor', spy_pool)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 8)
+    sources = [str(write_tone(workdir / f"talk_{index}.wav", 6)) for index in range(2)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = transcriber.run_batch(sources, workers=2, use_cache=False, formats=['json'])
+    assert [result['status'] for result in results] == ['ok', 'ok'], results
+    assert pools[0]['initargs'] == (4, None, str(workdir))
+    for result in results:
+        with open(result['files']['json'], encoding='utf-8') as f:
+            assert json.load(f)['metadata']['asr_backend'] == 'stub'
+        # Os processos usam as pastas do processo principal
+        assert os.path.dirname(result['files']['json']) == str(transcriber.folders['transcripts'])
+
+
+def test_sources_expand_from_manifests_folders_and_globs(transcriber, workdir):
+    media = workdir / 'media'
+    media.mkdir()
+    for name in ('a.wav', 'b.mp3', 'notes.txt'):
+        (media / name).write_bytes(b'')
+    (workdir / 'fila.txt').write_text("# comentário\nmedia/a.wav\nhttps://example.com/v\n", encoding='utf-8')
+    (workdir / 'fila.jsonl').write_text('{"source": "media/b.mp3", "model": "tiny"}\n{"title": "sem fonte"}\n',
+                                        encoding='utf-8')
+    with contextlib.redirect_stdout(io.StringIO()):
+        jobs = transcriber.collect_batch_sources([
+            str(workdir / 'fila.txt'), str(workdir / 'fila.jsonl'), str(media), str(media / '*.mp3'),
+            str(workdir / 'nada_*.wav')
+        ])
+    assert jobs == [
+        {'source': str(media / 'a.wav')},
+        {'source': 'https://example.com/v'},
+        {'source': str(media / 'b.mp3'), 'model': 'tiny'},
+        {'source': str(media / 'a.wav')},
+        {'source': str(media / 'b.mp3')},
+        {'source': str(media / 'b.mp3')},
+    ]
+
+
+def test_failed_jobs_are_reported_with_their_log(transcriber, workdir):
+    good = str(write_tone(workdir / 'good.wav', 6))
+    missing = str(workdir / 'missing.wav')
+    (workdir / 'fila.jsonl').write_text(
+        json.dumps({'source': good}) + '\n' + json.dumps({'source': missing}) + '\n', encoding='utf-8')
+    report = workdir / 'report.json'
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = transcriber.run_batch([str(workdir / 'fila.jsonl')], workers=2, report_path=report,
+                                        use_cache=False, formats=['json'])
+    assert [(result['index'], result['status']) for result in results] == [(1, 'ok'), (2, 'error')]
+    failed = results[1]
+    assert failed['source'] == missing and failed['error'] and not failed['files']
+    assert os.path.exists(failed['log'])
+    with open(report, encoding='utf-8') as f:
+        summary = json.load(f)
+    assert (summary['total'], summary['succeeded'], summary['failed']) == (2, 1, 1)
@@ -0,0 +1,77 @@
+"""Decodificação em lote: mesmo resultado por janela que decodificar uma a uma"""
+import numpy as np
+import pytest
+
+import video
+from conftest import write_tone
+
+
+@pytest.fixture
+def decoder():
+    # Sem fallback de temperatura: o modelo aleatório decodifica tudo em temperatura 0
+    decoder = video.BatchedDecoder(batch_size=4, max_wait=0.5, compression_ratio_threshold=float('inf'),
+                                   logprob_threshold=float('-inf'))
+    yield decoder
+    decoder.close()
+
+
+@pytest.fixture
+def audio(workdir):
+    low = video.WavAudioSource.open(write_tone(workdir / 'low.wav', 20, frequency=220.0))
+    high = video.WavAudioSource.open(write_tone(workdir / 'high.wav', 20, frequency=880.0))
+    return np.concatenate([low[0:len(low)], high[0:len(high)]])
+
+
+def test_batched_windows_match_unbatched(decoder, random_whisper, audio):
+    bounds = [(0, 10 * video.SAMPLE_RATE), (10 * video.SAMPLE_RATE, 25 * video.SAMPLE_RATE),
+              (25 * video.SAMPLE_RATE, len(audio))]
+    batched = [future.result(timeout=120) for future in decoder.submit(random_whisper, audio, bounds)]
+    assert decoder.batches == 1 and decoder.windows == 3
+
+    single = video.BatchedDecoder(batch_size=1, compression_ratio_threshold=float('inf'),
+                                  logprob_threshold=float('-inf'))
+    try:
+        unbatched = [future.result(timeout=120) for bound in bounds
+                     for future in single.submit(random_whisper, audio, [bound])]
+    finally:
+        single.close()
+    assert single.batches == 3
+    assert [result['language'] for result in batched] == [result['language'] for result in unbatched]
+    assert [result['text'] for result in batched] == [result['text'] for result in unbatched]
+
+
+def test_windows_are_grouped_by_language(decoder, random_whisper, audio):
+    bounds = [(0, 10 * video.SAMPLE_RATE), (10 * video.SAMPLE_RATE, 20 * video.SAMPLE_RATE)]
+    futures = decoder.submit(random_whisper, audio, bounds, language='pt')
+    futures += decoder.submit(random_whisper, audio, bounds, language='en')
+    results = [future.result(timeout=120) for future in futures]
+    assert [result['language'] for result in results] == ['pt', 'pt', 'en', 'en']
+    assert decoder.batches == 2
+
+
+def test_close_fails_pending_windows(monkeypatch, random_whisper, audio):
+    import threading
+    import time
+    decoder = video.BatchedDecoder(batch_size=1)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_decode(model, batch):
+        started.set()
+        release.wait(10)
+        return [{'text': '', 'segments': [], 'language': 'pt'} for _ in batch]
+
+    monkeypatch.setattr(decoder, 'decode', slow_decode)
+    first, second = decoder.submit(random_whisper, audio, [(0, video.SAMPLE_RATE), (0, 2 * video.SAMPLE_RATE)])
+    assert started.wait(10)
+    closing = threading.Thread(target=decoder.close)
+    closing.start()
+    while not decoder._closed:
+        time.sleep(0.01)
+    release.set()
+    closing.join(10)
+    # A janela em decodificação termina; a que ficou na fila falha
+    assert first.result(timeout=10)['language'] == 'pt'
+    with pytest.raises(RuntimeError):
+        second.result(timeout=10)
+    with pytest.raises(RuntimeError):
+        decoder.submit(random_whisper, audio, [(0, video.SAMPLE_RATE)])
@@ -0,0 +1,94 @@
+"""Checkpoints do modo longo: o áudio do job é registrado só quando há o que retomar"""
+import contextlib
+import io
+
+import pytest
+
+import video
+from conftest import write_tone
+
+
+@pytest.fixture
+def long_form(transcriber):
+    transcriber.chunk_seconds = 30
+    transcriber.chunk_overlap_seconds = 0
+    transcriber.chunk_workers = 1
+    return transcriber
+
+
+def interrupt_after_first_chunk(monkeypatch, transcriber):
+    """Fazer o segundo trecho falhar, como uma execução interrompida"""
+    model = transcriber.get_asr_engine(transcriber.model_name)
+    transcribe = model.transcribe
+    calls = []
+
+    def flaky(audio, **options):
+        calls.append(len(audio))
+        if len(calls) == 2:
+            raise RuntimeError('interrompido')
+        return transcribe(audio, **options)
+
+    monkeypatch.setattr(model, 'transcribe', flaky)
+
+
+def run(transcriber, audio):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return transcriber.transcribe_long_audio(audio)
+
+
+def test_wav_source_is_referenced_not_copied(monkeypatch, long_form, workdir):
+    source = video.WavAudioSource.open(write_tone(workdir / 'long.wav', 75))
+    interrupt_after_first_chunk(monkeypatch, long_form)
+    with pytest.raises(RuntimeError):
+        run(long_form, source)
+    (checkpoint, manifest), = long_form.pending_checkpoints()
+    assert checkpoint.source_path() == source.path.resolve()
+    assert not checkpoint.audio_path.exists()
+    assert len(checkpoint.completed(len(manifest['chunks']))) == 1
+
+    monkeypatch.undo()
+    monkeypatch.setattr(video, '__file__', str(workdir / 'video.py'))
+    result = run(long_form, video.WavAudioSource.open(checkpoint.source_path()))
+    assert result['segments']
+    assert not long_form.pending_checkpoints()
+
+
+def test_in_memory_audio_is_written_once_a_chunk_is_done(monkeypatch, long_form, workdir):
+    source = video.WavAudioSource.open(write_tone(workdir / 'long.wav', 75))
+    audio = source[0:len(source)]
+    interrupt_after_first_chunk(monkeypatch, long_form)
+    with pytest.raises(RuntimeError):
+        run(long_form, audio)
+    (checkpoint, _), = long_form.pending_checkpoints()
+    assert checkpoint.source_path() == checkpoint.audio_path
+    assert len(video.WavAudioSource.open(checkpoint.audio_path)) == len(audio)
+
+
+def test_finished_job_leaves_no_audio_behind(long_form, workdir):
+    source = video.WavAudioSource.open(write_tone(workdir / 'long.wav', 75))
+    run(long_form, source[0:len(source)])
+    assert not list(long_form.folders['checkpoints'].glob('*/audio.wav'))
+
+
+def test_vad_job_checkpoints_original_audio_and_resumes_with_original_times(monkeypatch, long_form, workdir):
+    import numpy as np
+    tone = video.WavAudioSource.open(write_tone(workdir / 'tone.wav', 40))
+    speech = tone[0:len(tone)]
+    audio = np.concatenate([speech, np.zeros(40 * video.SAMPLE_RATE, dtype=np.float32), speech])
+    path = video.write_wav(workdir / 'gaps.wav', audio)
+    long_form.vad_filter = True
+    long_form.long_form_min_seconds = 60
+    interrupt_after_first_chunk(monkeypatch, long_form)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert long_form.transcribe_audio(path) == (None, None)
+    (checkpoint, _), = long_form.pending_checkpoints()
+    assert checkpoint.source_path() == path.resolve()
+
+    monkeypatch.undo()
+    monkeypatch.setattr(video, '__file__', str(workdir / 'video.py'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        result, _ = long_form.transcribe_audio(str(checkpoint.source_path()))
+    assert not long_form.pending_checkpoints()
+    # Nada cai no silêncio removido: os tempos voltaram para a linha do tempo original
+    assert result['segments'][-1]['end'] > 110
+    assert not any(45 < segment['start'] < 75 for segment in result['segments'])
@@ -0,0 +1,18 @@
+"""Pool de processos do modo longo: orçamento de threads do torch por worker"""
+import os
+
+import pytest
+
+torch = pytest.importorskip('torch')
+
+
+def test_chunk_workers_split_the_cores(monkeypatch, transcriber):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 8)
+    executor = transcriber._get_chunk_executor(2)
+    assert executor.submit(torch.get_num_threads).result(timeout=120) == 4
+
+
+def test_chunk_workers_use_configured_threads(transcriber):
+    transcriber.torch_threads = 3
+    executor = transcriber._get_chunk_executor(2)
+    assert executor.submit(torch.get_num_threads).result(timeout=120) == 3
@@ -0,0 +1,68 @@
+"""Pipeline de diarização residente: construído uma vez, liberado sob demanda"""
+import contextlib
+import io
+import sys
+from types import ModuleType
+
+import pytest
+
+import video
+from conftest import write_tone
+
+
+class FakePipeline:
+    """Mesma interface usada do pyannote.audio.Pipeline"""
+
+    loads = 0
+
+    @classmethod
+    def from_pretrained(cls, name):
+        cls.loads += 1
+        return cls()
+
+    def to(self, device):
+        self.device = device
+        return self
+
+    def __call__(self, audio):
+        return video.StubDiarizationPipeline()(audio)
+
+
+@pytest.fixture
+def pyannote(monkeypatch):
+    pytest.importorskip('torch')
+    package, module = ModuleType('pyannote'), ModuleType('pyannote.audio')
+    module.Pipeline = FakePipeline
+    package.audio = module
+    monkeypatch.setitem(sys.modules, 'pyannote', package)
+    monkeypatch.setitem(sys.modules, 'pyannote.audio', module)
+    FakePipeline.loads = 0
+    return FakePipeline
+
+
+def test_pipeline_is_built_once_and_rebuilt_after_release(pyannote, transcriber, workdir):
+    transcriber.stub_model = False
+    audio = str(write_tone(workdir / 'talk.wav', 20))
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = transcriber.detect_speakers(audio)
+        second = transcriber.detect_speakers(audio)
+    assert first == second and {turn['speaker'] for turn in first} == {'SPEAKER_00', 'SPEAKER_01'}
+    assert pyannote.loads == 1
+    assert transcriber.get_diarization_pipeline('pyannote/speaker-diarization-3.1', 'cpu') is \
+        transcriber.get_diarization_pipeline('pyannote/speaker-diarization-3.1', 'cpu')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert transcriber.release_diarization_pipelines() >= 1
+        transcriber.detect_speakers(audio)
+    assert pyannote.loads == 2
+
+
+def test_pipelines_are_keyed_by_name_and_device(pyannote, transcriber):
+    transcriber.stub_model = False
+    with contextlib.redirect_stdout(io.StringIO()):
+        cpu = transcriber.get_diarization_pipeline('pyannote/a', 'cpu')
+        other = transcriber.get_diarization_pipeline('pyannote/b', 'cpu')
+        meta = transcriber.get_diarization_pipeline('pyannote/a', 'meta')
+    assert len({id(cpu), id(other), id(meta)}) == 3
+    assert meta.device.type == 'meta'
+    assert pyannote.loads == 3
@@ -0,0 +1,38 @@
+"""Índice de downloads compartilhado por várias instâncias (threads do serviço / processos do batch)"""
+import threading
+
+import video
+
+
+def test_concurrent_instances_keep_every_entry(tmp_path):
+    index_path = tmp_path / 'download_index.json'
+    files = []
+    for index in range(16):
+        path = tmp_path / f'file{index}.bin'
+        path.write_bytes(b'x' * (index + 1))
+        files.append(path)
+    indexes = [video.DownloadIndex(index_path) for _ in range(4)]
+
+    def record(worker):
+        for path in files[worker::4]:
+            indexes[worker].record(f"Test:{path.stem}", path)
+
+    threads = [threading.Thread(target=record, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    fresh = video.DownloadIndex(index_path)
+    assert sorted(fresh.entries) == sorted(f"Test:{path.stem}" for path in files)
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_lookup_drops_entry_when_file_changes_size(tmp_path):
+    index = video.DownloadIndex(tmp_path / 'download_index.json')
+    path = tmp_path / 'media.bin'
+    path.write_bytes(b'abc')
+    index.record('Test:media', path, title='media')
+    assert index.lookup('Test:media')['title'] == 'media'
+    path.write_bytes(b'abcdef')
+    assert index.lookup('Test:media') is None
+    assert 'Test:media' not in video.DownloadIndex(tmp_path / 'download_index.json').entries
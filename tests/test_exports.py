@@ -0,0 +1,70 @@
+"""Exportação: só os formatos escolhidos, PDF lento em segundo plano"""
+import contextlib
+import io
+import json
+import threading
+
+import pytest
+
+import video
+
+
+@pytest.fixture
+def transcription():
+    segments = [{'id': 0, 'start': 0.0, 'end': 2.0, 'text': ' Olá.'},
+                {'id': 1, 'start': 2.0, 'end': 4.5, 'text': ' Tudo bem?'}]
+    return {'text': 'Olá. Tudo bem?', 'segments': segments, 'language': 'pt'}
+
+
+def save(transcriber, transcription, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return transcriber.save_all_formats('Conversa', transcription, transcription['text'], 'pt', 'pt', **kwargs)
+
+
+def test_only_selected_formats_are_written(transcriber, transcription):
+    saved = save(transcriber, transcription, formats=['json', 'vtt', 'desconhecido'])
+    assert set(saved) == {'json', 'vtt'}
+    base = transcriber.output_base_path('Conversa')
+    written = sorted(p.name for p in transcriber.folders['transcripts'].iterdir())
+    assert written == sorted(f"{base.name}{video.EXPORT_FORMATS[fmt]}" for fmt in ('json', 'vtt'))
+    with open(saved['json'], encoding='utf-8') as f:
+        assert json.load(f)['transcription']['text'] == transcription['text']
+    with open(saved['vtt'], encoding='utf-8') as f:
+        assert f.read().startswith('WEBVTT')
+
+
+def test_slow_format_finishes_in_background(monkeypatch, transcriber, transcription):
+    release = threading.Event()
+
+    def slow_pdf(title, original, translated, source_lang, target_lang, path):
+        release.wait(10)
+        with open(path, 'wb') as f:
+            f.write(b'%PDF')
+        return True
+
+    monkeypatch.setattr(transcriber, 'export_to_pdf', slow_pdf)
+    saved = save(transcriber, transcription, formats=['txt', 'pdf'], background_slow=True)
+    # O TXT é reportado sem esperar o PDF
+    assert set(saved) == {'txt'}
+    assert [fmt for fmt, _, _ in transcriber.pending_exports] == ['pdf']
+    release.set()
+    with contextlib.redirect_stdout(io.StringIO()):
+        finished = transcriber.wait_for_pending_exports()
+    assert list(finished) == ['pdf'] and not transcriber.pending_exports
+
+
+def test_pdf_alone_is_not_deferred(monkeypatch, transcriber, transcription):
+    monkeypatch.setattr(transcriber, 'export_to_pdf', lambda *args: True)
+    assert set(save(transcriber, transcription, formats=['pdf'], background_slow=True)) == {'pdf'}
+    assert not transcriber.pending_exports
+
+
+def test_real_pdf_in_background(transcriber, transcription):
+    pytest.importorskip('reportlab')
+    save(transcriber, transcription, formats=['txt', 'pdf'], background_slow=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        saved = save(transcriber, transcription, formats=['pdf'])
+        finished = transcriber.wait_for_pending_exports()
+    for path in [saved['pdf'], *finished.values()]:
+        with open(path, 'rb') as f:
+            assert f.read(4) == b'%PDF'
@@ -0,0 +1,101 @@
+"""FFmpeg resolvido uma vez por processo, capacidades sondadas uma vez por binário"""
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+import video
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="ffmpeg falso é um script sh")
+
+FAKE_FFMPEG = """#!/bin/sh
+echo "$@" >> "{log}"
+case "$2" in
+  -version) echo "ffmpeg version 9.9-teste Copyright (c) the FFmpeg developers" ;;
+  -decoders) cat <<'EOF'
+Decoders:
+ V..... = Video
+ A..... = Audio
+ ------
+ A....D aac                  AAC (Advanced Audio Coding)
+ V....D h264                 H.264 / AVC
+ S..... srt                  SubRip subtitle
+EOF
+  ;;
+  -filters) cat <<'EOF'
+Filters:
+ ... aresample         A->A       Resample audio data.
+ T.C loudnorm          A->A       EBU R128 loudness normalization
+ ... scale_cuda        V->V       GPU accelerated video resizer
+ ... hwupload_vaapi    V->V       Upload a system memory frame to a VAAPI device.
+EOF
+  ;;
+esac
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch, transcriber):
+    """ffmpeg falso na pasta tools; as chamadas ficam em ffmpeg_calls.log"""
+    tools = transcriber.folders['tools']
+    log = tools / 'ffmpeg_calls.log'
+    ffmpeg = tools / 'ffmpeg'
+    ffmpeg.write_text(FAKE_FFMPEG.format(log=log), encoding='utf-8')
+    ffmpeg.chmod(0o755)
+    monkeypatch.setattr(video, '_ffmpeg_info', None)
+    monkeypatch.setattr(video, '_ffmpeg_resolved', False)
+    monkeypatch.setenv('PATH', os.environ.get('PATH', ''))
+    return ffmpeg, log
+
+
+def calls(log):
+    return log.read_text(encoding='utf-8').splitlines() if log.exists() else []
+
+
+def resolve(transcriber):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return transcriber.resolve_ffmpeg()
+
+
+def test_resolved_once_per_process(transcriber, fake_ffmpeg):
+    ffmpeg, log = fake_ffmpeg
+    info = resolve(transcriber)
+    assert info['ffmpeg'] == str(ffmpeg)
+    assert info['version'].startswith('ffmpeg version 9.9-teste')
+    assert calls(log) == ['-hide_banner -version', '-hide_banner -decoders', '-hide_banner -filters']
+    assert resolve(transcriber) is info
+    assert transcriber.ffmpeg_command() == str(ffmpeg)
+    assert len(calls(log)) == 3
+
+
+def test_capabilities_exclude_hardware_filters(transcriber, fake_ffmpeg):
+    info = resolve(transcriber)
+    assert info['decoders'] == {'audio': ['aac'], 'video': ['h264']}
+    assert info['filters'] == ['aresample', 'loudnorm']
+
+
+def test_capability_cache_survives_a_new_process(monkeypatch, transcriber, fake_ffmpeg):
+    ffmpeg, log = fake_ffmpeg
+    first = resolve(transcriber)
+    # Novo processo: estado global zerado, mas o cache em disco continua valendo
+    monkeypatch.setattr(video, '_ffmpeg_info', None)
+    monkeypatch.setattr(video, '_ffmpeg_resolved', False)
+    second = resolve(transcriber)
+    assert second == first and second is not first
+    assert len(calls(log)) == 3
+
+    # Trocar o binário (outro tamanho) invalida a entrada
+    ffmpeg.write_text(ffmpeg.read_text(encoding='utf-8') + "\n", encoding='utf-8')
+    monkeypatch.setattr(video, '_ffmpeg_resolved', False)
+    resolve(transcriber)
+    assert len(calls(log)) == 6
+
+
+def test_tools_folder_added_to_path_once(monkeypatch, transcriber, fake_ffmpeg):
+    tools = str(transcriber.folders['tools'])
+    resolve(transcriber)
+    monkeypatch.setattr(video, '_ffmpeg_resolved', False)
+    resolve(transcriber)
+    assert os.environ['PATH'].split(os.pathsep).count(tools) == 1
@@ -0,0 +1,31 @@
+"""Gravação ao vivo: uma falha na captura não deixa a transcrição rodando"""
+import contextlib
+import io
+import sys
+import threading
+from types import SimpleNamespace
+
+import video
+
+
+class BrokenInputStream:
+    """InputStream do sounddevice que falha ao abrir (ex.: microfone ocupado)"""
+
+    def __init__(self, callback, **kwargs):
+        self.callback = callback
+
+    def __enter__(self):
+        raise OSError("dispositivo de entrada indisponível")
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_capture_error_stops_the_streaming_thread(monkeypatch, transcriber):
+    monkeypatch.setitem(sys.modules, 'sounddevice', SimpleNamespace(InputStream=BrokenInputStream))
+    before = set(threading.enumerate())
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        result = transcriber.record_and_transcribe_live('ao vivo', step_seconds=0.05)
+    assert result[:2] == (None, None)
+    assert "dispositivo de entrada indisponível" in output.getvalue()
+    assert [thread for thread in threading.enumerate() if thread not in before and thread.is_alive()] == []
@@ -0,0 +1,97 @@
+"""Cache de resultados: chave pelo conteúdo do áudio + opções, expiração por idade e tamanho"""
+import contextlib
+import io
+import os
+import time
+
+import pytest
+
+import video
+from conftest import write_tone
+
+
+@pytest.fixture
+def tone(workdir):
+    return video.WavAudioSource.open(write_tone(workdir / 'tone.wav', 5))
+
+
+def test_key_depends_on_pcm_not_on_container(tone):
+    in_memory = tone[0:len(tone)]
+    assert video.TranscriptionCache.make_key(tone, 'base') == video.TranscriptionCache.make_key(in_memory, 'base')
+    louder = in_memory * 2
+    assert video.TranscriptionCache.make_key(louder, 'base') != video.TranscriptionCache.make_key(in_memory, 'base')
+
+
+def test_key_changes_with_model_options_and_diarization(tone):
+    audio = tone[0:len(tone)]
+    keys = {
+        video.TranscriptionCache.make_key(audio, 'base', {'task': 'transcribe'}),
+        video.TranscriptionCache.make_key(audio, 'small', {'task': 'transcribe'}),
+        video.TranscriptionCache.make_key(audio, 'base', {'task': 'transcribe', 'vad': True}),
+        video.TranscriptionCache.make_key(audio, 'base', {'task': 'transcribe'}, diarization=True),
+    }
+    assert len(keys) == 4
+    # A ordem das opções não muda a chave
+    assert video.TranscriptionCache.make_key(audio, 'base', {'a': 1, 'b': 2}) == \
+        video.TranscriptionCache.make_key(audio, 'base', {'b': 2, 'a': 1})
+
+
+def test_put_get_and_age_eviction(workdir):
+    cache = video.TranscriptionCache(workdir / 'cache', max_size_mb=0, max_age_days=1)
+    path = cache.put('recente', {'text': 'olá'}, 'pt', speakers=['A'])
+    entry = cache.get('recente')
+    assert (entry['transcription'], entry['language'], entry['speakers']) == ({'text': 'olá'}, 'pt', ['A'])
+    assert cache.get('inexistente') is None
+
+    old = cache.put('antiga', {'text': 'velha'}, 'pt')
+    two_days_ago = time.time() - 2 * 86400
+    os.utime(old, (two_days_ago, two_days_ago))
+    assert cache.evict() == 1
+    assert cache.get('antiga') is None
+    assert path.exists()
+
+
+def test_size_eviction_drops_least_recently_used(workdir):
+    cache = video.TranscriptionCache(workdir / 'cache', max_size_mb=1, max_age_days=0)
+    text = 'x' * (400 * 1024)
+    paths = [cache.put(key, {'text': text}, 'pt') for key in ('a', 'b')]
+    now = time.time()
+    for age, path in zip((30, 20), paths):
+        os.utime(path, (now - age, now - age))
+    # Ler 'a' o torna o mais recente: quem sai quando o limite estoura é 'b'
+    assert cache.get('a')
+    cache.put('c', {'text': text}, 'pt')
+    assert cache.get('b') is None
+    assert cache.get('a') and cache.get('c')
+    assert cache.clear() == 2
+
+
+def test_decoding_options_pick_batched_or_long_form(transcriber):
+    transcriber.stub_model = False
+    transcriber.decode_batch_size = 4
+    transcriber.vad_filter = False
+    transcriber.long_form_min_seconds = 60
+    import numpy as np
+    short = np.zeros(30 * video.SAMPLE_RATE, dtype=np.float32)
+    long = np.zeros(90 * video.SAMPLE_RATE, dtype=np.float32)
+    assert transcriber.decoding_options(short) == {'task': 'transcribe', 'batched_decoding': True}
+    assert transcriber.decoding_options(long) == {
+        'task': 'transcribe',
+        'long_form': {'chunk_seconds': transcriber.chunk_seconds,
+                      'chunk_overlap_seconds': transcriber.chunk_overlap_seconds}
+    }
+    transcriber.decode_batch_size = 0
+    assert transcriber.decoding_options(short) == {'task': 'transcribe'}
+
+
+def test_repeated_file_is_served_from_cache(monkeypatch, transcriber, workdir):
+    path = str(write_tone(workdir / 'talk.wav', 6))
+    transcriber.output_formats = ['json']
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert transcriber.process_audio_file(path, 'primeira')
+    model = transcriber.get_asr_engine(transcriber.model_name)
+    monkeypatch.setattr(model, 'transcribe', lambda *args, **kwargs: pytest.fail("transcreveu de novo"))
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        assert transcriber.process_audio_file(path, 'segunda')
+    assert "Resultado encontrado no cache" in output.getvalue()
@@ -0,0 +1,54 @@
+"""Legendas incrementais: o arquivo parcial já é válido a cada segmento, antes do close"""
+import json
+
+import video
+
+SEGMENTS = [
+    {'id': 0, 'start': 0.0, 'end': 1.5, 'text': ' Olá.'},
+    {'id': 1, 'start': 61.25, 'end': 3725.5, 'text': ' Tudo bem?', 'speaker': 'SPEAKER_01'},
+]
+
+
+def read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def test_srt_is_complete_after_each_segment(workdir):
+    with video.SrtSegmentWriter(workdir / 'parcial.srt') as writer:
+        writer.write(SEGMENTS[0])
+        assert read(writer.path) == "1\n00:00:00,000 --> 00:00:01,500\nOlá.\n\n"
+        writer.write(SEGMENTS[1])
+        assert read(writer.path).endswith("2\n00:01:01,250 --> 01:02:05,500\n[SPEAKER_01] Tudo bem?\n\n")
+    assert writer._file.closed
+
+
+def test_vtt_has_header_before_first_segment(workdir):
+    writer = video.VttSegmentWriter(workdir / 'parcial.vtt')
+    assert read(writer.path) == "WEBVTT\n\n"
+    for segment in SEGMENTS:
+        writer.write(segment)
+    assert read(writer.path) == ("WEBVTT\n\n00:00:00.000 --> 00:00:01.500\nOlá.\n\n"
+                                 "00:01:01.250 --> 01:02:05.500\n<v SPEAKER_01>Tudo bem?\n\n")
+    writer.close()
+    writer.close()
+
+
+def test_jsonl_lines_parse_while_open(workdir):
+    with video.JsonlSegmentWriter(workdir / 'parcial.jsonl') as writer:
+        for count, segment in enumerate(SEGMENTS, 1):
+            writer.write(segment)
+            lines = read(writer.path).splitlines()
+            assert [json.loads(line) for line in lines] == SEGMENTS[:count]
+
+
+def test_group_feeds_every_supported_format(workdir):
+    base = workdir / 'conversa'
+    with video.SegmentWriterGroup(base, ['srt', 'pdf', 'vtt', 'jsonl']) as group:
+        assert set(group.paths()) == {'srt', 'vtt', 'jsonl'}
+        group.write(SEGMENTS[0])
+        assert all(writer.count == 1 for writer in group.writers.values())
+    paths = group.close()
+    assert paths['srt'] == f"{base}{video.EXPORT_FORMATS['srt']}"
+    assert read(paths['vtt']).count('-->') == 1
+    assert json.loads(read(paths['jsonl'])) == SEGMENTS[0]
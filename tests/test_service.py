@@ -0,0 +1,97 @@
+"""Modo serviço com o modelo falso: submit → estado → resultado"""
+import http.server
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import video
+from conftest import write_tone
+
+pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def service(workdir):
+    """Serviço com o modelo falso; cada teste chama start() (o pytest troca o sys.stdout entre as fases)"""
+    stdout = sys.stdout
+    service = video.TranscriptionService(workdir / 'queue.db', workers=1, stub_model=True,
+                                         formats=['json', 'srt'], use_cache=False)
+    yield service
+    service.stop()
+    sys.stdout = stdout
+
+
+@pytest.fixture
+def api(service):
+    service.start()
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), video.make_service_handler(service))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def request(url, payload=None):
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=10) as response:
+        return response.status, json.loads(response.read())
+
+
+def wait_finished(fetch, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = fetch()
+        if job['status'] in ('done', 'error'):
+            return job
+        time.sleep(0.1)
+    raise AssertionError("job não terminou a tempo")
+
+
+def test_submit_status_result(service, workdir):
+    service.start()
+    audio = write_tone(workdir / 'talk.wav', 12)
+    job = service.submit({'source': str(audio), 'title': 'conversa'})
+    assert job['status'] in ('queued', 'running', 'done')
+    job = wait_finished(lambda: service.store.get(job['id']))
+    assert job['status'] == 'done', job['error']
+    files = job['result']['files']
+    assert set(files) == {'json', 'srt'}
+    with open(files['json'], encoding='utf-8') as f:
+        exported = json.load(f)
+    assert exported['metadata']['asr_backend'] == 'stub'
+    assert exported['transcription']['text'] == "Segmento 1. Segmento 2. Segmento 3."
+    messages = [event['message'] for event in service.store.events(job['id'])]
+    assert any(message.startswith('✅ Transcrição concluída') for message in messages), messages
+
+
+def test_http_api_round_trip(api, workdir):
+    audio = write_tone(workdir / 'talk.wav', 6)
+    status, job = request(f"{api}/jobs", {'source': str(audio), 'formats': 'srt'})
+    assert status == 202
+    job = wait_finished(lambda: request(f"{api}/jobs/{job['id']}")[1])
+    assert job['status'] == 'done', job['error']
+    assert list(job['result']['files']) == ['srt']
+    _, health = request(f"{api}/health")
+    assert health['jobs'].get('done') == 1
+
+
+def test_invalid_requests_are_rejected(api):
+    for payload in ({}, {'source': 'x.wav', 'formats': 'doc'}, {'source': 'x.wav', 'backend': 'nope'}):
+        with pytest.raises(urllib.error.HTTPError) as error:
+            request(f"{api}/jobs", payload)
+        assert error.value.code == 400
+
+
+def test_stub_results_never_share_cache_keys_with_real_models(transcriber):
+    import numpy as np
+    audio = np.zeros(video.SAMPLE_RATE, dtype=np.float32)
+    _, stub_key = transcriber.result_cache_key(audio)
+    transcriber.stub_model = False
+    _, real_key = transcriber.result_cache_key(audio)
+    assert stub_key != real_key
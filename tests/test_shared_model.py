@@ -0,0 +1,68 @@
+"""Modelo compartilhado (batch em threads / serviço): decodificações não se atropelam"""
+import contextlib
+import io
+import threading
+
+import numpy as np
+import pytest
+
+import video
+from conftest import write_tone
+
+
+def shared_transcriber(registry, scheduler):
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = video.EnhancedVideoTranscriber()
+    app.interactive = False
+    app.vad_filter = False
+    app.use_result_cache = False
+    app.checkpoint_long_form = False
+    app.model_registry = registry
+    app.batch_scheduler = scheduler
+    return app
+
+
+def test_long_form_and_batched_jobs_share_a_model(monkeypatch, random_whisper, workdir):
+    import whisper
+    monkeypatch.setattr(whisper, 'load_model', lambda name, device=None: random_whisper)
+    transcribe_stream = video.WhisperBackend.transcribe_stream
+
+    def greedy(self, audio, **options):
+        # Só temperatura 0: o modelo aleatório gera logits inválidos ao amostrar
+        return transcribe_stream(self, audio, **dict(options, temperature=0.0, fp16=False))
+
+    monkeypatch.setattr(video.WhisperBackend, 'transcribe_stream', greedy)
+    tone = video.WavAudioSource.open(write_tone(workdir / 'tone.wav', 45))
+    audio = np.asarray(tone[0:len(tone)])
+    registry = video.ModelRegistry()
+    scheduler = video.BatchedDecoder(batch_size=4, compression_ratio_threshold=float('inf'),
+                                     logprob_threshold=float('-inf'))
+    long_form = shared_transcriber(registry, scheduler)
+    long_form.long_form_min_seconds = 40
+    long_form.chunk_seconds = 30
+    long_form.chunk_overlap_seconds = 0
+    long_form.chunk_workers = 1
+    batched = shared_transcriber(registry, scheduler)
+    batched.long_form_min_seconds = 0
+    batched.decode_batch_size = 4
+
+    errors = []
+
+    def run(app):
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result, _ = app.transcribe_audio(audio)
+            assert result is not None
+        except Exception as e:
+            errors.append(e)
+
+    try:
+        threads = [threading.Thread(target=run, args=(app,)) for app in (long_form, batched)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(300)
+    finally:
+        scheduler.close()
+    assert not errors
+    assert scheduler.windows == 2
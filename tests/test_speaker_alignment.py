@@ -0,0 +1,81 @@
+"""Alinhamento de speakers: mesmo resultado da busca direta turno a turno"""
+import random
+
+import pytest
+
+import video
+
+
+def brute_force(starts, ends, turns):
+    """Referência O(n·m): soma a sobreposição de cada turno com cada intervalo"""
+    if not turns:
+        return [None] * len(starts)
+    labels = sorted({turn['speaker'] for turn in turns})
+    result = []
+    for start, end in zip(starts, ends):
+        totals = {label: 0.0 for label in labels}
+        for turn in turns:
+            totals[turn['speaker']] += max(0.0, min(end, turn['end']) - max(start, turn['start']))
+        best = max(totals.values())
+        if best > 0:
+            # Empate: primeiro rótulo em ordem alfabética
+            result.append(next(label for label in labels if totals[label] == best))
+            continue
+        middle = (start + end) / 2
+
+        def distance(turn):
+            gap = max(turn['start'] - middle, middle - turn['end'], 0.0)
+            # Mesma distância: turno já iniciado e que termina mais tarde
+            return gap, turn['start'] > middle, -turn['end'], turn['start']
+
+        result.append(min(turns, key=distance)['speaker'])
+    return result
+
+
+def turn(start, end, speaker):
+    return {'start': start, 'end': end, 'speaker': speaker}
+
+
+def check(starts, ends, turns):
+    assert video.match_intervals_to_speakers(starts, ends, turns) == brute_force(starts, ends, turns)
+
+
+def test_overlapping_turns():
+    turns = [turn(0, 100, 'SPEAKER_00'), turn(10, 20, 'SPEAKER_01'), turn(15, 40, 'SPEAKER_01'),
+             turn(50, 52, 'SPEAKER_02'), turn(60, 61, 'SPEAKER_01')]
+    starts = [0, 12, 14, 16, 49, 59.5, 95]
+    ends = [5, 18, 30, 45, 53, 61.5, 120]
+    check(starts, ends, turns)
+    assert video.match_intervals_to_speakers([14], [30], turns) == ['SPEAKER_01']
+
+
+def test_intervals_without_overlap_take_the_nearest_turn():
+    turns = [turn(0, 2, 'A'), turn(10, 12, 'B'), turn(1, 5, 'C')]
+    starts = [-3, 5.5, 7, 8.5, 13, 30]
+    ends = [-1, 6, 8, 9, 14, 31]
+    check(starts, ends, turns)
+    assert video.match_intervals_to_speakers([5.5, 8.5], [6, 9], turns) == ['C', 'B']
+
+
+def test_ties_go_to_the_first_label():
+    turns = [turn(0, 4, 'B'), turn(4, 8, 'A'), turn(10, 12, 'C'), turn(14, 16, 'D')]
+    # Sobreposições iguais; e centro equidistante de dois turnos
+    starts, ends = [2, 12.5], [6, 13.5]
+    check(starts, ends, turns)
+    assert video.match_intervals_to_speakers(starts, ends, turns) == ['A', 'C']
+
+
+def test_no_turns():
+    assert video.match_intervals_to_speakers([0, 1], [1, 2], []) == [None, None]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_diarizations_match_brute_force(seed):
+    rng = random.Random(seed)
+    turns = []
+    for _ in range(60):
+        start = rng.randrange(0, 400) / 2
+        turns.append(turn(start, start + rng.randrange(1, 40) / 2, f"SPEAKER_{rng.randrange(4):02d}"))
+    starts = [rng.randrange(-20, 440) / 4 for _ in range(200)]
+    ends = [start + rng.randrange(0, 30) / 4 for start in starts]
+    check(starts, ends, turns)
@@ -0,0 +1,88 @@
+"""Download de áudio em stream (yt-dlp + ffmpeg) contra um servidor HTTP local"""
+import functools
+import http.server
+import shutil
+import threading
+
+import pytest
+
+import video
+from conftest import write_tone
+
+pytest.importorskip('yt_dlp')
+pytest.importorskip('numpy')
+if not shutil.which('ffmpeg'):
+    pytest.skip("ffmpeg não encontrado no PATH", allow_module_level=True)
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def media_server(tmp_path):
+    """Servidor HTTP local servindo tmp_path/media; retorna (pasta, url base)"""
+    media_dir = tmp_path / 'media'
+    media_dir.mkdir()
+    handler = functools.partial(QuietHandler, directory=str(media_dir))
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield media_dir, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_stream_audio_decodes_to_16k_mono(transcriber, media_server):
+    media_dir, base_url = media_server
+    write_tone(media_dir / 'tone.wav', 2.0, rate=44100, channels=2)
+    audio, title = transcriber.stream_audio_from_url(f"{base_url}/tone.wav")
+    assert title == 'tone'
+    assert audio.dtype.name == 'float32'
+    assert abs(len(audio) - 2 * video.SAMPLE_RATE) < video.SAMPLE_RATE // 10
+    assert 0.2 < float(abs(audio).max()) < 0.4
+
+
+def test_stream_audio_missing_file_returns_none(transcriber, media_server):
+    _, base_url = media_server
+    assert transcriber.stream_audio_from_url(f"{base_url}/missing.wav") == (None, None)
+
+
+def test_stream_audio_many_yields_every_url(transcriber, media_server):
+    media_dir, base_url = media_server
+    urls = []
+    for index in range(3):
+        write_tone(media_dir / f'clip{index}.wav', 1.0 + index, frequency=300 + 100 * index)
+        urls.append(f"{base_url}/clip{index}.wav")
+    results = {url: (audio, title) for url, audio, title in transcriber.stream_audio_many(urls, max_concurrent=2)}
+    assert set(results) == set(urls)
+    for index, url in enumerate(urls):
+        audio, title = results[url]
+        assert title == f'clip{index}'
+        assert abs(len(audio) - (1 + index) * video.SAMPLE_RATE) < video.SAMPLE_RATE // 10
+
+
+def test_streamed_audio_is_not_kept_by_default(transcriber, media_server):
+    media_dir, base_url = media_server
+    write_tone(media_dir / 'talk.wav', 1.5)
+    audio, _ = transcriber.stream_audio_from_url(f"{base_url}/talk.wav")
+    assert len(audio) == int(1.5 * video.SAMPLE_RATE)
+    assert not transcriber.download_index.entries
+    assert not list(transcriber.folders['downloads'].glob('*.wav'))
+
+
+def test_streamed_audio_is_indexed_and_reused(transcriber, media_server):
+    media_dir, base_url = media_server
+    write_tone(media_dir / 'talk.wav', 1.5)
+    url = f"{base_url}/talk.wav"
+    transcriber.keep_streamed_audio = True
+    first, _ = transcriber.stream_audio_from_url(url)
+    assert len(transcriber.download_index.entries) == 1
+    # Sem o arquivo no servidor, só o índice pode responder
+    (media_dir / 'talk.wav').unlink()
+    (media_dir / 'talk.wav').write_bytes(b'')
+    second, title = transcriber.stream_audio_from_url(url)
+    assert title == 'talk'
+    assert isinstance(second, video.WavAudioSource)
+    assert abs(second[0:len(second)] - first).max() < 1e-3
@@ -0,0 +1,24 @@
+"""Etapas medidas pelo StageTracer: cada leitura de áudio cai na etapa certa"""
+import contextlib
+import io
+import shutil
+
+import pytest
+
+import video
+from conftest import write_tone
+
+
+def test_load_audio_and_in_memory_extraction_are_separate_stages(transcriber, workdir):
+    transcriber.tracer = video.StageTracer(enabled=True)
+    audio = transcriber.load_audio(str(write_tone(workdir / 'tone.wav', 3)))
+    assert len(audio) == 3 * video.SAMPLE_RATE
+    assert set(transcriber.tracer.totals) == {'load_audio'}
+
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        pytest.skip("ffmpeg não encontrado")
+    with contextlib.redirect_stdout(io.StringIO()):
+        extracted = transcriber.extract_audio_array(str(workdir / 'tone.wav'), ffmpeg)
+    assert len(extracted) == 3 * video.SAMPLE_RATE
+    assert set(transcriber.tracer.totals) == {'load_audio', 'extract_audio'}
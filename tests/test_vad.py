@@ -0,0 +1,71 @@
+"""VAD: mapa de fala, áudio compacto e tempos de volta à linha do tempo original"""
+import numpy as np
+import pytest
+
+import video
+from conftest import write_tone
+
+RATE = video.SAMPLE_RATE
+
+
+@pytest.fixture
+def speech(workdir):
+    """Tom (fala) em 2-5 s e 9-11 s, silêncio no resto (12 s)"""
+    source = video.WavAudioSource.open(write_tone(workdir / 'tone.wav', 3))
+    tone = source[0:len(source)]
+    silence = lambda seconds: np.zeros(int(seconds * RATE), dtype=np.float32)
+    return np.concatenate([silence(2), tone, silence(4), tone[:2 * RATE], silence(1)])
+
+
+def test_regions_cover_speech_with_padding(speech):
+    regions = video.detect_speech_regions(speech)
+    assert len(regions) == 2
+    for (start, end), (speech_start, speech_end) in zip(regions, [(2, 5), (9, 11)]):
+        assert start / RATE == pytest.approx(speech_start - 0.2, abs=0.05)
+        assert end / RATE == pytest.approx(speech_end + 0.2, abs=0.05)
+
+
+def test_silence_and_white_noise_have_no_speech():
+    assert video.detect_speech_regions(np.zeros(5 * RATE, dtype=np.float32)) == []
+    noise = np.random.default_rng(0).normal(0, 0.1, 5 * RATE).astype(np.float32)
+    assert video.detect_speech_regions(noise) == []
+
+
+def test_wav_source_gives_same_regions(speech, workdir):
+    path = video.write_wav(workdir / 'speech.wav', speech)
+    on_disk = video.detect_speech_regions(video.WavAudioSource.open(path), block_frames=7)
+    assert on_disk == video.detect_speech_regions(video.WavAudioSource.open(path)[0:len(speech)])
+
+
+def test_compact_round_trip(speech):
+    regions = video.detect_speech_regions(speech)
+    compact, timeline = video.compact_speech(speech, regions, gap_seconds=0.3)
+    assert len(compact) == sum(end - start for start, end in regions) + int(0.3 * RATE)
+    for compact_start, original_start, duration in timeline:
+        offset = int(round(compact_start * RATE))
+        original = int(round(original_start * RATE))
+        length = int(round(duration * RATE))
+        np.testing.assert_array_equal(compact[offset:offset + length], speech[original:original + length])
+        # Início, meio e fim de cada região voltam ao instante original
+        points = [compact_start, compact_start + duration / 2, compact_start + duration]
+        assert video.map_to_original(points, timeline) == pytest.approx(
+            [original_start, original_start + duration / 2, original_start + duration])
+    # Instantes no silêncio inserido vão para o fim da região anterior
+    first_end = timeline[0][0] + timeline[0][2]
+    assert video.map_to_original(first_end + 0.1, timeline) == pytest.approx(timeline[0][1] + timeline[0][2])
+
+
+def test_remap_segments_moves_segments_and_words():
+    timeline = [(0.0, 2.0, 3.0), (3.3, 9.0, 2.0)]
+    segments = [
+        {'id': 0, 'start': 0.5, 'end': 2.5, 'text': ' Um.',
+         'words': [{'word': ' Um.', 'start': 0.5, 'end': 1.0}]},
+        {'id': 1, 'start': 3.5, 'end': 5.0, 'text': ' Dois.'},
+    ]
+    remapped = video.remap_segments(segments, timeline)
+    assert [(s['start'], s['end']) for s in remapped] == pytest.approx([(2.5, 4.5), (9.2, 10.7)])
+    assert (remapped[0]['words'][0]['start'], remapped[0]['words'][0]['end']) == pytest.approx((2.5, 3.0))
+    # Os segmentos originais não são alterados
+    assert segments[0]['start'] == 0.5 and segments[0]['words'][0]['end'] == 1.0
+    assert video.remap_segment(segments[1], timeline)['text'] == ' Dois.'
+    assert video.remap_segments([], timeline) == []
@@ -0,0 +1,64 @@
+"""StreamingWavWriter: pool cheio vira silêncio, sem deslocar o tempo da gravação"""
+import contextlib
+import io
+import threading
+
+import numpy as np
+
+import video
+
+
+class GatedFile:
+    """Arquivo cuja escrita fica parada até o teste liberar (disco lento)"""
+
+    def __init__(self, file):
+        self.file = file
+        self.gate = threading.Event()
+
+    def write(self, data):
+        self.gate.wait(10)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+def test_full_pool_writes_silence_in_place_of_dropped_blocks(workdir):
+    writer = video.StreamingWavWriter(workdir / 'rec.wav', block_frames=1000, pool_blocks=2)
+    gated = writer._file = GatedFile(writer._file)
+    blocks = [np.full((1000, 1), index + 1, dtype=np.int16) for index in range(6)]
+    for block in blocks:
+        writer.write(block)
+    # Thread parada no primeiro bloco e o segundo na fila: os outros quatro não cabem no pool
+    assert writer.overflows == 4
+    assert writer.dropped_frames == 4000
+    gated.gate.set()
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        seconds = writer.close()
+    assert "descartados" in output.getvalue()
+    assert seconds == 6000 / video.SAMPLE_RATE
+
+    source = video.WavAudioSource.open(workdir / 'rec.wav')
+    samples = np.asarray(source.samples)
+    assert len(samples) == 6000
+    assert (samples[:1000] == 1).all() and (samples[1000:2000] == 2).all()
+    assert not samples[2000:].any()
+
+
+def test_audio_after_a_gap_keeps_its_position(workdir):
+    writer = video.StreamingWavWriter(workdir / 'rec.wav', block_frames=1000, pool_blocks=1)
+    gated = writer._file = GatedFile(writer._file)
+    writer.write(np.full((1000, 1), 7, dtype=np.int16))
+    writer.write(np.full((2500, 1), 8, dtype=np.int16))
+    gated.gate.set()
+    # Espera o bloco voltar ao pool para o próximo caber
+    while writer._free.empty():
+        threading.Event().wait(0.01)
+    writer.write(np.full((1000, 1), 9, dtype=np.int16))
+    with contextlib.redirect_stdout(io.StringIO()):
+        writer.close()
+    samples = np.asarray(video.WavAudioSource.open(workdir / 'rec.wav').samples)
+    assert len(samples) == 4500
+    assert (samples[:1000] == 7).all()
+    assert not samples[1000:3500].any()
+    assert (samples[3500:] == 9).all()
@@ -3,28 +3,2063 @@
 """
 VIDEO TRANSCRIBER - VERSÃO AVANÇADA
 Sistema plug-and-play com detecção de speakers, múltiplos formatos e gravação ao vivo
-Instala automaticamente todas as dependências necessárias
+Verifica as dependências ao iniciar; instala as ausentes com --install-deps
 """
 import os
 import subprocess
 import sys
-import tempfile
 import json
-import urllib.request
-import zipfile
 import shutil
 import re
 import platform
 import time
 import threading
+import gc
+import glob
+import argparse
+import contextlib
+import functools
+import traceback
+import multiprocessing
+import hashlib
+import queue
+import struct
+import importlib
+import importlib.util
+import io
+import uuid
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime, timedelta
 
+# Formato de áudio esperado pelo Whisper: 16 kHz, mono
+SAMPLE_RATE = 16000
+
+
+def estimate_model_size_mb(model):
+    """Estimar memória ocupada por um modelo (parâmetros + buffers) em MB"""
+    if callable(getattr(model, 'size_mb', None)):
+        return model.size_mb()
+    total = 0
+    for attr in ('parameters', 'buffers'):
+        tensors = getattr(model, attr, None)
+        if not callable(tensors):
+            continue
+        try:
+            total += sum(t.numel() * t.element_size() for t in tensors())
+        except Exception:
+            pass
+    return total / (1024 * 1024)
+
+
+INFERENCE_MODES = ('default', 'int8')
+_torch_threads_configured = False
+
+
+def configure_torch_threads(intra_op=None, inter_op=None):
+    """Fixar threads intra-op e inter-op do torch (uma vez por processo)
+
+    set_num_interop_threads só funciona antes do primeiro trabalho paralelo do
+    torch; depois disso o valor atual é mantido com um aviso.
+    """
+    global _torch_threads_configured
+    if _torch_threads_configured or not (intra_op or inter_op):
+        return
+    import torch
+    _torch_threads_configured = True
+    if intra_op:
+        torch.set_num_threads(int(intra_op))
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(int(inter_op))
+        except RuntimeError as e:
+            print(f"⚠️ Threads inter-op não alteradas: {e}")
+
+
+def quantize_whisper_int8(model):
+    """Quantização dinâmica int8 das camadas Linear do Whisper (inferência em CPU)"""
+    import torch
+    for module in list(model.modules()):
+        for name, child in module.named_children():
+            if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+                # O Linear do Whisper é uma subclasse, que o quantize_dynamic não reconhece
+                plain = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                plain.weight, plain.bias = child.weight, child.bias
+                setattr(module, name, plain)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class ModelRegistry:
+    """Cache LRU de modelos carregados, chaveado por (nome, device, dtype)
+
+    Os modelos ficam residentes entre os jobs da mesma sessão; quando a soma
+    estimada ultrapassa memory_budget_mb, os menos usados recentemente são
+    descartados (o modelo recém-carregado nunca é descartado).
+    """
+
+    def __init__(self, memory_budget_mb=None):
+        self.memory_budget_mb = memory_budget_mb
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.RLock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._models
+
+    def __len__(self):
+        with self._lock:
+            return len(self._models)
+
+    def keys(self):
+        with self._lock:
+            return list(self._models.keys())
+
+    def total_size_mb(self):
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def get(self, key, loader):
+        """Retornar o modelo da chave, carregando com loader() se necessário"""
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+            model = loader()
+            self._models[key] = model
+            self._sizes[key] = estimate_model_size_mb(model)
+            self._evict(keep=key)
+            return model
+
+    def release(self, key=None):
+        """Liberar um modelo específico ou, sem chave, todos os modelos"""
+        with self._lock:
+            keys = [key] if key is not None else list(self._models.keys())
+            released = 0
+            for k in keys:
+                if self._models.pop(k, None) is not None:
+                    released += 1
+                self._sizes.pop(k, None)
+        if released:
+            self._free_memory()
+        return released
+
+    def _evict(self, keep):
+        if not self.memory_budget_mb:
+            return
+        evicted = False
+        while sum(self._sizes.values()) > self.memory_budget_mb:
+            victim = next((k for k in self._models if k != keep), None)
+            if victim is None:
+                break
+            del self._models[victim]
+            self._sizes.pop(victim, None)
+            print(f"♻️ Modelo descartado do cache (limite de memória): {victim}")
+            evicted = True
+        if evicted:
+            self._free_memory()
+
+    def _free_memory(self):
+        gc.collect()
+        torch = sys.modules.get('torch')
+        if torch is not None:
+            try:
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            except Exception:
+                pass
+
+
+_model_locks = weakref.WeakKeyDictionary()
+_model_locks_guard = threading.Lock()
+
+
+def model_lock(model):
+    """Lock de inferência de um modelo compartilhado entre threads
+
+    O Whisper instala os hooks do kv-cache no próprio modelo a cada decodificação:
+    duas decodificações simultâneas no mesmo objeto corrompem uma à outra. Todo
+    uso do modelo (transcribe, lote do BatchedDecoder, diarização) passa por aqui.
+    """
+    with _model_locks_guard:
+        lock = _model_locks.get(model)
+        if lock is None:
+            lock = _model_locks[model] = threading.Lock()
+        return lock
+
+
+class ASRBackend:
+    """Motor de reconhecimento de fala com o esquema de resultado do Whisper
+
+    load() devolve o motor pronto; transcribe_stream() gera os segmentos à
+    medida que ficam prontos e retorna (StopIteration.value) o resultado
+    completo {'text', 'segments', 'language'}; transcribe() consome o stream.
+    Segmentos: dicts com pelo menos id, start, end e text (tempos em segundos).
+    """
+
+    name = None
+
+    def __init__(self, model, model_name):
+        self.model = model
+        self.model_name = model_name
+
+    @classmethod
+    def placement(cls, device=None, mode='default'):
+        """(device, dtype) em que o modelo será carregado"""
+        raise NotImplementedError
+
+    @classmethod
+    def load(cls, model_name, device=None, mode='default', threads=None):
+        raise NotImplementedError
+
+    def size_mb(self):
+        return estimate_model_size_mb(self.model)
+
+    def transcribe_stream(self, audio, **options):
+        raise NotImplementedError
+
+    def transcribe(self, audio, on_segment=None, **options):
+        stream = self.transcribe_stream(audio, **options)
+        while True:
+            try:
+                segment = next(stream)
+            except StopIteration as done:
+                return done.value
+            if on_segment:
+                on_segment(segment)
+
+
+class WhisperBackend(ASRBackend):
+    """openai-whisper (PyTorch); mode 'int8' quantiza as camadas Linear em CPU"""
+
+    name = 'whisper'
+
+    @classmethod
+    def placement(cls, device=None, mode='default'):
+        if mode == 'int8':
+            # Quantização dinâmica só roda em CPU
+            return 'cpu', 'int8'
+        if device is None:
+            import torch
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        # Whisper usa fp16 em GPU e fp32 em CPU por padrão
+        return device, 'float16' if device.startswith('cuda') else 'float32'
+
+    @classmethod
+    def load(cls, model_name, device=None, mode='default', threads=None):
+        import whisper
+        device, _ = cls.placement(device, mode)
+        model = whisper.load_model(model_name, device=device)
+        return cls(quantize_whisper_int8(model) if mode == 'int8' else model, model_name)
+
+    def transcribe_stream(self, audio, **options):
+        # O Whisper só devolve os segmentos no fim
+        with model_lock(self.model):
+            result = self.model.transcribe(audio, **options)
+        yield from result.get('segments', [])
+        return result
+
+
+class FasterWhisperBackend(ASRBackend):
+    """faster-whisper (CTranslate2): int8 em CPU, segmentos gerados sob demanda"""
+
+    name = 'faster-whisper'
+    # Opções do Whisper aceitas (com o nome usado pelo faster-whisper)
+    OPTIONS = {
+        'language': 'language', 'task': 'task', 'initial_prompt': 'initial_prompt',
+        'condition_on_previous_text': 'condition_on_previous_text', 'word_timestamps': 'word_timestamps',
+        'temperature': 'temperature', 'beam_size': 'beam_size', 'best_of': 'best_of',
+        'no_speech_threshold': 'no_speech_threshold', 'logprob_threshold': 'log_prob_threshold',
+        'compression_ratio_threshold': 'compression_ratio_threshold'
+    }
+
+    @classmethod
+    def placement(cls, device=None, mode='default'):
+        if device is None:
+            import ctranslate2
+            device = 'cuda' if ctranslate2.get_cuda_device_count() > 0 else 'cpu'
+        # Em CPU o ganho do CTranslate2 vem do int8; em GPU o padrão é float16
+        if mode == 'int8' or not device.startswith('cuda'):
+            return device, 'int8'
+        return device, 'float16'
+
+    # Bytes por peso em cada compute_type; os modelos convertidos do hub guardam float16
+    WEIGHT_BYTES = {'int8': 1, 'int8_float16': 1, 'int8_float32': 1, 'int8_bfloat16': 1,
+                    'float16': 2, 'bfloat16': 2, 'float32': 4}
+
+    def __init__(self, model, model_name, model_path=None, compute_type='int8'):
+        super().__init__(model, model_name)
+        self.model_path = Path(model_path) if model_path else None
+        self.compute_type = compute_type
+
+    @classmethod
+    def load(cls, model_name, device=None, mode='default', threads=None):
+        from faster_whisper import WhisperModel
+        from faster_whisper.utils import download_model
+        device, compute_type = cls.placement(device, mode)
+        # Caminho resolvido aqui (pasta local ou cache do hub) para estimar a memória depois
+        model_path = model_name if Path(model_name).is_dir() else download_model(model_name)
+        model = WhisperModel(model_path, device=device.split(':')[0], compute_type=compute_type,
+                             cpu_threads=int(threads or 0))
+        return cls(model, model_name, model_path, compute_type)
+
+    def size_mb(self):
+        # Pesos ficam no CTranslate2, fora do torch: estima pelo model.bin no compute_type carregado
+        try:
+            stored_mb = (self.model_path / 'model.bin').stat().st_size / (1024 * 1024)
+        except (OSError, TypeError):
+            return 0
+        return stored_mb * self.WEIGHT_BYTES.get(self.compute_type, 2) / 2
+
+    def transcribe_stream(self, audio, **options):
+        kwargs = {self.OPTIONS[k]: v for k, v in options.items() if k in self.OPTIONS and v is not None}
+        if isinstance(audio, Path):
+            audio = str(audio)
+        raw_segments, info = self.model.transcribe(audio, **kwargs)
+        segments = []
+        for raw in raw_segments:
+            segment = {
+                'id': len(segments), 'seek': raw.seek, 'start': raw.start, 'end': raw.end,
+                'text': raw.text, 'tokens': list(raw.tokens), 'temperature': raw.temperature,
+                'avg_logprob': raw.avg_logprob, 'compression_ratio': raw.compression_ratio,
+                'no_speech_prob': raw.no_speech_prob
+            }
+            if raw.words:
+                segment['words'] = [{'word': w.word, 'start': w.start, 'end': w.end, 'probability': w.probability}
+                                    for w in raw.words]
+            segments.append(segment)
+            yield segment
+        return {
+            'text': ''.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': info.language
+        }
+
+
+class StubWhisperModel(ASRBackend):
+    """Motor falso com a mesma interface dos motores reais
+
+    Não importa torch nem carrega pesos: gera um segmento determinístico a cada
+    segment_seconds de áudio com som (janelas silenciosas não geram texto).
+    Usado para testar o modo serviço e nos benchmarks offline.
+    """
+
+    name = 'stub'
+
+    def __init__(self, model_name='stub', segment_seconds=5.0, language='pt', silence_level=0.01):
+        super().__init__(None, model_name)
+        self.segment_seconds = segment_seconds
+        self.language = language
+        self.silence_level = silence_level
+
+    @staticmethod
+    def load_samples(audio):
+        """Retornar (amostras, taxa, escala); caminhos devem ser WAV PCM 16 bits mono"""
+        if isinstance(audio, (str, Path)):
+            import array
+            import wave
+            with wave.open(str(audio), 'rb') as wav:
+                rate = wav.getframerate()
+                samples = array.array('h', wav.readframes(wav.getnframes()))
+            return samples, rate, 32768.0
+        return audio, SAMPLE_RATE, 1.0
+
+    @staticmethod
+    def audio_duration(audio):
+        samples, rate, _ = StubWhisperModel.load_samples(audio)
+        return len(samples) / rate
+
+    @classmethod
+    def placement(cls, device=None, mode='default'):
+        return 'stub', 'float32'
+
+    @classmethod
+    def load(cls, model_name, device=None, mode='default', threads=None):
+        return cls(model_name)
+
+    def size_mb(self):
+        return 0
+
+    def transcribe_stream(self, audio, **options):
+        samples, rate, scale = self.load_samples(audio)
+        window = max(1, int(self.segment_seconds * rate))
+        segments = []
+        for offset in range(0, len(samples), window):
+            chunk = samples[offset:offset + window]
+            low, high = (chunk.min(), chunk.max()) if hasattr(chunk, 'max') else (min(chunk), max(chunk))
+            if max(high, -low) / scale < self.silence_level:
+                continue
+            segments.append({'id': len(segments), 'start': round(offset / rate, 3),
+                             'end': round((offset + len(chunk)) / rate, 3),
+                             'text': f" Segmento {len(segments) + 1}."})
+            yield segments[-1]
+        return {
+            'text': ''.join(segment['text'] for segment in segments).strip(),
+            'segments': segments,
+            'language': self.language
+        }
+
+
+ASR_BACKENDS = {backend.name: backend for backend in (WhisperBackend, FasterWhisperBackend, StubWhisperModel)}
+
+
+class BatchedDecoder:
+    """Decodificação em lote de janelas de 30 s vindas de vários jobs (Whisper)
+
+    Cada job entrega seu áudio já cortado em janelas de até 30 s (o log-mel é
+    calculado na thread do job); uma thread única junta janelas do mesmo modelo
+    em lotes de até batch_size, roda o encoder uma vez sobre o lote empilhado,
+    decodifica todas juntas e devolve cada resultado ao Future da sua janela.
+    Um lote só junta janelas do mesmo modelo e do mesmo idioma (None = detectar).
+    Janelas que falham nos limites do Whisper (compressão/logprob) são
+    decodificadas de novo na temperatura seguinte, reaproveitando o encoder.
+    """
+
+    TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+    class Window:
+        def __init__(self, model, mel, duration, language=None):
+            from concurrent.futures import Future
+            self.model = model
+            self.mel = mel
+            self.duration = duration
+            self.language = language
+            self.future = Future()
+
+    def __init__(self, batch_size=8, max_wait=0.05, compression_ratio_threshold=2.4,
+                 logprob_threshold=-1.0, no_speech_threshold=0.6):
+        self.batch_size = max(1, int(batch_size))
+        # Tempo máximo esperando o lote encher antes de decodificar o que houver
+        self.max_wait = max_wait
+        self.compression_ratio_threshold = compression_ratio_threshold
+        self.logprob_threshold = logprob_threshold
+        self.no_speech_threshold = no_speech_threshold
+        self.batches = 0
+        self.windows = 0
+        self._queue = []
+        self._changed = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def submit(self, model, audio, bounds, language=None):
+        """Enfileirar as janelas [(início, fim)] (amostras) do áudio; retorna um Future por janela"""
+        import numpy as np
+        import whisper
+        windows = []
+        for start, end in bounds:
+            chunk = np.ascontiguousarray(audio[start:end], dtype=np.float32)
+            mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(chunk), model.dims.n_mels)
+            windows.append(self.Window(model, mel, (end - start) / SAMPLE_RATE, language))
+        with self._changed:
+            if self._closed:
+                raise RuntimeError("BatchedDecoder encerrado")
+            self._queue.extend(windows)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='batched-decoder', daemon=True)
+                self._thread.start()
+            self._changed.notify_all()
+        return [window.future for window in windows]
+
+    def _next_batch(self):
+        """Próximo lote; None depois de close()"""
+        with self._changed:
+            while not self._queue and not self._closed:
+                self._changed.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) < self.batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            if self._closed:
+                return None
+            # Só janelas do mesmo modelo e idioma entram no mesmo lote
+            model, language = self._queue[0].model, self._queue[0].language
+            batch = [window for window in self._queue
+                     if window.model is model and window.language == language][:self.batch_size]
+            chosen = set(map(id, batch))
+            self._queue = [window for window in self._queue if id(window) not in chosen]
+            return batch
+
+    def close(self, timeout=None):
+        """Parar a thread de decodificação; janelas ainda na fila falham com RuntimeError"""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._changed:
+            remaining, self._queue = self._queue, []
+            self._thread = None
+        for window in remaining:
+            window.future.set_exception(RuntimeError("BatchedDecoder encerrado"))
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                with model_lock(batch[0].model):
+                    results = self.decode(batch[0].model, batch)
+            except Exception as e:
+                for window in batch:
+                    window.future.set_exception(e)
+                continue
+            for window, result in zip(batch, results):
+                window.future.set_result(result)
+
+    def decode(self, model, batch):
+        """Encoder sobre o lote empilhado e decodificação conjunta com fallback de temperatura"""
+        import torch
+        import whisper
+        fp16 = model.device.type == 'cuda'
+        mel = torch.stack([window.mel for window in batch]).to(model.device)
+        with torch.no_grad():
+            features = model.embed_audio(mel.half() if fp16 else mel)
+        self.batches += 1
+        self.windows += len(batch)
+        decoded = [None] * len(batch)
+        pending = list(range(len(batch)))
+        for temperature in self.TEMPERATURES:
+            options = whisper.DecodingOptions(task='transcribe', language=batch[0].language,
+                                              temperature=temperature, fp16=fp16)
+            results = whisper.decode(model, features[pending], options)
+            retry = []
+            for index, result in zip(pending, results):
+                decoded[index] = result
+                if self.needs_fallback(result):
+                    retry.append(index)
+            pending = retry
+            if not pending:
+                break
+        return [self.window_result(model, result, window.duration) for window, result in zip(batch, decoded)]
+
+    def needs_fallback(self, result):
+        if result.no_speech_prob > self.no_speech_threshold and result.avg_logprob < self.logprob_threshold:
+            # Janela sem fala: não adianta tentar outra temperatura
+            return False
+        return (result.compression_ratio > self.compression_ratio_threshold
+                or result.avg_logprob < self.logprob_threshold)
+
+    def window_result(self, model, result, duration):
+        """Converter os tokens de timestamp de uma janela em segmentos no esquema do Whisper"""
+        from whisper.tokenizer import get_tokenizer
+        empty = {'text': '', 'segments': [], 'language': result.language}
+        if result.no_speech_prob > self.no_speech_threshold and result.avg_logprob < self.logprob_threshold:
+            return empty
+        tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                                  language=result.language, task='transcribe')
+        # Cada token de timestamp vale 20 ms (2 quadros de 10 ms após o conv do encoder)
+        precision = 0.02
+        spans = []
+        start, text_tokens = None, []
+        for token in result.tokens:
+            if token < tokenizer.timestamp_begin:
+                text_tokens.append(token)
+                continue
+            moment = (token - tokenizer.timestamp_begin) * precision
+            if start is None or not text_tokens:
+                start = moment
+            else:
+                spans.append((start, moment, text_tokens))
+                start, text_tokens = None, []
+        if text_tokens:
+            spans.append((start or 0.0, duration, text_tokens))
+        segments = []
+        for seg_start, seg_end, tokens in spans:
+            text = tokenizer.decode(tokens)
+            if not text.strip():
+                continue
+            segments.append({
+                'id': len(segments), 'seek': 0,
+                'start': round(min(seg_start, duration), 3), 'end': round(min(max(seg_end, seg_start), duration), 3),
+                'text': text, 'tokens': tokens, 'temperature': result.temperature,
+                'avg_logprob': result.avg_logprob, 'compression_ratio': result.compression_ratio,
+                'no_speech_prob': result.no_speech_prob
+            })
+        if not segments:
+            return empty
+        return {'text': ''.join(segment['text'] for segment in segments), 'segments': segments,
+                'language': result.language}
+
+
+class StubDiarizationPipeline:
+    """Pipeline de diarização falso: alterna num_speakers a cada turn_seconds"""
+
+    class Turn:
+        def __init__(self, start, end):
+            self.start = start
+            self.end = end
+
+    class Diarization:
+        def __init__(self, tracks):
+            self.tracks = tracks
+
+        def itertracks(self, yield_label=False):
+            for turn, speaker in self.tracks:
+                yield (turn, None, speaker) if yield_label else (turn, None)
+
+    def __init__(self, num_speakers=2, turn_seconds=7.0):
+        self.num_speakers = num_speakers
+        self.turn_seconds = turn_seconds
+
+    def __call__(self, audio):
+        if isinstance(audio, dict):
+            duration = audio['waveform'].shape[-1] / audio['sample_rate']
+        else:
+            duration = StubWhisperModel.audio_duration(audio)
+        tracks = []
+        start = 0.0
+        while start < duration:
+            end = min(duration, start + self.turn_seconds)
+            speaker = f"SPEAKER_{len(tracks) % self.num_speakers:02d}"
+            tracks.append((self.Turn(start, end), speaker))
+            start = end
+        return self.Diarization(tracks)
+
+
+def speaker_statistics(turns):
+    """Tempo total de fala por speaker, em uma única passada pelos turnos"""
+    totals = {}
+    for turn in turns:
+        totals[turn['speaker']] = totals.get(turn['speaker'], 0.0) + (turn['end'] - turn['start'])
+    return dict(sorted(totals.items()))
+
+
+def match_intervals_to_speakers(starts, ends, turns):
+    """Speaker de maior sobreposição para cada intervalo [start, end)
+
+    Para cada speaker, a cobertura acumulada F(x) = soma de clip(x - início, 0,
+    duração) dos seus turnos sai de somas prefixadas dos inícios e fins
+    ordenados; a sobreposição de um intervalo com o speaker é F(fim) - F(início),
+    com dois searchsorted. O custo é O((n + m) log m) por speaker, sem reler
+    turnos antigos mesmo com turnos longos ou sobrepostos. Empates ficam com o
+    primeiro rótulo em ordem alfabética. Intervalos sem sobreposição recebem o
+    speaker do turno mais próximo do seu centro.
+    Retorna lista de rótulos (None se não houver turnos).
+    """
+    import numpy as np
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    if not len(turns) or not len(starts):
+        return [None] * len(starts)
+    turn_starts = np.array([turn['start'] for turn in turns], dtype=np.float64)
+    turn_ends = np.array([turn['end'] for turn in turns], dtype=np.float64)
+    labels, codes = np.unique([turn['speaker'] for turn in turns], return_inverse=True)
+    totals = np.empty((len(starts), len(labels)), dtype=np.float64)
+
+    for code in range(len(labels)):
+        own = codes == code
+        sorted_starts = np.sort(turn_starts[own])
+        sorted_ends = np.sort(turn_ends[own])
+        start_sums = np.concatenate(([0.0], np.cumsum(sorted_starts)))
+        end_sums = np.concatenate(([0.0], np.cumsum(sorted_ends)))
+
+        def coverage(x):
+            # Turnos já iniciados contam x - início; os já encerrados devolvem x - fim
+            opened = np.searchsorted(sorted_starts, x, side='right')
+            closed = np.searchsorted(sorted_ends, x, side='right')
+            return (opened * x - start_sums[opened]) - (closed * x - end_sums[closed])
+
+        totals[:, code] = coverage(ends) - coverage(starts)
+
+    # Arredondar: diferenças de somas prefixadas não devem desfazer empates exatos
+    totals = np.round(totals, 9)
+    best = totals.argmax(axis=1)
+    # Sem sobreposição: turno mais próximo pelo centro do intervalo
+    missing = totals.max(axis=1) <= 0
+    if missing.any():
+        order = np.argsort(turn_starts, kind='stable')
+        ordered_starts, ordered_ends = turn_starts[order], turn_ends[order]
+        # Entre os turnos iniciados até cada posição, o que termina mais tarde
+        reach = np.maximum.accumulate(ordered_ends)
+        latest = np.flatnonzero(np.r_[True, ordered_ends[1:] > reach[:-1]])
+        latest = latest[np.searchsorted(latest, np.arange(len(order)), side='right') - 1]
+        middles = (starts[missing] + ends[missing]) / 2
+        after = np.searchsorted(ordered_starts, middles, side='right')
+        before = latest[np.clip(after - 1, 0, None)]
+        gap_before = np.where(after > 0, np.maximum(middles - ordered_ends[before], 0), np.inf)
+        after = np.clip(after, 0, len(order) - 1)
+        gap_after = np.where(ordered_starts[after] > middles, ordered_starts[after] - middles, np.inf)
+        nearest = np.where(gap_before <= gap_after, order[before], order[after])
+        best[missing] = codes[nearest]
+    return [str(label) for label in labels[best]]
+
+
+def align_speakers(segments, turns):
+    """Rotular segmentos (e palavras, se houver timestamps) com o speaker dominante"""
+    aligned = [dict(segment) for segment in segments]
+    if not aligned:
+        return aligned
+    speakers = match_intervals_to_speakers(
+        [seg['start'] for seg in aligned], [seg['end'] for seg in aligned], turns
+    )
+    words = [word for seg in aligned for word in seg.get('words') or []]
+    word_speakers = match_intervals_to_speakers(
+        [word['start'] for word in words], [word['end'] for word in words], turns
+    ) if words else []
+    word_iter = iter(word_speakers)
+    for segment, speaker in zip(aligned, speakers):
+        segment['speaker'] = speaker
+        if segment.get('words'):
+            segment['words'] = [dict(word, speaker=next(word_iter)) for word in segment['words']]
+    return aligned
+
+
+class WavAudioSource:
+    """WAV PCM 16 bits mono 16 kHz mapeado em memória (np.memmap sobre o bloco 'data')
+
+    Só os trechos acessados saem do disco: window() devolve views int16 sem
+    cópia e o fatiamento (source[a:b], em amostras) devolve float32 apenas do
+    trecho, na mesma escala de decode_audio. Chunking, VAD, hash do cache e
+    diarização trabalham assim em gravações de vários GB sem carregá-las inteiras.
+    """
+
+    def __init__(self, path, data_offset, data_size):
+        import numpy as np
+        self.path = Path(path)
+        self.samples = np.memmap(self.path, dtype='<i2', mode='r', offset=data_offset, shape=(data_size // 2,))
+
+    @classmethod
+    def open(cls, path):
+        """Mapear o WAV se for PCM 16 bits mono 16 kHz; senão None (decodificar com ffmpeg)"""
+        try:
+            file_size = os.path.getsize(path)
+            with open(path, 'rb') as f:
+                header = f.read(12)
+                if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+                    return None
+                fmt = None
+                while True:
+                    chunk = f.read(8)
+                    if len(chunk) < 8:
+                        return None
+                    chunk_id, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+                    if chunk_id == b'fmt ':
+                        fmt = struct.unpack('<HHIIHH', f.read(16))
+                        f.seek(size - 16 + (size & 1), 1)
+                    elif chunk_id == b'data':
+                        offset = f.tell()
+                        break
+                    else:
+                        f.seek(size + (size & 1), 1)
+        except (OSError, struct.error):
+            return None
+        if not fmt or fmt[0] != 1 or fmt[1] != 1 or fmt[2] != SAMPLE_RATE or fmt[5] != 16:
+            return None
+        # Gravação interrompida pode ter tamanho 0/errado no cabeçalho: vale o que está no disco
+        available = file_size - offset
+        if size in (0, 0xFFFFFFFF) or size > available:
+            size = available
+        size -= size % 2
+        return cls(path, offset, size) if size > 0 else None
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("WavAudioSource aceita apenas fatias (source[início:fim])")
+        import numpy as np
+        return self.samples[key].astype(np.float32) / np.float32(32768.0)
+
+    @property
+    def duration(self):
+        return len(self.samples) / SAMPLE_RATE
+
+    @property
+    def nbytes(self):
+        return self.samples.nbytes
+
+    def window(self, start_seconds, end_seconds=None):
+        """View int16 (sem cópia) do intervalo de tempo"""
+        start = int(start_seconds * SAMPLE_RATE)
+        end = len(self.samples) if end_seconds is None else int(end_seconds * SAMPLE_RATE)
+        return self.samples[start:end]
+
+    def read(self, start_seconds=0, end_seconds=None):
+        """float32 do intervalo de tempo (cópia só desse trecho)"""
+        start = int(start_seconds * SAMPLE_RATE)
+        end = len(self.samples) if end_seconds is None else int(end_seconds * SAMPLE_RATE)
+        return self[start:end]
+
+    def blocks(self, block_samples=4 * 1024 * 1024):
+        """Percorrer o áudio em blocos float32"""
+        for offset in range(0, len(self.samples), block_samples):
+            yield self[offset:offset + block_samples]
+
+
+def _merge_runs(starts, ends, min_gap):
+    """Unir intervalos ordenados separados por menos de min_gap"""
+    import numpy as np
+    if len(starts) < 2:
+        return starts, ends
+    keep = (starts[1:] - ends[:-1]) >= min_gap
+    return starts[np.concatenate(([True], keep))], ends[np.concatenate((keep, [True]))]
+
+
+def detect_speech_regions(audio, frame_seconds=0.03, energy_floor_db=-50.0, energy_margin_db=12.0,
+                          flatness_threshold=0.4, min_speech_seconds=0.25, min_silence_seconds=0.5,
+                          padding_seconds=0.2, block_frames=20000):
+    """Mapa de fala (VAD vetorizado sobre PCM 16 kHz): [(início, fim)] em amostras
+
+    Um quadro é fala quando a energia passa do piso adaptativo (ruído de fundo
+    + energy_margin_db, nunca abaixo de energy_floor_db) e o espectro não é
+    plano (flatness < flatness_threshold; ruído branco fica perto de 0.56).
+    Tudo é feito em blocos de block_frames quadros (arrays ou WavAudioSource);
+    a FFT só roda nos quadros com energia. Lacunas curtas são
+    preenchidas, falas curtas descartadas e as regiões recebem padding.
+    Áudio totalmente silencioso retorna [] sem nenhuma FFT.
+    """
+    import numpy as np
+    frame = int(frame_seconds * SAMPLE_RATE)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return []
+
+    def frame_block(first, last):
+        # View (quadros, frame) do bloco; WavAudioSource lê só esse trecho do disco
+        return np.asarray(audio[first * frame:last * frame], dtype=np.float32).reshape(-1, frame)
+
+    energy_db = np.empty(n_frames, dtype=np.float32)
+    for first in range(0, n_frames, block_frames):
+        frames = frame_block(first, min(n_frames, first + block_frames))
+        energy_db[first:first + len(frames)] = 10 * np.log10(np.einsum('ij,ij->i', frames, frames) / frame + 1e-12)
+    if energy_db.max() < energy_floor_db:
+        return []
+    noise_db, loud_db = np.percentile(energy_db, [10, 90])
+    threshold = max(energy_floor_db, min(noise_db + energy_margin_db, loud_db - energy_margin_db))
+    candidates = np.flatnonzero(energy_db > threshold)
+    window = np.hanning(frame).astype(np.float32)
+    flatness = np.empty(len(candidates), dtype=np.float32)
+    for first in range(0, n_frames, block_frames):
+        last = min(n_frames, first + block_frames)
+        low, high = np.searchsorted(candidates, [first, last])
+        if low == high:
+            continue
+        frames = frame_block(first, last)[candidates[low:high] - first]
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2 + 1e-10
+        flatness[low:high] = np.exp(np.log(power).mean(axis=1)) / power.mean(axis=1)
+    speech = np.zeros(n_frames, dtype=bool)
+    speech[candidates[flatness < flatness_threshold]] = True
+    edges = np.diff(np.concatenate(([0], speech.view(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    starts, ends = _merge_runs(starts, ends, int(min_silence_seconds / frame_seconds))
+    long_enough = (ends - starts) >= int(min_speech_seconds / frame_seconds)
+    padding = int(padding_seconds * SAMPLE_RATE)
+    starts = np.maximum(starts[long_enough] * frame - padding, 0)
+    ends = np.minimum(ends[long_enough] * frame + padding, len(audio))
+    starts, ends = _merge_runs(starts, ends, 1)
+    return [(int(start), int(end)) for start, end in zip(starts, ends)]
+
+
+def compact_speech(audio, regions, gap_seconds=0.3):
+    """Concatenar só as regiões com fala, separadas por gap_seconds de silêncio
+
+    Retorna (áudio compacto, linha do tempo) com linha do tempo =
+    [(início no compacto, início original, duração)] em segundos.
+    """
+    import numpy as np
+    gap = np.zeros(int(gap_seconds * SAMPLE_RATE), dtype=np.float32)
+    pieces = []
+    timeline = []
+    position = 0
+    for index, (start, end) in enumerate(regions):
+        if index:
+            pieces.append(gap)
+            position += len(gap)
+        pieces.append(audio[start:end])
+        timeline.append((position / SAMPLE_RATE, start / SAMPLE_RATE, (end - start) / SAMPLE_RATE))
+        position += end - start
+    return np.concatenate(pieces).astype(np.float32, copy=False), timeline
+
+
+def map_to_original(seconds, timeline):
+    """Converter instantes do áudio compacto para a linha do tempo original
+
+    timeline pode ser a lista de compact_speech ou o mesmo conteúdo já em
+    np.asarray (n x 3); seconds pode ser um número ou um array, mapeado de uma
+    vez com np.searchsorted.
+    """
+    import numpy as np
+    table = np.asarray(timeline, dtype=np.float64).reshape(-1, 3)
+    compact_starts, original_starts, durations = table[:, 0], table[:, 1], table[:, 2]
+    seconds = np.asarray(seconds, dtype=np.float64)
+    index = np.maximum(np.searchsorted(compact_starts, seconds, side='right') - 1, 0)
+    # Instantes que caem no silêncio inserido entre regiões vão para o fim da região
+    mapped = original_starts[index] + np.clip(seconds - compact_starts[index], 0.0, durations[index])
+    return mapped.tolist()
+
+
+def remap_segments(segments, timeline):
+    """Levar segmentos (e palavras) do áudio compacto para os tempos originais
+
+    Todos os instantes (segmentos e palavras) são convertidos numa só chamada
+    a map_to_original, em vez de uma busca por instante.
+    """
+    times = []
+    for segment in segments:
+        times += [segment['start'], segment['end']]
+        for word in segment.get('words') or ():
+            times += [word['start'], word['end']]
+    if not times:
+        return [dict(segment) for segment in segments]
+    mapped = iter(map_to_original(times, timeline))
+    remapped = []
+    for segment in segments:
+        segment = dict(segment, start=next(mapped), end=next(mapped))
+        if segment.get('words'):
+            segment['words'] = [dict(word, start=next(mapped), end=next(mapped)) for word in segment['words']]
+        remapped.append(segment)
+    return remapped
+
+
+def remap_segment(segment, timeline):
+    """Levar um segmento (e palavras) do áudio compacto para os tempos originais"""
+    return remap_segments([segment], timeline)[0]
+
+
+class TranscriptionCache:
+    """Cache persistente de resultados, endereçado pelo conteúdo do áudio
+
+    A chave é o SHA-256 do PCM decodificado + modelo + opções de decodificação +
+    flag de diarização. Cada entrada é um JSON; o mtime marca o último acesso e
+    serve para a expiração por idade (max_age_days) e por tamanho (max_size_mb).
+    """
+
+    def __init__(self, cache_dir, max_size_mb=2048, max_age_days=30):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size_mb = max_size_mb
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(audio, model_name, options=None, diarization=False):
+        """Calcular a chave do cache a partir do áudio decodificado e das opções"""
+        digest = hashlib.sha256()
+        # Hash em blocos para não duplicar áudios longos na memória; WAV mapeado
+        # gera os mesmos float32 de decode_audio, então a chave é a mesma
+        if isinstance(audio, WavAudioSource):
+            for block in audio.blocks():
+                digest.update(memoryview(block).cast('B'))
+        else:
+            data = memoryview(audio).cast('B')
+            block = 16 * 1024 * 1024
+            for offset in range(0, len(data), block):
+                digest.update(data[offset:offset + block])
+        digest.update(json.dumps({
+            'model': model_name,
+            'options': options or {},
+            'diarization': bool(diarization)
+        }, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key):
+        """Retornar a entrada do cache ou None"""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            # Marca o acesso para a expiração LRU
+            os.utime(path, None)
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, transcription, language, speakers=None):
+        """Gravar resultado no cache (escrita atômica) e aplicar a expiração"""
+        entry = {
+            'created_at': datetime.now().isoformat(),
+            'language': language,
+            'transcription': transcription,
+            'speakers': speakers
+        }
+        path = self._entry_path(key)
+        temp_path = path.with_suffix('.tmp')
+        with self._lock:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+            self.evict()
+        return path
+
+    def evict(self):
+        """Remover entradas antigas e, se preciso, as menos acessadas até caber no limite"""
+        entries = []
+        for path in self.cache_dir.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append([stat.st_mtime, stat.st_size, path])
+        removed = 0
+        if self.max_age_days:
+            cutoff = time.time() - self.max_age_days * 86400
+            for entry in [e for e in entries if e[0] < cutoff]:
+                entry[2].unlink(missing_ok=True)
+                entries.remove(entry)
+                removed += 1
+        if self.max_size_mb:
+            entries.sort()
+            total = sum(e[1] for e in entries)
+            limit = self.max_size_mb * 1024 * 1024
+            while entries and total > limit:
+                mtime, size, path = entries.pop(0)
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+        return removed
+
+    def clear(self):
+        """Apagar todo o cache"""
+        removed = 0
+        for path in self.cache_dir.glob('*.json'):
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+
+def file_sha256(path, block_size=16 * 1024 * 1024):
+    """SHA-256 de um arquivo, lido em blocos"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_wav(path, audio, block_samples=1024 * 1024):
+    """Gravar áudio 16 kHz mono (float32 ou WavAudioSource) como WAV PCM 16 bits, em blocos
+
+    A conversão para int16 é feita bloco a bloco: nenhuma cópia do áudio inteiro.
+    """
+    import wave
+    import numpy as np
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        for offset in range(0, len(audio), block_samples):
+            if isinstance(audio, WavAudioSource):
+                wav.writeframes(audio.samples[offset:offset + block_samples].tobytes())
+                continue
+            block = np.array(audio[offset:offset + block_samples], dtype=np.float32) * np.float32(32768.0)
+            np.round(block, out=block)
+            np.clip(block, -32768, 32767, out=block)
+            wav.writeframes(block.astype('<i2').tobytes())
+    return Path(path)
+
+
+@contextlib.contextmanager
+def interprocess_lock(lock_path):
+    """Lock exclusivo entre processos (e threads) via arquivo: fcntl no POSIX, msvcrt no Windows"""
+    with open(lock_path, 'a+b') as handle:
+        if os.name == 'nt':
+            import msvcrt
+            handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK desiste após ~10s; continua tentando
+                    time.sleep(0.05)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+class TranscriptionCheckpoint:
+    """Checkpoints de uma transcrição longa, numa pasta própria por job
+
+    manifest.json guarda o plano de trechos, modelo e opções (o estado necessário
+    para continuar); cada trecho concluído vira chunk_NNNNN.json. Depois do
+    primeiro trecho, o manifesto aponta o WAV de origem ou, para áudio em memória,
+    audio.wav (PCM 16 bits, sem perda em relação ao ffmpeg), para que o job possa
+    ser retomado mesmo sem a fonte original.
+    """
+
+    def __init__(self, job_dir):
+        self.job_dir = Path(job_dir)
+        self.manifest_path = self.job_dir / 'manifest.json'
+        self.audio_path = self.job_dir / 'audio.wav'
+
+    def _write_json(self, path, data):
+        temp_path = path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def _chunk_path(self, index):
+        return self.job_dir / f"chunk_{index:05d}.json"
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def start(self, chunk_bounds, model_name, options, title=None, resume=True):
+        """Abrir o job; retorna {índice: resultado} dos trechos já concluídos"""
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        plan = {'chunks': [[round(start, 3), round(end, 3)] for start, end in chunk_bounds],
+                'model': model_name, 'options': options}
+        manifest = self.load_manifest()
+        same_plan = manifest and all(manifest.get(key) == value for key, value in plan.items())
+        if not (resume and same_plan):
+            for path in self.job_dir.glob('chunk_*.json'):
+                path.unlink(missing_ok=True)
+            manifest = dict(plan, created_at=datetime.now().isoformat())
+        manifest.update(status='running', title=title or manifest.get('title'),
+                        updated_at=datetime.now().isoformat())
+        self._write_json(self.manifest_path, manifest)
+        return self.completed(len(chunk_bounds))
+
+    def completed(self, total):
+        results = {}
+        for index in range(total):
+            try:
+                with open(self._chunk_path(index), 'r', encoding='utf-8') as f:
+                    results[index] = json.load(f)
+            except (OSError, ValueError):
+                continue
+        return results
+
+    def save_chunk(self, index, result):
+        self._write_json(self._chunk_path(index), result)
+
+    def source_path(self):
+        """Áudio de onde o job é retomado: o WAV de origem registrado ou a cópia do job"""
+        manifest = self.load_manifest() or {}
+        source = manifest.get('audio')
+        return Path(source) if source else self.audio_path
+
+    def save_audio(self, audio):
+        """Registrar (uma vez) de onde retomar o job sem a fonte original
+
+        Um WavAudioSource já está no disco: basta guardar o caminho no manifesto.
+        Outros áudios são gravados em audio.wav bloco a bloco, sem cópia inteira.
+        """
+        manifest = self.load_manifest() or {}
+        if manifest.get('audio') and Path(manifest['audio']).exists():
+            return Path(manifest['audio'])
+        if isinstance(audio, WavAudioSource):
+            source = audio.path.resolve()
+        else:
+            temp_path = self.audio_path.with_suffix('.tmp')
+            write_wav(temp_path, audio)
+            os.replace(temp_path, self.audio_path)
+            source = self.audio_path
+        manifest['audio'] = str(source)
+        self._write_json(self.manifest_path, manifest)
+        return source
+
+    def remove(self):
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+
+
+class DownloadIndex:
+    """Índice persistente de downloads, chaveado por extrator + ID do vídeo
+
+    Cada entrada guarda caminho, tamanho, mtime, formato e SHA-256 do arquivo.
+    Uma entrada só é reutilizada se o arquivo ainda existir com o mesmo tamanho;
+    se o mtime mudou, o checksum é recalculado antes de confiar no arquivo.
+    Leitura + gravação acontecem sob um lock de arquivo (download_index.lock),
+    já que threads do serviço e processos do batch têm cada um sua instância.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = Path(index_path)
+        self._lock = threading.Lock()
+        self.entries = self._load()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock, interprocess_lock(self.index_path.with_suffix('.lock')):
+            yield
+
+    @staticmethod
+    def make_key(extractor, video_id):
+        return f"{extractor}:{video_id}"
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        # Temporário único por escritor: gravações concorrentes não disputam o mesmo arquivo
+        temp_path = self.index_path.with_name(f"{self.index_path.stem}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def lookup(self, key):
+        """Retornar a entrada se o arquivo indexado ainda for válido, senão None"""
+        with self._locked():
+            # Outros processos (batch) podem ter gravado entradas novas
+            self.entries.update(self._load())
+            entry = self.entries.get(key)
+            if not entry:
+                return None
+            path = Path(entry['path'])
+            try:
+                stat = path.stat()
+            except OSError:
+                stat = None
+            valid = stat is not None and stat.st_size == entry.get('size')
+            if valid and stat.st_mtime != entry.get('mtime'):
+                valid = file_sha256(path) == entry.get('sha256')
+                if valid:
+                    entry['mtime'] = stat.st_mtime
+                    self._save()
+            if not valid:
+                del self.entries[key]
+                self._save()
+                return None
+            return dict(entry)
+
+    def record(self, key, path, title=None, format_id=None, url=None):
+        """Registrar um arquivo baixado (calcula o checksum)"""
+        path = Path(path)
+        stat = path.stat()
+        entry = {
+            'path': str(path),
+            'title': title,
+            'format': format_id,
+            'url': url,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': file_sha256(path),
+            'downloaded_at': datetime.now().isoformat()
+        }
+        with self._locked():
+            self.entries.update(self._load())
+            self.entries[key] = entry
+            self._save()
+        return entry
+
+
+class AudioRingBuffer:
+    """Buffer circular de tamanho fixo (float32) alimentado pelo callback de áudio
+
+    As posições são absolutas (amostras gravadas desde o início); apenas os
+    últimos capacity_seconds ficam disponíveis para leitura.
+    """
+
+    def __init__(self, capacity_seconds=120, sample_rate=SAMPLE_RATE):
+        import numpy as np
+        self.capacity = int(capacity_seconds * sample_rate)
+        self._data = np.zeros(self.capacity, dtype=np.float32)
+        self.total_written = 0
+        self._lock = threading.Lock()
+
+    def write(self, block):
+        """Adicionar amostras (int16 ou float32, mono) ao buffer"""
+        import numpy as np
+        samples = np.asarray(block).reshape(-1)
+        if samples.dtype == np.int16:
+            samples = samples.astype(np.float32) / 32768.0
+        if len(samples) > self.capacity:
+            samples = samples[-self.capacity:]
+        with self._lock:
+            position = self.total_written % self.capacity
+            first = min(len(samples), self.capacity - position)
+            self._data[position:position + first] = samples[:first]
+            self._data[:len(samples) - first] = samples[first:]
+            self.total_written += len(samples)
+
+    def oldest_available(self):
+        with self._lock:
+            return max(0, self.total_written - self.capacity)
+
+    def read(self, start, end):
+        """Copiar as amostras do intervalo absoluto [start, end)"""
+        import numpy as np
+        with self._lock:
+            start = max(start, self.total_written - self.capacity)
+            end = min(end, self.total_written)
+            if end <= start:
+                return np.zeros(0, dtype=np.float32)
+            indices = np.arange(start, end) % self.capacity
+            return self._data[indices]
+
+
+class StreamingWavWriter:
+    """Gravação incremental de WAV PCM 16-bit em uma thread dedicada
+
+    O callback de áudio apenas copia cada bloco para um buffer pré-alocado do
+    pool e o coloca na fila; a thread escritora grava no disco e devolve o
+    buffer ao pool. A memória fica limitada ao pool: se o disco não acompanhar,
+    blocos são descartados (contados em overflows/dropped_frames) e gravados
+    como silêncio do mesmo tamanho, para que a duração e os tempos do WAV
+    continuem iguais aos reais. O cabeçalho
+    é atualizado periodicamente e no fechamento, então um arquivo interrompido
+    continua legível (ver repair_header).
+    """
+
+    HEADER_SIZE = 44
+
+    def __init__(self, path, sample_rate=SAMPLE_RATE, channels=1, block_frames=4096,
+                 pool_blocks=64, header_interval_seconds=5):
+        import numpy as np
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_frames = block_frames
+        self.header_interval = header_interval_seconds
+        self.frames_written = 0
+        self.overflows = 0
+        self.dropped_frames = 0
+        self._pending_silence = 0
+        self._closed = False
+        self._free = queue.Queue()
+        for _ in range(pool_blocks):
+            self._free.put(np.empty((block_frames, channels), dtype=np.int16))
+        self._filled = queue.Queue()
+        self._file = open(self.path, 'wb')
+        self._file.write(self._header(0))
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _header(self, data_bytes):
+        byte_rate = self.sample_rate * self.channels * 2
+        return struct.pack(
+            '<4sI4s4sIHHIIHH4sI',
+            b'RIFF', 36 + data_bytes, b'WAVE',
+            b'fmt ', 16, 1, self.channels, self.sample_rate, byte_rate, self.channels * 2, 16,
+            b'data', data_bytes
+        )
+
+    def write(self, indata):
+        """Enfileirar um bloco de amostras int16 (chamado pelo callback de áudio)"""
+        for offset in range(0, len(indata), self.block_frames):
+            part = indata[offset:offset + self.block_frames]
+            try:
+                block = self._free.get_nowait()
+            except queue.Empty:
+                # Disco não acompanhou: descarta o bloco (o callback não pode bloquear)
+                # e reserva silêncio do mesmo tamanho no lugar dele
+                self.overflows += 1
+                self.dropped_frames += len(part)
+                self._pending_silence += len(part)
+                continue
+            self._flush_silence()
+            block[:len(part)] = part.reshape(len(part), self.channels)
+            self._filled.put((block, len(part)))
+
+    def _flush_silence(self):
+        if self._pending_silence:
+            self._filled.put((None, self._pending_silence))
+            self._pending_silence = 0
+
+    def _run(self):
+        last_header = time.time()
+        warned = False
+        while True:
+            item = self._filled.get()
+            if item is None:
+                break
+            if self.overflows and not warned:
+                print("\n⚠️ Disco lento: blocos de áudio descartados na gravação (gravados como silêncio)")
+                warned = True
+            block, frames = item
+            try:
+                if block is None:
+                    silence = bytes(self.block_frames * self.channels * 2)
+                    for offset in range(0, frames, self.block_frames):
+                        part = min(self.block_frames, frames - offset)
+                        self._file.write(silence[:part * self.channels * 2])
+                else:
+                    self._file.write(block[:frames].tobytes())
+                self.frames_written += frames
+            except Exception as e:
+                self._error = e
+            if block is not None:
+                self._free.put(block)
+            if time.time() - last_header >= self.header_interval:
+                self._patch_header()
+                last_header = time.time()
+
+    def _patch_header(self):
+        try:
+            position = self._file.tell()
+            self._file.seek(0)
+            self._file.write(self._header(self.frames_written * self.channels * 2))
+            self._file.seek(position)
+            self._file.flush()
+        except Exception as e:
+            self._error = e
+
+    def close(self):
+        """Esvaziar a fila, corrigir o cabeçalho e fechar o arquivo (idempotente)"""
+        if self._closed:
+            return self.frames_written / self.sample_rate
+        self._closed = True
+        self._flush_silence()
+        self._filled.put(None)
+        self._thread.join()
+        self._patch_header()
+        self._file.close()
+        if self.dropped_frames:
+            print(f"⚠️ {self.dropped_frames / self.sample_rate:.1f}s de áudio descartados em "
+                  f"{self.overflows} bloco(s) (silêncio no lugar)")
+        if self._error:
+            raise self._error
+        return self.frames_written / self.sample_rate
+
+    @staticmethod
+    def repair_header(path):
+        """Corrigir o cabeçalho de um WAV interrompido a partir do tamanho do arquivo
+
+        Só mexe em arquivos com o cabeçalho de 44 bytes gravado por esta classe;
+        retorna True se o cabeçalho precisou ser corrigido.
+        """
+        path = Path(path)
+        data_bytes = path.stat().st_size - StreamingWavWriter.HEADER_SIZE
+        if data_bytes < 0:
+            return False
+        data_bytes -= data_bytes % 2
+        with open(path, 'r+b') as f:
+            header = f.read(StreamingWavWriter.HEADER_SIZE)
+            if header[:4] != b'RIFF' or header[8:12] != b'WAVE' or header[36:40] != b'data':
+                return False
+            if struct.unpack('<I', header[40:44])[0] == data_bytes:
+                return False
+            f.seek(4)
+            f.write(struct.pack('<I', 36 + data_bytes))
+            f.seek(40)
+            f.write(struct.pack('<I', data_bytes))
+        return True
+
+
+def format_timestamp(seconds, separator=','):
+    """Converter segundos para HH:MM:SS,mmm (SRT) ou HH:MM:SS.mmm (WebVTT)"""
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    millisecs = int((seconds % 1) * 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millisecs:03d}"
+
+
+class SegmentWriter:
+    """Escritor incremental: cada segmento é gravado (e o arquivo descarregado)
+    assim que é produzido, então o arquivo parcial já pode ser usado"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.count = 0
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write_header()
+
+    def _write_header(self):
+        pass
+
+    def _format(self, segment):
+        raise NotImplementedError
+
+    def write(self, segment):
+        self.count += 1
+        self._file.write(self._format(segment))
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SrtSegmentWriter(SegmentWriter):
+    """Legendas SRT gravadas segmento a segmento"""
+
+    def _format(self, segment):
+        text = segment['text'].strip()
+        if segment.get('speaker'):
+            text = f"[{segment['speaker']}] {text}"
+        return (f"{self.count}\n{format_timestamp(segment['start'])} --> "
+                f"{format_timestamp(segment['end'])}\n{text}\n\n")
+
+
+class VttSegmentWriter(SegmentWriter):
+    """Legendas WebVTT gravadas segmento a segmento"""
+
+    def _write_header(self):
+        self._file.write("WEBVTT\n\n")
+        self._file.flush()
+
+    def _format(self, segment):
+        text = segment['text'].strip()
+        if segment.get('speaker'):
+            text = f"<v {segment['speaker']}>{text}"
+        return (f"{format_timestamp(segment['start'], '.')} --> "
+                f"{format_timestamp(segment['end'], '.')}\n{text}\n\n")
+
+
+class JsonlSegmentWriter(SegmentWriter):
+    """Um objeto JSON por linha, um segmento por vez (sem montar o resultado inteiro)"""
+
+    def _format(self, segment):
+        return json.dumps(segment, ensure_ascii=False) + "\n"
+
+
+SEGMENT_WRITERS = {
+    'srt': SrtSegmentWriter,
+    'vtt': VttSegmentWriter,
+    'jsonl': JsonlSegmentWriter
+}
+
+
+class SegmentWriterGroup:
+    """Vários escritores incrementais alimentados pelo mesmo fluxo de segmentos"""
+
+    def __init__(self, base_path, formats):
+        self.writers = {}
+        try:
+            for fmt in formats:
+                if fmt in SEGMENT_WRITERS:
+                    self.writers[fmt] = SEGMENT_WRITERS[fmt](f"{base_path}{EXPORT_FORMATS[fmt]}")
+        except Exception:
+            self.close()
+            raise
+
+    def write(self, segment):
+        for writer in self.writers.values():
+            writer.write(segment)
+
+    def paths(self):
+        return {fmt: str(writer.path) for fmt, writer in self.writers.items()}
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        return self.paths()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StreamingTranscriber:
+    """Transcrição incremental em segundo plano sobre um AudioRingBuffer
+
+    A cada step_seconds transcreve a janela a partir do último ponto confirmado.
+    Segmentos que terminam antes de (fim da janela - finalize_margin) são
+    finalizados e emitidos; os demais são parciais e serão refeitos na próxima
+    janela com mais contexto.
+    """
+
+    def __init__(self, model, ring, window_seconds=30, step_seconds=2.0, finalize_margin=3.0,
+                 language=None, on_partial=None, on_final=None):
+        self.model = model
+        self.ring = ring
+        self.window_samples = int(window_seconds * SAMPLE_RATE)
+        self.step_seconds = step_seconds
+        self.finalize_margin = finalize_margin
+        self.language = language
+        self.on_partial = on_partial
+        self.on_final = on_final
+        self.committed = 0
+        self.segments = []
+        self.languages = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, finalize=True):
+        """Parar o worker e finalizar todo o áudio restante (finalize=False só para)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        while finalize and self.committed < self.ring.total_written:
+            if not self._process(final=True):
+                break
+        return self.result()
+
+    def result(self):
+        language = self.language or (max(self.languages, key=self.languages.get) if self.languages else 'unknown')
+        return {
+            'text': ''.join(seg['text'] for seg in self.segments),
+            'segments': list(self.segments),
+            'language': language
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.step_seconds):
+            try:
+                self._process(final=False)
+            except Exception as e:
+                print(f"\n❌ Erro na transcrição em tempo real: {e}")
+
+    def _process(self, final):
+        """Transcrever uma janela; retorna True se avançou o ponto confirmado"""
+        end = self.ring.total_written
+        oldest = self.ring.oldest_available()
+        if self.committed < oldest:
+            print(f"\n⚠️ Transcrição atrasada: {(oldest - self.committed) / SAMPLE_RATE:.1f}s de áudio descartados")
+            self.committed = oldest
+        start = self.committed
+        window_end = min(end, start + self.window_samples)
+        if window_end - start < SAMPLE_RATE // 2 and not final:
+            return False
+        if window_end <= start:
+            return False
+        audio = self.ring.read(start, window_end)
+        result = self.model.transcribe(
+            audio, language=self.language, condition_on_previous_text=False, verbose=None
+        )
+        lang = result.get('language')
+        if lang:
+            self.languages[lang] = self.languages.get(lang, 0) + 1
+            # Fixar o idioma após a primeira detecção evita redetectar a cada janela
+            if self.language is None and result.get('segments'):
+                self.language = lang
+        offset = start / SAMPLE_RATE
+        window_length = (window_end - start) / SAMPLE_RATE
+        segments = [seg for seg in result.get('segments', []) if seg['text'].strip()]
+        window_full = window_end - start >= self.window_samples
+        if final:
+            ready = segments
+        else:
+            cut = window_length - self.finalize_margin
+            ready = [seg for seg in segments if seg['end'] <= cut]
+            if not ready and window_full:
+                # Janela cheia sem pausa: confirmar tudo menos o último segmento
+                ready = segments[:-1] or segments
+        for segment in ready:
+            final_segment = {
+                'id': len(self.segments),
+                'start': segment['start'] + offset,
+                'end': segment['end'] + offset,
+                'text': segment['text']
+            }
+            self.segments.append(final_segment)
+            if self.on_final:
+                self.on_final(final_segment)
+        if final:
+            # Fim da gravação: tudo o que estava na janela foi confirmado
+            self.committed = window_end
+        elif ready:
+            self.committed = start + int(ready[-1]['end'] * SAMPLE_RATE)
+        elif not segments and window_length > self.finalize_margin:
+            # Silêncio: avançar sem emitir nada, mantendo a margem final
+            self.committed = window_end - int(self.finalize_margin * SAMPLE_RATE)
+        partial = segments[len(ready):]
+        if partial and self.on_partial and not final:
+            self.on_partial(''.join(seg['text'] for seg in partial).strip())
+        return self.committed > start
+
+
+# Dependências: (pacote pip, módulo verificado). A verificação usa find_spec,
+# sem importar nada; cada módulo pesado só é importado no primeiro uso real
+DEPENDENCIES = [
+    ('yt-dlp', 'yt_dlp'),
+    ('openai-whisper', 'whisper'),
+    ('torch', 'torch'),
+    ('torchaudio', 'torchaudio'),
+    ('pyaudio', 'pyaudio'),
+    ('librosa', 'librosa'),
+    ('pyannote.audio', 'pyannote.audio'),
+    ('reportlab', 'reportlab'),
+    ('sounddevice', 'sounddevice'),
+    ('scipy', 'scipy'),
+    ('numpy', 'numpy'),
+]
+
+
+def is_module_available(import_name):
+    """Verificar se um módulo pode ser importado, sem importá-lo"""
+    try:
+        return importlib.util.find_spec(import_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+# FFmpeg resolvido uma vez por processo (caminhos + capacidades sondadas)
+_ffmpeg_info = None
+# Falha também fica registrada: sem nova busca (nem novo download) na sessão
+_ffmpeg_resolved = False
+_ffmpeg_lock = threading.Lock()
+# Filtros que dependem de hardware específico ficam fora da lista de capacidades
+HARDWARE_FILTER_MARKERS = ('cuda', 'npp', 'vaapi', 'qsv', 'opencl', 'vulkan',
+                           'videotoolbox', 'amf', 'cuvid', 'nvenc', 'libplacebo')
+
+
+def add_to_path(directory):
+    """Adicionar pasta ao início do PATH apenas se ainda não estiver lá"""
+    directory = str(directory)
+    if directory in os.environ.get('PATH', '').split(os.pathsep):
+        return False
+    os.environ['PATH'] = directory + os.pathsep + os.environ.get('PATH', '')
+    return True
+
+
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.flac', '.m4a', '.ogg', '.aac', '.opus', '.wma'}
+VIDEO_EXTENSIONS = {'.mp4', '.mkv', '.avi', '.mov', '.webm', '.flv', '.wmv', '.m4v'}
+MANIFEST_EXTENSIONS = {'.txt', '.json', '.jsonl'}
+# Formatos de exportação disponíveis (sufixo do arquivo); os lentos podem
+# terminar em segundo plano depois que os rápidos já foram salvos
+EXPORT_FORMATS = {
+    'txt': '_transcription.txt',
+    'json': '_data.json',
+    'srt': '_subtitles.srt',
+    'pdf': '_document.pdf',
+    'vtt': '_subtitles.vtt',
+    'jsonl': '_segments.jsonl'
+}
+DEFAULT_EXPORT_FORMATS = ['txt', 'json', 'srt', 'pdf']
+SLOW_EXPORT_FORMATS = {'pdf'}
+
+
+def media_stats(media):
+    """(segundos de áudio, bytes) de um array PCM 16 kHz ou de um arquivo (duração só para WAV)"""
+    if media is None:
+        return None, None
+    if isinstance(media, (str, Path)):
+        path = Path(media)
+        try:
+            size = path.stat().st_size
+        except OSError:
+            return None, None
+        seconds = None
+        if path.suffix.lower() == '.wav':
+            import wave
+            try:
+                with wave.open(str(path), 'rb') as wav:
+                    seconds = wav.getnframes() / wav.getframerate()
+            except (wave.Error, OSError, EOFError):
+                pass
+        return seconds, size
+    return len(media) / SAMPLE_RATE, getattr(media, 'nbytes', None)
+
+
+def transcript_duration(transcription_data):
+    """Fim do último segmento de uma transcrição (segundos)"""
+    segments = transcription_data.get('segments') if isinstance(transcription_data, dict) else None
+    return segments[-1]['end'] if segments else None
+
+
+class StageTracer:
+    """Medições por etapa do pipeline: tempo, CPU, memória, duração do áudio e bytes
+
+    Desligado por padrão: os métodos decorados com @traced chamam a função
+    direto. Ligado, cada etapa vira uma linha JSON em trace_path e os totais
+    por etapa ficam disponíveis no formato texto do Prometheus (arquivo
+    metrics_path e/ou endpoint /metrics do modo serviço).
+    CPU é a do processo inteiro (inclui threads do torch) mais a dos
+    subprocessos (ffmpeg); com etapas simultâneas os valores se sobrepõem.
+    """
+
+    def __init__(self, trace_path=None, metrics_path=None, enabled=None):
+        self.trace_path = Path(trace_path) if trace_path else None
+        self.metrics_path = Path(metrics_path) if metrics_path else None
+        self.enabled = bool(trace_path or metrics_path) if enabled is None else enabled
+        self.totals = {}
+        self.peak_rss_mb = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @staticmethod
+    def _usage():
+        """(CPU dos subprocessos, pico de RSS do processo em MB)"""
+        try:
+            import resource
+        except ImportError:
+            return 0.0, None
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reporta em KB, macOS em bytes
+        peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+        return children.ru_utime + children.ru_stime, peak_mb
+
+    @contextlib.contextmanager
+    def context(self, **fields):
+        """Campos extras (ex.: job) incluídos nos registros desta thread"""
+        previous = getattr(self._local, 'fields', {})
+        self._local.fields = dict(previous, **fields)
+        try:
+            yield
+        finally:
+            self._local.fields = previous
+
+    def start(self):
+        children_cpu, peak_mb = self._usage()
+        return time.perf_counter(), time.process_time(), children_cpu, peak_mb
+
+    def finish(self, stage, span, ok=True, error=None, audio_seconds=None, bytes_processed=None):
+        wall_start, cpu_start, children_start, peak_start = span
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        children_cpu, peak_mb = self._usage()
+        record = {
+            'time': datetime.now().isoformat(),
+            'stage': stage,
+            'status': 'ok' if ok else 'error',
+            'wall_seconds': round(wall, 6),
+            'cpu_seconds': round(cpu, 6),
+            'child_cpu_seconds': round(children_cpu - children_start, 6),
+            'peak_rss_mb': round(peak_mb, 1) if peak_mb is not None else None,
+            'peak_rss_growth_mb': round(peak_mb - peak_start, 1) if peak_mb is not None else None,
+            'audio_seconds': round(audio_seconds, 3) if audio_seconds else None,
+            'bytes': bytes_processed,
+            'thread': threading.current_thread().name
+        }
+        if error:
+            record['error'] = error
+        record.update(getattr(self._local, 'fields', {}))
+        self.record(record)
+        return record
+
+    def aggregate(self, record):
+        """Somar um registro aos totais por etapa"""
+        totals = self.totals.setdefault(record['stage'], {
+            'calls': {}, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+            'audio_seconds': 0.0, 'bytes': 0, 'last_wall_seconds': 0.0
+        })
+        totals['calls'][record['status']] = totals['calls'].get(record['status'], 0) + 1
+        totals['wall_seconds'] += record['wall_seconds']
+        totals['cpu_seconds'] += record['cpu_seconds'] + (record.get('child_cpu_seconds') or 0)
+        totals['audio_seconds'] += record.get('audio_seconds') or 0
+        totals['bytes'] += record.get('bytes') or 0
+        totals['last_wall_seconds'] = record['wall_seconds']
+        self.peak_rss_mb = max(self.peak_rss_mb, record.get('peak_rss_mb') or 0)
+
+    def record(self, record):
+        with self._lock:
+            self.aggregate(record)
+            if self.trace_path:
+                with open(self.trace_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            if self.metrics_path:
+                self.write_metrics()
+
+    def replay(self, trace_path, offset=0):
+        """Agregar registros gravados por outros processos (workers do batch)"""
+        try:
+            with open(trace_path, 'r', encoding='utf-8') as f:
+                f.seek(offset)
+                lines = f.readlines()
+        except OSError:
+            return 0
+        count = 0
+        with self._lock:
+            for line in lines:
+                try:
+                    self.aggregate(json.loads(line))
+                    count += 1
+                except (ValueError, KeyError):
+                    continue
+            if self.metrics_path:
+                self.write_metrics()
+        return count
+
+    def prometheus_text(self):
+        """Totais no formato texto de exposição do Prometheus"""
+        prefix = 'video_transcriber_stage'
+        metrics = [
+            ('wall_seconds_total', 'counter', "Tempo total (relógio) gasto na etapa", 'wall_seconds'),
+            ('cpu_seconds_total', 'counter', "CPU total (processo + subprocessos) gasta na etapa", 'cpu_seconds'),
+            ('audio_seconds_total', 'counter', "Segundos de áudio processados pela etapa", 'audio_seconds'),
+            ('bytes_total', 'counter', "Bytes processados pela etapa", 'bytes'),
+            ('last_wall_seconds', 'gauge', "Duração da última execução da etapa", 'last_wall_seconds'),
+        ]
+        lines = [f"# HELP {prefix}_calls_total Execuções da etapa por status",
+                 f"# TYPE {prefix}_calls_total counter"]
+        for stage, totals in sorted(self.totals.items()):
+            for status, count in sorted(totals['calls'].items()):
+                lines.append(f'{prefix}_calls_total{{stage="{stage}",status="{status}"}} {count}')
+        for name, kind, help_text, field in metrics:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for stage, totals in sorted(self.totals.items()):
+                lines.append(f'{prefix}_{name}{{stage="{stage}"}} {totals[field]:.6g}')
+        lines.append("# HELP video_transcriber_peak_rss_bytes Pico de memória residente observado")
+        lines.append("# TYPE video_transcriber_peak_rss_bytes gauge")
+        lines.append(f"video_transcriber_peak_rss_bytes {int(self.peak_rss_mb * 1024 * 1024)}")
+        return '\n'.join(lines) + '\n'
+
+    def write_metrics(self):
+        temp_path = self.metrics_path.with_suffix('.tmp')
+        temp_path.write_text(self.prometheus_text(), encoding='utf-8')
+        os.replace(temp_path, self.metrics_path)
+
+
+def _result_ok(result):
+    """Métodos do transcriber sinalizam falha com None/False/(None, None) ou {} (nada salvo)"""
+    if isinstance(result, tuple):
+        result = result[0] if result else None
+    # Arrays de áudio não podem ir para "!= {}" (comparação elemento a elemento)
+    return result is not None and result is not False and not (isinstance(result, dict) and not result)
+
+
+def traced(stage, describe=None):
+    """Decorador de etapa: mede com self.tracer; desligado, só chama o método
+
+    describe(self, resultado, *args, **kwargs) retorna (segundos de áudio, bytes).
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            tracer = self.tracer
+            if not tracer.enabled:
+                return method(self, *args, **kwargs)
+            span = tracer.start()
+            result, error = None, None
+            try:
+                result = method(self, *args, **kwargs)
+                return result
+            except BaseException as e:
+                error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                audio_seconds, bytes_processed = None, None
+                if describe:
+                    try:
+                        audio_seconds, bytes_processed = describe(self, result, *args, **kwargs)
+                    except Exception:
+                        pass
+                tracer.finish(stage, span, error is None and _result_ok(result), error,
+                              audio_seconds, bytes_processed)
+        return wrapper
+    return decorator
+
+
+def _describe_download(self, result, url):
+    return None, media_stats(result[0] if result else None)[1]
+
+
+def _describe_stream_download(self, result, url):
+    return media_stats(result[0] if result else None)
+
+
+def _describe_extract(self, result, video_path, *args):
+    return media_stats(result)[0], media_stats(video_path)[1]
+
+
+def _describe_input_audio(self, result, audio_path, *args, **kwargs):
+    seconds, size = media_stats(audio_path)
+    if seconds is None and isinstance(result, tuple) and result:
+        seconds = transcript_duration(result[0])
+    return seconds, size
+
+
+def _describe_save(self, result, title, transcription_data, *args, **kwargs):
+    size = sum(media_stats(path)[1] or 0 for path in (result or {}).values())
+    return transcript_duration(transcription_data), size
+
+
+def is_url(source):
+    """Verificar se a fonte é uma URL"""
+    return source.startswith(('http://', 'https://', 'www.'))
+
+
 class EnhancedVideoTranscriber:
-    def __init__(self):
+    def __init__(self, model_memory_budget_mb=None, base_dir=None):
         print("🎙️ Iniciando Video Transcriber Avançado...")
         self.system = platform.system().lower()
+        # Pasta das pastas de trabalho (padrão: a pasta do script); workers recebem a do processo principal
+        self.base_dir = Path(base_dir) if base_dir else Path(__file__).parent
         self.setup_folders()
+        self.repair_interrupted_recordings()
+        # Modelos Whisper carregados ficam em cache entre os arquivos da sessão
+        self.model_registry = ModelRegistry(memory_budget_mb=model_memory_budget_mb)
+        # Modelo Whisper e modo de inferência ('default' ou 'int8' quantizado em CPU)
+        self.model_name = 'base'
+        self.inference_mode = 'default'
+        # Threads do torch (None = padrão do torch)
+        self.torch_threads = None
+        self.torch_interop_threads = None
+        # Motor de transcrição (ASR_BACKENDS): 'whisper' ou 'faster-whisper'
+        self.asr_backend = 'whisper'
+        # Decodificação em lote (BatchedDecoder): janelas de 30 s de vários jobs
+        # juntas no mesmo lote; 0/1 desativa (só motor whisper, áudios curtos)
+        self.decode_batch_size = 0
+        self.batch_scheduler = None
+        # Modelos falsos (StubWhisperModel/StubDiarizationPipeline) para testes sem torch
+        self.stub_model = False
+        # Pipelines de diarização (pyannote) também ficam residentes após o primeiro uso
+        self.diarization_registry = ModelRegistry(memory_budget_mb=model_memory_budget_mb)
+        # Em modo batch/headless nenhuma pergunta é feita ao usuário
+        self.interactive = True
+        self.missing_dependencies = []
+        # Extrair áudio dos vídeos direto para a memória (sem WAV temporário)
+        self.in_memory_audio = True
+        # URLs: baixar só o áudio (bestaudio) em stream, sem o arquivo de vídeo
+        self.audio_only_downloads = True
+        self.max_concurrent_downloads = 3
+        # Guardar o PCM recebido em stream como WAV no índice de downloads (~115 MB
+        # por hora): a mesma URL não volta à rede, ao custo de disco (opt-in)
+        self.keep_streamed_audio = False
+        # Modo longo: áudios a partir deste tamanho são divididos em trechos
+        # com sobreposição e transcritos em paralelo (None desativa)
+        self.long_form_min_seconds = 20 * 60
+        self.chunk_seconds = 10 * 60
+        self.chunk_overlap_seconds = 5
+        self.chunk_workers = max(1, min(4, (os.cpu_count() or 2) // 2))
+        self._chunk_executor = None
+        self._chunk_executor_workers = 0
+        # Diarização roda em paralelo à transcrição num processo próprio,
+        # cada um com seu orçamento de threads do torch (None = metade dos núcleos)
+        self.parallel_diarization = True
+        self.diarization_threads = None
+        self._diarization_executor = None
+        # Formatos gerados por job; exportadores rodam em paralelo e os lentos
+        # (PDF) podem terminar em segundo plano
+        self.output_formats = list(DEFAULT_EXPORT_FORMATS)
+        self.background_slow_exports = True
+        # Formatos gravados segmento a segmento enquanto a transcrição ainda roda
+        # (modo tempo real e áudios longos)
+        self.incremental_formats = ['srt', 'vtt', 'jsonl']
+        self._export_executor = None
+        self.pending_exports = []
+        # Cache de resultados em disco (mesmo áudio + mesmas opções = sem retranscrever)
+        self.use_result_cache = True
+        self.result_cache = TranscriptionCache(self.folders['cache'])
+        # WAV 16 kHz mono do disco é mapeado (np.memmap) em vez de carregado inteiro
+        self.memmap_wav = True
+        # VAD antes do modelo: silêncio não é transcrito e áudio mudo é rejeitado na hora
+        self.vad_filter = True
+        self.vad_min_silence = 0.1
+        # Áudios longos gravam cada trecho concluído; um job interrompido continua de onde parou
+        self.checkpoint_long_form = True
+        self.resume_transcriptions = True
+        self.current_title = None
+        # Medições por etapa (desligadas até receber trace_path/metrics_path)
+        self.tracer = StageTracer()
+        # Índice de downloads (extrator + ID): URLs repetidas não voltam à rede
+        self.download_index = DownloadIndex(self.folders['downloads'] / 'download_index.json')
+        self.last_saved_files = {}
         # Idiomas mantidos para exibição e detecção, mas sem funcionalidade de tradução
         self.languages = {
             'pt': 'Português',
@@ -41,105 +2076,169 @@ class EnhancedVideoTranscriber:
 
     def setup_folders(self):
         """Criar estrutura de pastas"""
-        base_dir = Path(__file__).parent
+        base_dir = self.base_dir
         self.folders = {
             'downloads': base_dir / 'video_downloads',
             'audio': base_dir / 'extracted_audio',
             'transcripts': base_dir / 'transcriptions',
             'tools': base_dir / 'video_tools',
             'models': base_dir / 'translation_models', # Pasta mantida por compatibilidade
-            'recordings': base_dir / 'live_recordings'
+            'recordings': base_dir / 'live_recordings',
+            'cache': base_dir / 'transcription_cache',
+            'checkpoints': base_dir / 'transcription_checkpoints'
         }
         for folder_path in self.folders.values():
             folder_path.mkdir(exist_ok=True)
             print(f"✅ {folder_path.name}: {folder_path}")
 
-    def install_package(self, package_name, import_name=None):
-        """Instalar pacote Python"""
+    def install_package(self, package_name, import_name=None, install_missing=True):
+        """Verificar pacote Python (sem importar) e instalar se solicitado"""
         if import_name is None:
             import_name = package_name
-        try:
-            __import__(import_name)
+        if is_module_available(import_name):
             print(f"✅ {package_name} já instalado")
             return True
-        except ImportError:
-            print(f"📦 Instalando {package_name}...")
-            try:
-                subprocess.check_call([
-                    sys.executable, '-m', 'pip', 'install', package_name,
-                    '--quiet', '--disable-pip-version-check'
-                ])
-                print(f"✅ {package_name} instalado com sucesso!")
-                return True
-            except Exception as e:
-                print(f"❌ Erro instalando {package_name}: {e}")
-                return False
+        if not install_missing:
+            print(f"⚠️ {package_name} não instalado")
+            return False
+        print(f"📦 Instalando {package_name}...")
+        try:
+            subprocess.check_call([
+                sys.executable, '-m', 'pip', 'install', package_name,
+                '--quiet', '--disable-pip-version-check'
+            ])
+            importlib.invalidate_caches()
+            print(f"✅ {package_name} instalado com sucesso!")
+            return True
+        except Exception as e:
+            print(f"❌ Erro instalando {package_name}: {e}")
+            return False
 
-    def setup_dependencies(self):
-        """Instalar todas as dependências automaticamente"""
-        print("\n🔧 Configurando dependências...")
-        # Lista de dependências essenciais (argostranslate removido)
-        dependencies = [
-            ('yt-dlp', 'yt_dlp'),
-            ('openai-whisper', 'whisper'),
-            ('torch', 'torch'),
-            ('torchaudio', 'torchaudio'),
-            ('pyaudio', 'pyaudio'),
-            ('librosa', 'librosa'),
-            ('pyannote.audio', 'pyannote'),
-            ('reportlab', 'reportlab'),
-            ('sounddevice', 'sounddevice'),
-            ('scipy', 'scipy'),
-            ('numpy', 'numpy'),
-        ]
-        failed_deps = []
-        for package, import_name in dependencies:
-            if not self.install_package(package, import_name):
-                failed_deps.append(package)
-        if failed_deps:
-            print(f"⚠️ Falha ao instalar: {', '.join(failed_deps)}")
+    def setup_dependencies(self, install_missing=False):
+        """Verificar dependências; instalar as ausentes apenas se solicitado"""
+        print("\n🔧 Verificando dependências...")
+        self.missing_dependencies = []
+        for package, import_name in DEPENDENCIES:
+            if not self.install_package(package, import_name, install_missing):
+                self.missing_dependencies.append(package)
+        if self.missing_dependencies:
+            print(f"⚠️ Ausentes: {', '.join(self.missing_dependencies)}")
             print("⚠️ Algumas funcionalidades podem não funcionar")
-        print("✅ Setup de dependências concluído!")
+            if not install_missing:
+                print("💡 Instale com: python video.py --install-deps")
+        print("✅ Verificação de dependências concluída!")
         return True
 
-    def setup_ffmpeg(self):
-        """Configurar FFmpeg automaticamente - Prioriza o local da pasta tools"""
-        # 1. Verificar se já existe na pasta tools PRIMEIRO
-        ffmpeg_path = self.folders['tools'] / ('ffmpeg.exe' if self.system == 'windows' else 'ffmpeg')
-        if ffmpeg_path.exists():
-            print("✅ FFmpeg encontrado na pasta tools")
-            # Adicionar ao PATH para que o Whisper encontre
-            os.environ['PATH'] = str(self.folders['tools']) + os.pathsep + os.environ.get('PATH', '')
-            return str(ffmpeg_path)
-        
-        # 2. TENTAR FFmpeg do sistema
-        try:
-            print("🔍 Verificando FFmpeg do sistema...")
-            result = subprocess.run(
-                ['ffmpeg', '-version'],
-                capture_output=True,
-                text=True,
-                check=True,
-                shell=(self.system == 'windows')
-            )
-            if result.returncode == 0:
-                print("✅ FFmpeg do sistema disponível")
-                return 'ffmpeg'
-        except (FileNotFoundError, subprocess.CalledProcessError) as e:
-            print(f"⚠️ FFmpeg do sistema não encontrado ou não funcionando: {e}")
-        except Exception as e:
-             print(f"⚠️ Erro inesperado ao verificar FFmpeg do sistema: {e}")
+    def resolve_ffmpeg(self):
+        """Localizar ffmpeg/ffprobe uma única vez por processo (com capacidades)
 
-        # 3. Download automático para Windows
-        if self.system == 'windows':
-            downloaded_path = self.download_ffmpeg_windows()
-            if downloaded_path:
-                # Adicionar ao PATH após download
-                os.environ['PATH'] = str(self.folders['tools']) + os.pathsep + os.environ.get('PATH', '')
-                return downloaded_path
+        Ordem: pasta tools, PATH do sistema, download automático (Windows).
+        Retorna dict com caminhos, versão, decoders e filtros, ou None.
+        """
+        global _ffmpeg_info, _ffmpeg_resolved
+        with _ffmpeg_lock:
+            if _ffmpeg_resolved:
+                return _ffmpeg_info
+            _ffmpeg_resolved = True
+            exe = '.exe' if self.system == 'windows' else ''
+            # 1. Verificar se já existe na pasta tools PRIMEIRO
+            local_ffmpeg = self.folders['tools'] / f'ffmpeg{exe}'
+            if local_ffmpeg.exists():
+                print("✅ FFmpeg encontrado na pasta tools")
+                ffmpeg_path = str(local_ffmpeg)
             else:
-                print("❌ Falha ao baixar FFmpeg.")
+                # 2. FFmpeg do sistema (busca no PATH, sem abrir subprocesso)
+                ffmpeg_path = shutil.which('ffmpeg')
+                if ffmpeg_path:
+                    print(f"✅ FFmpeg do sistema disponível: {ffmpeg_path}")
+                elif self.system == 'windows':
+                    # 3. Download automático para Windows
+                    ffmpeg_path = self.download_ffmpeg_windows()
+                    if not ffmpeg_path:
+                        print("❌ Falha ao baixar FFmpeg.")
+            if not ffmpeg_path:
+                return None
+            ffmpeg_dir = Path(ffmpeg_path).parent
+            if ffmpeg_dir == self.folders['tools']:
+                # Adicionar ao PATH (uma vez) para que o Whisper encontre
+                add_to_path(ffmpeg_dir)
+            local_ffprobe = ffmpeg_dir / f'ffprobe{exe}'
+            ffprobe_path = str(local_ffprobe) if local_ffprobe.exists() else shutil.which('ffprobe')
+            _ffmpeg_info = self.load_ffmpeg_capabilities(ffmpeg_path, ffprobe_path)
+            return _ffmpeg_info
+
+    def load_ffmpeg_capabilities(self, ffmpeg_path, ffprobe_path):
+        """Capacidades do binário, do cache em disco ou sondadas (uma vez por binário)
+
+        O cache fica em tools/ffmpeg_capabilities.json, indexado por caminho,
+        tamanho e mtime do executável, então trocar o ffmpeg invalida a entrada.
+        """
+        cache_path = self.folders['tools'] / 'ffmpeg_capabilities.json'
+        try:
+            stat = os.stat(ffmpeg_path)
+            fingerprint = f"{os.path.realpath(ffmpeg_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        except OSError:
+            fingerprint = None
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        if fingerprint and fingerprint in cache:
+            info = cache[fingerprint]
+            info.update({'ffmpeg': ffmpeg_path, 'ffprobe': ffprobe_path})
+            return info
+        print("🔍 Verificando capacidades do FFmpeg...")
+        info = {
+            'ffmpeg': ffmpeg_path,
+            'ffprobe': ffprobe_path,
+            'version': None,
+            'decoders': {'audio': [], 'video': []},
+            'filters': []
+        }
+        try:
+            output = self._run_ffmpeg_query(ffmpeg_path, '-version')
+            info['version'] = output.splitlines()[0].strip() if output else None
+            for line in self._run_ffmpeg_query(ffmpeg_path, '-decoders').splitlines():
+                match = re.match(r'^\s*([AVS])[.A-Z]{5}\s+(\S+)', line)
+                if match and match.group(1) in 'AV' and match.group(2) != '=':
+                    kind = 'audio' if match.group(1) == 'A' else 'video'
+                    info['decoders'][kind].append(match.group(2))
+            for line in self._run_ffmpeg_query(ffmpeg_path, '-filters').splitlines():
+                match = re.match(r'^\s*[.A-Z|]{2,3}\s+(\S+)\s+\S+->\S+', line)
+                if match and not any(marker in match.group(1) for marker in HARDWARE_FILTER_MARKERS):
+                    info['filters'].append(match.group(1))
+        except Exception as e:
+            print(f"⚠️ Não foi possível sondar o FFmpeg: {e}")
+            return info
+        if info['version']:
+            print(f"✅ {info['version']}")
+        if fingerprint:
+            cache[fingerprint] = {k: v for k, v in info.items() if k not in ('ffmpeg', 'ffprobe')}
+            try:
+                with open(cache_path, 'w', encoding='utf-8') as f:
+                    json.dump(cache, f, indent=2)
+            except OSError:
+                pass
+        return info
+
+    def _run_ffmpeg_query(self, ffmpeg_path, flag):
+        result = subprocess.run(
+            [ffmpeg_path, '-hide_banner', flag],
+            capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=30
+        )
+        return result.stdout
+
+    def ffmpeg_command(self):
+        """Caminho do ffmpeg resolvido (ou 'ffmpeg', deixando o PATH decidir)"""
+        info = self.resolve_ffmpeg()
+        return info['ffmpeg'] if info else 'ffmpeg'
 
+    def setup_ffmpeg(self):
+        """Configurar FFmpeg automaticamente - Prioriza o local da pasta tools"""
+        info = self.resolve_ffmpeg()
+        if info:
+            return info['ffmpeg']
         # 4. Último recurso: Avisar para instalar manualmente
         print("⚠️ FFmpeg não encontrado. É essencial para o funcionamento.")
         print("💡 Tente instalar manualmente:")
@@ -154,6 +2253,9 @@ class EnhancedVideoTranscriber:
     def download_ffmpeg_windows(self):
         """Download automático do FFmpeg para Windows"""
         print("📥 Baixando FFmpeg para Windows...")
+        import tempfile
+        import urllib.request
+        import zipfile
         try:
             url = "https://github.com/BtbN/FFmpeg-Builds/releases/download/latest/ffmpeg-master-latest-win64-gpl.zip"
             temp_zip = tempfile.gettempdir() + "/ffmpeg.zip"
@@ -203,28 +2305,7 @@ class EnhancedVideoTranscriber:
                 )
                 sd.wait()  # Aguardar conclusão
             else:
-                print("🔴 Gravando... Pressione Enter para parar!")
-                # Gravar até o usuário pressionar Enter
-                audio_chunks = []
-
-                def callback(indata, frames, time, status):
-                    audio_chunks.append(indata.copy())
-
-                # Iniciar stream
-                stream = sd.InputStream(
-                    callback=callback,
-                    samplerate=sample_rate,
-                    channels=channels,
-                    dtype=np.int16
-                )
-                with stream:
-                    input()  # Aguardar Enter
-                # Concatenar chunks
-                if audio_chunks:
-                    audio_data = np.concatenate(audio_chunks, axis=0)
-                else:
-                    print("❌ Nenhum áudio gravado")
-                    return None
+                return self._record_until_enter(sd, np)
             # Salvar arquivo
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"recording_{timestamp}.wav"
@@ -243,18 +2324,199 @@ class EnhancedVideoTranscriber:
             print(f"❌ Erro na gravação: {e}")
             return None
 
+    def get_diarization_pipeline(self, pipeline_name="pyannote/speaker-diarization-3.1", device=None):
+        """Obter pipeline de diarização do cache, construindo apenas na primeira vez"""
+        if self.stub_model:
+            return self.diarization_registry.get((pipeline_name, 'stub', 'float32'), StubDiarizationPipeline)
+        import torch
+        from pyannote.audio import Pipeline
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        key = (pipeline_name, device, 'float32')
+        if key in self.diarization_registry:
+            print("♻️ Reutilizando modelo de detecção de speakers em memória")
+        else:
+            print("📦 Carregando modelo de detecção de speakers...")
+            print("⏳ Primeira vez pode demorar (download do modelo)...")
+
+        def load():
+            pipeline = Pipeline.from_pretrained(pipeline_name)
+            if pipeline is None:
+                raise RuntimeError(f"Não foi possível carregar o pipeline {pipeline_name}")
+            return pipeline.to(torch.device(device))
+
+        return self.diarization_registry.get(key, load)
+
+    def release_diarization_pipelines(self):
+        """Liberar os pipelines de diarização mantidos em memória"""
+        # O processo de diarização paralela mantém sua própria cópia do pipeline
+        if self._diarization_executor is not None:
+            self._diarization_executor.shutdown(wait=True)
+            self._diarization_executor = None
+        released = self.diarization_registry.release()
+        if released:
+            print(f"🗑️ {released} pipeline(s) de diarização liberado(s) da memória")
+        return released
+
+    def _diarization_input(self, audio):
+        """Converter áudio em memória para o formato aceito pelo pyannote"""
+        if isinstance(audio, WavAudioSource):
+            # O pyannote lê o arquivo sozinho (sem uma segunda cópia float32 aqui)
+            audio = audio.path
+        if isinstance(audio, (str, Path)):
+            return str(audio)
+        if self.stub_model:
+            return audio
+        import torch
+        return {'waveform': torch.from_numpy(audio).unsqueeze(0), 'sample_rate': SAMPLE_RATE}
+
+    def _record_until_enter(self, sd, np):
+        """Gravar até o usuário pressionar Enter, gravando direto no disco"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"recording_{timestamp}.wav"
+        filepath = self.folders['recordings'] / filename
+        block_frames = 4096
+        writer = StreamingWavWriter(filepath, SAMPLE_RATE, 1, block_frames=block_frames)
+
+        def callback(indata, frames, time, status):
+            writer.write(indata)
+
+        print("🔴 Gravando... Pressione Enter para parar!")
+        try:
+            # Iniciar stream
+            stream = sd.InputStream(
+                callback=callback,
+                samplerate=SAMPLE_RATE,
+                channels=1,
+                dtype=np.int16,
+                blocksize=block_frames
+            )
+            with stream:
+                input()  # Aguardar Enter
+        finally:
+            duration = writer.close()
+        if writer.overflows:
+            print(f"⚠️ Disco lento: {writer.overflows} bloco(s) descartado(s) "
+                  f"({writer.dropped_frames / SAMPLE_RATE:.1f}s de áudio)")
+        if not writer.frames_written:
+            print("❌ Nenhum áudio gravado")
+            filepath.unlink(missing_ok=True)
+            return None
+        file_size = filepath.stat().st_size / (1024 * 1024)
+        print(f"✅ Gravação salva: {filename}")
+        print(f"📊 Duração: {duration:.1f}s, Tamanho: {file_size:.1f}MB")
+        return str(filepath)
+
+    def record_and_transcribe_live(self, title, window_seconds=30, step_seconds=2.0):
+        """Gravar do microfone transcrevendo em tempo real (Enter para parar)
+
+        Os segmentos finalizados já vão sendo gravados nos formatos incrementais.
+        Retorna (transcrição, idioma, caminho do WAV gravado).
+        """
+        print("🎤 Iniciando gravação com transcrição em tempo real...")
+        try:
+            import sounddevice as sd
+            import numpy as np
+        except ImportError:
+            print("❌ Biblioteca de áudio não instalada")
+            print("Instale com: pip install sounddevice scipy")
+            return None, None, None
+        writer = None
+        writers = None
+        streamer = None
+        try:
+            model = self.get_asr_engine()
+            ring = AudioRingBuffer(capacity_seconds=max(120, window_seconds * 4))
+
+            def show_partial(text):
+                # \x1b[K limpa o resto da linha (hipóteses anteriores mais longas)
+                print(f"\r\x1b[K⏳ {text[-100:]}", end='', flush=True)
+
+            writers = SegmentWriterGroup(self.output_base_path(title), self.active_incremental_formats())
+
+            def show_final(segment):
+                print(f"\r\x1b[K[{self.seconds_to_srt_time(segment['start'])[:8]}] {segment['text'].strip()}")
+                writers.write(segment)
+
+            streamer = StreamingTranscriber(
+                model, ring, window_seconds=window_seconds, step_seconds=step_seconds,
+                on_partial=show_partial, on_final=show_final
+            )
+
+            # O áudio completo vai direto para o disco; o ring só guarda a janela recente
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filepath = self.folders['recordings'] / f"recording_{timestamp}.wav"
+            writer = StreamingWavWriter(filepath, SAMPLE_RATE, 1)
+
+            def callback(indata, frames, time, status):
+                ring.write(indata[:, 0])
+                writer.write(indata)
+
+            stream = sd.InputStream(
+                callback=callback,
+                samplerate=SAMPLE_RATE,
+                channels=1,
+                dtype=np.int16,
+                blocksize=writer.block_frames
+            )
+            print("🔴 Gravando... Pressione Enter para parar!")
+            streamer.start()
+            with stream:
+                input()  # Aguardar Enter
+            duration = writer.close()
+            writer = None
+            print("⏹️ Finalizando transcrição...")
+            result = streamer.stop()
+            streamer = None
+            print(f"📊 Duração: {duration:.1f}s, {len(result['segments'])} segmentos")
+            if not result['text'].strip():
+                print("⚠️ Nenhum texto foi transcrito")
+                return None, None, str(filepath)
+            return result, result['language'], str(filepath)
+        except Exception as e:
+            print(f"❌ Erro na gravação: {e}")
+            # O áudio já gravado continua disponível (cabeçalho finalizado abaixo)
+            return None, None, str(writer.path) if writer is not None else None
+        finally:
+            # Em caso de erro a thread de transcrição não pode continuar lendo o ring
+            if streamer is not None:
+                streamer.stop(finalize=False)
+            if writer is not None:
+                self._finalize_recording(writer)
+            if writers is not None:
+                writers.close()
+
+    def _finalize_recording(self, writer):
+        """Fechar o WAV de uma gravação interrompida com o cabeçalho consistente"""
+        try:
+            writer.close()
+        except Exception as e:
+            print(f"⚠️ Erro finalizando a gravação: {e}")
+        try:
+            StreamingWavWriter.repair_header(writer.path)
+        except OSError:
+            pass
+
+    def repair_interrupted_recordings(self):
+        """Corrigir cabeçalhos de gravações interrompidas (processo encerrado no meio)"""
+        for path in self.folders['recordings'].glob('recording_*.wav'):
+            try:
+                if StreamingWavWriter.repair_header(path):
+                    print(f"🩹 Gravação interrompida recuperada: {path.name}")
+            except OSError:
+                pass
+
+    @traced('detect_speakers', _describe_input_audio)
     def detect_speakers(self, audio_path):
         """Detectar e separar speakers no áudio"""
         print("👥 Detectando speakers...")
         try:
-            from pyannote.audio import Pipeline
-            # Carregar pipeline de diarização
-            print("📦 Carregando modelo de detecção de speakers...")
-            print("⏳ Primeira vez pode demorar (download do modelo)...")
-            pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization-3.1")
+            # Carregar pipeline de diarização (reutilizado entre chamadas)
+            pipeline = self.get_diarization_pipeline()
             # Processar áudio
             print("🔄 Analisando speakers...")
-            diarization = pipeline(audio_path)
+            with model_lock(pipeline):
+                diarization = pipeline(self._diarization_input(audio_path))
             # Extrair informações dos speakers
             speakers_info = []
             for turn, _, speaker in diarization.itertracks(yield_label=True):
@@ -265,13 +2527,9 @@ class EnhancedVideoTranscriber:
                     'duration': turn.end - turn.start
                 })
             # Estatísticas
-            unique_speakers = set(info['speaker'] for info in speakers_info)
-            print(f"✅ Detectados {len(unique_speakers)} speakers:")
-            for speaker in sorted(unique_speakers):
-                speaker_time = sum(
-                    info['duration'] for info in speakers_info
-                    if info['speaker'] == speaker
-                )
+            stats = speaker_statistics(speakers_info)
+            print(f"✅ Detectados {len(stats)} speakers:")
+            for speaker, speaker_time in stats.items():
                 print(f"  {speaker}: {speaker_time:.1f}s")
             return speakers_info
         except ImportError:
@@ -282,24 +2540,85 @@ class EnhancedVideoTranscriber:
             print(f"❌ Erro na detecção de speakers: {e}")
             return None
 
-    def transcribe_with_speakers(self, audio_path):
+    def thread_budgets(self):
+        """Dividir os núcleos entre transcrição e diarização (threads do torch)"""
+        cores = os.cpu_count() or 2
+        diarization = self.diarization_threads or max(1, cores // 2)
+        diarization = min(diarization, max(1, cores - 1))
+        return max(1, cores - diarization), diarization
+
+    def _get_diarization_executor(self, num_threads):
+        """Processo persistente de diarização (pipeline fica residente nele)"""
+        if self._diarization_executor is None:
+            context = multiprocessing.get_context('spawn')
+            self._diarization_executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=context,
+                initializer=_init_diarization_worker, initargs=(num_threads, str(self.base_dir))
+            )
+        return self._diarization_executor
+
+    def _transcribe_and_diarize_concurrently(self, audio_path, on_segment=None):
+        """Rodar transcrição (neste processo) e diarização (processo próprio) ao mesmo tempo"""
+        transcription_threads, diarization_threads = self.thread_budgets()
+        print(f"⚡ Transcrição ({transcription_threads} threads) e diarização "
+              f"({diarization_threads} threads) em paralelo")
+        shm = None
+        if isinstance(audio_path, (str, Path)):
+            audio_ref = str(audio_path)
+        elif isinstance(audio_path, WavAudioSource):
+            audio_ref = str(audio_path.path)
+        else:
+            # Áudio em memória vai por memória compartilhada, sem cópia via pickle
+            shm, audio_ref = _share_audio(audio_path)
+        try:
+            future = self._get_diarization_executor(diarization_threads).submit(_detect_speakers_job, audio_ref)
+            import torch
+            previous_threads = torch.get_num_threads()
+            torch.set_num_threads(transcription_threads)
+            try:
+                transcription_data, language = self.transcribe_audio(audio_path, on_segment)
+            finally:
+                torch.set_num_threads(previous_threads)
+            try:
+                speakers_info = future.result()
+            except Exception as e:
+                print(f"❌ Erro na detecção de speakers: {e}")
+                # Processo de diarização pode ter morrido; recriar no próximo uso
+                self._diarization_executor.shutdown(wait=False)
+                self._diarization_executor = None
+                speakers_info = None
+            return transcription_data, language, speakers_info
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+    def transcribe_with_speakers(self, audio_path, on_segment=None):
         """Transcrever áudio com detecção de speakers"""
         print("🎙️ Transcrevendo com detecção de speakers...")
-        # Primeira transcrição normal
-        transcription_data, language = self.transcribe_audio(audio_path)
-        if not transcription_data:
-            return None, None
-        # Detecção de speakers
-        speakers_info = self.detect_speakers(audio_path)
+        # Modelos falsos ficam no processo atual (o worker de diarização importa torch)
+        if self.parallel_diarization and not self.stub_model and (os.cpu_count() or 1) > 1:
+            transcription_data, language, speakers_info = self._transcribe_and_diarize_concurrently(audio_path, on_segment)
+            if not transcription_data:
+                return None, None
+        else:
+            # Primeira transcrição normal
+            transcription_data, language = self.transcribe_audio(audio_path, on_segment)
+            if not transcription_data:
+                return None, None
+            # Detecção de speakers
+            speakers_info = self.detect_speakers(audio_path)
         if speakers_info:
             # Combinar transcrição com speakers
             print("🔗 Combinando transcrição com speakers...")
-            # Simplificado: associar segmentos de tempo
+            # Cada segmento (e palavra) recebe o speaker de maior sobreposição
+            segments = transcription_data.get('segments', []) if isinstance(transcription_data, dict) else []
             enhanced_transcription = {
                 'language': language,
                 'text': transcription_data['text'] if isinstance(transcription_data, dict) else transcription_data,
-                'segments': transcription_data.get('segments', []) if isinstance(transcription_data, dict) else [],
-                'speakers': speakers_info
+                'segments': align_speakers(segments, speakers_info),
+                'speakers': speakers_info,
+                'speaker_stats': speaker_statistics(speakers_info)
             }
             return enhanced_transcription, language
         else:
@@ -316,6 +2635,8 @@ class EnhancedVideoTranscriber:
                         start_time = self.seconds_to_srt_time(segment['start'])
                         end_time = self.seconds_to_srt_time(segment['end'])
                         text = segment['text'].strip()
+                        if segment.get('speaker'):
+                            text = f"[{segment['speaker']}] {text}"
                         f.write(f"{i}\n")
                         f.write(f"{start_time} --> {end_time}\n")
                         f.write(f"{text}\n\n")
@@ -340,13 +2661,62 @@ class EnhancedVideoTranscriber:
             print(f"❌ Erro salvando SRT: {e}")
             return False
 
+    def format_speaker_dialogue(self, transcription_data):
+        """Texto em formato de diálogo, juntando segmentos seguidos do mesmo speaker"""
+        if not isinstance(transcription_data, dict):
+            return ""
+        segments = [seg for seg in transcription_data.get('segments', []) if seg.get('speaker')]
+        if not segments:
+            return ""
+        lines = []
+        current = None
+        for segment in segments:
+            if current and current['speaker'] == segment['speaker']:
+                current['text'].append(segment['text'].strip())
+                continue
+            current = {'speaker': segment['speaker'], 'start': segment['start'], 'text': [segment['text'].strip()]}
+            lines.append(current)
+        return "\n".join(
+            f"[{self.seconds_to_srt_time(line['start'])[:8]}] {line['speaker']}: {' '.join(line['text'])}"
+            for line in lines
+        )
+
     def seconds_to_srt_time(self, seconds):
         """Converter segundos para formato SRT (HH:MM:SS,mmm)"""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millisecs = int((seconds % 1) * 1000)
-        return f"{hours:02d}:{minutes:02d}:{secs:02d},{millisecs:03d}"
+        return format_timestamp(seconds)
+
+    def write_segments_incrementally(self, segments, base_path, formats=('srt', 'vtt', 'jsonl')):
+        """Consumir um iterador de segmentos gravando cada um assim que chega"""
+        with SegmentWriterGroup(base_path, formats) as writers:
+            for segment in segments:
+                writers.write(segment)
+        return writers.paths()
+
+    def export_to_vtt(self, transcription_data, output_path):
+        """Exportar transcrição para WebVTT"""
+        try:
+            segments = transcription_data.get('segments', []) if isinstance(transcription_data, dict) else []
+            with VttSegmentWriter(output_path) as writer:
+                for segment in segments:
+                    writer.write(segment)
+            print(f"✅ VTT salvo: {output_path}")
+            return True
+        except Exception as e:
+            print(f"❌ Erro salvando VTT: {e}")
+            return False
+
+    def export_to_jsonl(self, transcription_data, output_path):
+        """Exportar segmentos em JSON Lines (um segmento por linha)"""
+        try:
+            segments = transcription_data.get('segments', []) if isinstance(transcription_data, dict) else []
+            with JsonlSegmentWriter(output_path) as writer:
+                for segment in segments:
+                    writer.write(segment)
+            print(f"✅ JSONL salvo: {output_path}")
+            return True
+        except Exception as e:
+            print(f"❌ Erro salvando JSONL: {e}")
+            return False
 
     def export_to_json(self, transcription_data, output_path):
         """Exportar para JSON com metadados completos"""
@@ -355,7 +2725,9 @@ class EnhancedVideoTranscriber:
                 'metadata': {
                     'generated_at': datetime.now().isoformat(),
                     'tool': 'Enhanced Video Transcriber',
-                    'whisper_model': 'base'
+                    'asr_backend': self.active_backend(),
+                    'whisper_model': 'stub' if self.stub_model else self.model_name,
+                    'inference_mode': self.inference_mode
                 },
                 'transcription': transcription_data
             }
@@ -420,11 +2792,51 @@ class EnhancedVideoTranscriber:
             print(f"❌ Erro salvando PDF: {e}")
             return False
 
+    def _fetch_media_info(self, ydl, url):
+        """Obter metadados via yt-dlp e confirmar vídeos longos (modo interativo)"""
+        print("🔍 Obtendo informações do vídeo...")
+        info = ydl.extract_info(url, download=False)
+        title = info.get('title', 'video')
+        duration = info.get('duration', 0)
+        print(f"📹 Título: {title}")
+        if duration:
+            print(f"⏱️ Duração: {int(duration)//60}:{int(duration)%60:02d}")
+        if duration and duration > 3600 and self.interactive:  # > 1 hora
+            response = input("\n⚠️ Vídeo longo (>1h). Continuar? (s/n): ")
+            if response.lower() not in ['s', 'sim', 'y', 'yes']:
+                return None
+        return info
+
+    def offline_download_key(self, url):
+        """Chave do índice (extrator:ID) calculada só a partir da URL, sem rede"""
+        try:
+            from yt_dlp.extractor import gen_extractor_classes
+            for extractor in gen_extractor_classes():
+                if extractor.ie_key() == 'Generic' or not extractor.suitable(url):
+                    continue
+                video_id = extractor.get_temp_id(url)
+                return DownloadIndex.make_key(extractor.ie_key(), video_id) if video_id else None
+        except Exception:
+            pass
+        return None
+
+    def indexed_download(self, url):
+        """Arquivo já baixado para esta URL (entrada válida do índice) ou None"""
+        key = self.offline_download_key(url)
+        entry = self.download_index.lookup(key) if key else None
+        if entry:
+            print(f"♻️ Já baixado: {Path(entry['path']).name}")
+        return entry
+
+    @traced('download', _describe_download)
     def download_video(self, url):
-        """Download de vídeo do YouTube"""
+        """Download de vídeo do YouTube (reutiliza downloads já indexados)"""
         try:
+            entry = self.indexed_download(url)
+            if entry:
+                return entry['path'], entry.get('title') or Path(entry['path']).stem
             import yt_dlp
-            output_template = str(self.folders['downloads'] / '%(title)s.%(ext)s')
+            output_template = str(self.folders['downloads'] / '%(title)s [%(id)s].%(ext)s')
             ydl_opts = {
                 'format': 'best[height<=720]/best',
                 'outtmpl': output_template,
@@ -432,28 +2844,143 @@ class EnhancedVideoTranscriber:
                 'writeautomaticsub': False,
             }
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                print("🔍 Obtendo informações do vídeo...")
-                info = ydl.extract_info(url, download=False)
+                info = self._fetch_media_info(ydl, url)
+                if not info:
+                    return None, None
                 title = info.get('title', 'video')
-                duration = info.get('duration', 0)
-                print(f"📹 Título: {title}")
-                if duration:
-                    print(f"⏱️ Duração: {duration//60}:{duration%60:02d}")
-                if duration > 3600:  # > 1 hora
-                    response = input("\n⚠️ Vídeo longo (>1h). Continuar? (s/n): ")
-                    if response.lower() not in ['s', 'sim', 'y', 'yes']:
-                        return None, None
+                key = DownloadIndex.make_key(info.get('extractor_key') or info.get('extractor'), info.get('id'))
+                entry = self.download_index.lookup(key)
+                if entry:
+                    print(f"♻️ Já baixado: {Path(entry['path']).name}")
+                    return entry['path'], title
                 print("\n📥 Baixando vídeo...")
-                ydl.download([url])
-                # Encontrar arquivo baixado
-                for file_path in self.folders['downloads'].glob('*'):
-                    if file_path.suffix.lower() in ['.mp4', '.mkv', '.avi', '.mov', '.webm']:
-                        print(f"✅ Baixado: {file_path.name}")
-                        return str(file_path), title
+                # Reaproveita as informações já extraídas (sem nova consulta ao site)
+                info = ydl.process_ie_result(info, download=True)
+                downloads = info.get('requested_downloads') or [{}]
+                file_path = Path(downloads[0].get('filepath') or ydl.prepare_filename(info))
+                if not file_path.exists():
+                    print("❌ Arquivo baixado não encontrado")
+                    return None, None
+                self.download_index.record(key, file_path, title, info.get('format_id'), url)
+                print(f"✅ Baixado: {file_path.name}")
+                return str(file_path), title
+        except Exception as e:
+            print(f"❌ Erro no download: {e}")
+        return None, None
+
+    @traced('download', _describe_stream_download)
+    def stream_audio_from_url(self, url):
+        """Baixar só a faixa de áudio (bestaudio) direto para o ffmpeg, sem salvar o arquivo
+
+        O yt-dlp apenas resolve a URL da mídia e os headers; o ffmpeg lê a
+        stream via HTTP e entrega PCM 16 kHz em memória. URLs diretas de
+        arquivos (ex.: servidor HTTP local) passam pelo extrator genérico.
+        Retorna (áudio float32, título) ou (None, None).
+        """
+        try:
+            entry = self.indexed_download(url)
+            if entry:
+                # Mídia já em disco: abrir o arquivo local em vez da rede (WAV via memmap)
+                audio = self.load_audio(entry['path'])
+                return audio, entry.get('title') or Path(entry['path']).stem
+            import yt_dlp
+            ydl_opts = {
+                'format': 'bestaudio/best',
+                'quiet': True,
+                'no_warnings': True,
+                'noplaylist': True,
+            }
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = self._fetch_media_info(ydl, url)
+            if not info:
+                return None, None
+            title = info.get('title', 'audio')
+            key = DownloadIndex.make_key(info.get('extractor_key') or info.get('extractor'), info.get('id'))
+            entry = self.download_index.lookup(key)
+            if entry:
+                print(f"♻️ Já baixado: {Path(entry['path']).name}")
+                return self.load_audio(entry['path']), title
+            selected = (info.get('requested_formats') or [info])[0]
+            media_url = selected.get('url') or info.get('url')
+            if not media_url:
+                print("❌ Nenhuma stream de áudio encontrada")
+                return None, None
+            headers = selected.get('http_headers') or info.get('http_headers') or {}
+            input_options = []
+            if headers:
+                input_options += ['-headers', ''.join(f"{key}: {value}\r\n" for key, value in headers.items())]
+            if media_url.startswith(('http://', 'https://')):
+                input_options += ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5']
+            print(f"📥 Baixando apenas o áudio ({selected.get('format_id') or selected.get('ext') or 'stream'})...")
+            audio = self.decode_audio(media_url, input_options=input_options)
+            if not audio.size:
+                print("❌ Nenhum áudio recebido")
+                return None, None
+            print(f"✅ Áudio recebido: {audio.size / SAMPLE_RATE:.1f}s ({audio.nbytes / (1024 * 1024):.1f}MB em memória)")
+            if self.keep_streamed_audio:
+                self.record_streamed_audio(key, audio, title, info, selected, url)
+            return audio, title
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Erro no download: {e.stderr.decode('utf-8', 'replace').strip() or e}")
         except Exception as e:
             print(f"❌ Erro no download: {e}")
         return None, None
 
+    def record_streamed_audio(self, key, audio, title, info, selected, url):
+        """Guardar o áudio recebido em stream como WAV 16 kHz e registrar no índice
+
+        Só com keep_streamed_audio: a próxima vez a mesma URL abre o WAV (memmap)
+        em vez de voltar à rede.
+        """
+        safe_title = re.sub(r'[<>:"/\\|?*]', '_', title)
+        path = self.folders['downloads'] / f"{safe_title} [{info.get('id') or 'audio'}].wav"
+        temp_path = path.with_name(f"{path.stem}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            write_wav(temp_path, audio)
+            os.replace(temp_path, path)
+            self.download_index.record(key, path, title, selected.get('format_id'), url)
+        except Exception as e:
+            temp_path.unlink(missing_ok=True)
+            print(f"⚠️ Áudio não guardado no índice de downloads: {e}")
+
+    def stream_audio_many(self, urls, max_concurrent=3):
+        """Baixar o áudio de várias URLs em paralelo, com limite de downloads simultâneos
+
+        Gerador que entrega (url, áudio, título) conforme cada download termina.
+        No máximo max_concurrent downloads ficam em andamento ou aguardando
+        consumo, o que limita também a memória ocupada pelos áudios.
+        """
+        max_concurrent = max(1, int(max_concurrent))
+        queue_urls = list(reversed(urls))
+        with ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix='download') as executor:
+            pending = {}
+            while queue_urls or pending:
+                while queue_urls and len(pending) < max_concurrent:
+                    url = queue_urls.pop()
+                    pending[executor.submit(self.stream_audio_from_url, url)] = url
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = pending.pop(future)
+                    try:
+                        audio, title = future.result()
+                    except Exception as e:
+                        print(f"❌ Erro no download de {url}: {e}")
+                        audio, title = None, None
+                    yield url, audio, title
+
+    def process_urls(self, urls, target_lang='pt', detect_speakers=False, max_concurrent=3):
+        """Transcrever várias URLs: downloads em paralelo, transcrição com o modelo aquecido"""
+        ffmpeg_cmd = self.setup_ffmpeg()
+        if not ffmpeg_cmd:
+            print("❌ FFmpeg necessário!")
+            return False
+        results = {}
+        for url, audio, title in self.stream_audio_many(urls, max_concurrent):
+            results[url] = audio is not None and self.process_audio_file(audio, title, target_lang, detect_speakers)
+        print(f"\n📊 {sum(results.values())}/{len(urls)} URLs transcritas")
+        return all(results.values())
+
+    @traced('extract_audio', _describe_extract)
     def extract_audio(self, video_path, title, ffmpeg_cmd):
         """Extrair áudio do vídeo"""
         print("🎵 Extraindo áudio...")
@@ -477,41 +3004,148 @@ class EnhancedVideoTranscriber:
             print(f"❌ Erro extraindo áudio: {e}")
         return None
 
-    def transcribe_audio(self, audio_path):
+    def active_backend(self):
+        """Nome do motor ASR em uso (modelos falsos têm prioridade)"""
+        return 'stub' if self.stub_model else self.asr_backend
+
+    def get_asr_engine(self, model_name=None, device=None, mode=None, backend=None):
+        """Obter motor ASR do cache, carregando apenas na primeira vez
+
+        mode 'int8' quantiza o modelo (Whisper: camadas Linear em CPU;
+        faster-whisper: compute_type int8).
+        """
+        model_name = model_name or self.model_name
+        mode = mode or self.inference_mode
+        backend = backend or self.active_backend()
+        if backend not in ASR_BACKENDS:
+            raise ValueError(f"Motor ASR inválido: {backend} ({', '.join(ASR_BACKENDS)})")
+        if mode not in INFERENCE_MODES:
+            raise ValueError(f"Modo de inferência inválido: {mode} ({', '.join(INFERENCE_MODES)})")
+        engine = ASR_BACKENDS[backend]
+        if backend == 'whisper':
+            configure_torch_threads(self.torch_threads, self.torch_interop_threads)
+        device, dtype = engine.placement(device, mode)
+        key = (f"{backend}:{model_name}", device, dtype)
+        if backend != 'stub':
+            if key in self.model_registry:
+                print(f"♻️ Reutilizando modelo {backend} '{model_name}' ({dtype}) em memória")
+            else:
+                print(f"📦 Carregando modelo {backend} '{model_name}' ({device}, {dtype})...")
+        return self.model_registry.get(key, lambda: engine.load(model_name, device, mode, self.torch_threads))
+
+    def get_whisper_model(self, model_name=None, device=None, mode=None):
+        """Compatibilidade: mesmo que get_asr_engine com o motor configurado"""
+        return self.get_asr_engine(model_name, device, mode)
+
+    def release_models(self):
+        """Liberar todos os modelos mantidos em memória (Whisper e diarização)"""
+        # Os workers do modo longo também mantêm cópias do modelo
+        self._shutdown_chunk_executor()
+        released = self.model_registry.release()
+        if released:
+            print(f"🗑️ {released} modelo(s) liberado(s) da memória")
+        return released + self.release_diarization_pipelines()
+
+    def decode_audio(self, media_path, ffmpeg_cmd=None, input_options=None):
+        """Decodificar qualquer mídia (arquivo ou URL) para PCM float32 16 kHz mono em memória"""
+        import numpy as np
+        cmd = [
+            ffmpeg_cmd or self.ffmpeg_command(),
+            '-nostdin',
+            *(input_options or []),
+            '-i', str(media_path),
+            '-vn', '-f', 's16le', '-acodec', 'pcm_s16le',
+            '-ar', str(SAMPLE_RATE), '-ac', '1',
+            '-loglevel', 'error',
+            '-'
+        ]
+        result = subprocess.run(cmd, check=True, capture_output=True)
+        # Mesma normalização usada por whisper.audio.load_audio
+        return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+
+    @traced('load_audio', _describe_extract)
+    def load_audio(self, audio_path):
+        """Abrir áudio do disco: WAV 16 kHz mono via memmap (sem carregar), demais via ffmpeg"""
+        if self.memmap_wav:
+            source = WavAudioSource.open(audio_path)
+            if source is not None:
+                return source
+        return self.decode_audio(audio_path)
+
+    @traced('extract_audio', _describe_extract)
+    def extract_audio_array(self, video_path, ffmpeg_cmd):
+        """Extrair áudio do vídeo direto para memória (PCM float32 16 kHz mono)"""
+        print("🎵 Extraindo áudio (em memória)...")
+        try:
+            audio = self.decode_audio(video_path, ffmpeg_cmd)
+            if audio.size:
+                print(f"✅ Áudio extraído: {audio.size / SAMPLE_RATE:.1f}s ({audio.nbytes / (1024 * 1024):.1f}MB em memória)")
+                return audio
+            print("❌ Nenhum áudio encontrado no arquivo")
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Erro extraindo áudio: {e.stderr.decode('utf-8', 'replace').strip() or e}")
+        except Exception as e:
+            print(f"❌ Erro extraindo áudio: {e}")
+        return None
+
+    @traced('transcribe_audio', _describe_input_audio)
+    def transcribe_audio(self, audio_path, on_segment=None):
         """Transcrever áudio com Whisper - VERSÃO CORRIGIDA"""
         print("🎙️ Transcrevendo áudio...")
         print("⏳ Primeira vez pode demorar (download do modelo)...")
         
-        # CORREÇÃO CRÍTICA: Configurar FFmpeg ANTES de importar whisper
-        import os
-        import sys
-        from pathlib import Path
-        
-        # Adicionar a pasta video_tools ao PATH
-        ffmpeg_dir = str(self.folders['tools'])
-        if os.path.exists(ffmpeg_dir):
-            # Adicionar ao início do PATH (maior prioridade)
-            os.environ['PATH'] = ffmpeg_dir + os.pathsep + os.environ.get('PATH', '')
-            print(f"📁 Usando FFmpeg de: {ffmpeg_dir}")
+        # FFmpeg resolvido uma vez por processo (pasta tools entra no PATH só uma vez)
+        self.resolve_ffmpeg()
         
         try:
-            # IMPORTANTE: Importar whisper DEPOIS de configurar o PATH
-            import whisper
-            
-            print("📦 Carregando modelo Whisper...")
-            model = whisper.load_model("base")
-            
-            print("🔄 Transcrevendo...")
-            # Converter Path para string se necessário
-            audio_path_str = str(audio_path) if not isinstance(audio_path, str) else audio_path
-            
-            # Verificar se o arquivo de áudio existe
-            if not os.path.exists(audio_path_str):
-                print(f"❌ Arquivo de áudio não encontrado: {audio_path_str}")
-                return None, None
-            
-            result = model.transcribe(audio_path_str, verbose=False)
-            
+            if isinstance(audio_path, (str, Path)):
+                # Converter Path para string se necessário
+                audio_input = str(audio_path)
+                
+                # Verificar se o arquivo de áudio existe
+                if not os.path.exists(audio_input):
+                    print(f"❌ Arquivo de áudio não encontrado: {audio_input}")
+                    return None, None
+                if self.long_form_min_seconds:
+                    # Abrir aqui (o Whisper decodificaria tudo) para saber a duração
+                    audio_input = self.load_audio(audio_input)
+            else:
+                # Áudio já decodificado em memória (float32 16 kHz)
+                audio_input = audio_path
+
+            timeline = None
+            source_audio = audio_input
+            if self.vad_filter and not isinstance(audio_input, (str, Path)):
+                audio_input, timeline = self.apply_vad(audio_input)
+                if audio_input is None:
+                    return None, None
+                if timeline:
+                    # Tabela montada uma vez para todos os remapeamentos do job
+                    import numpy as np
+                    timeline = np.asarray(timeline, dtype=np.float64)
+                    if on_segment:
+                        segment_callback = on_segment
+                        on_segment = lambda segment: segment_callback(remap_segment(segment, timeline))
+
+            if self.is_long_form(audio_input):
+                # O checkpoint guarda o áudio antes do VAD: a retomada refaz o VAD e o remapeamento
+                result = self.transcribe_long_audio(audio_input, self.model_name, on_segment=on_segment,
+                                                    source_audio=source_audio)
+            else:
+                # IMPORTANTE: Carregar whisper DEPOIS de configurar o PATH (modelo vem do cache)
+                model = self.get_asr_engine()
+                if isinstance(audio_input, WavAudioSource):
+                    # Áudio curto: o modelo precisa do array inteiro
+                    audio_input = audio_input.read()
+                scheduler = self.get_batch_scheduler() if isinstance(model, WhisperBackend) else None
+                if scheduler:
+                    result = self.transcribe_batched(scheduler, model, audio_input, on_segment)
+                else:
+                    print("🔄 Transcrevendo...")
+                    result = model.transcribe(audio_input, on_segment=on_segment, verbose=False)
+            if timeline is not None:
+                result['segments'] = remap_segments(result.get('segments', []), timeline)
+
             text = result.get('text', '').strip()
             language = result.get('language', 'unknown')
             
@@ -524,8 +3158,8 @@ class EnhancedVideoTranscriber:
                 return None, None
                 
         except ImportError as e:
-            print(f"❌ Erro importando Whisper: {e}")
-            print("Execute: pip install openai-whisper")
+            print(f"❌ Erro importando o motor de transcrição: {e}")
+            print(f"Execute: pip install {'faster-whisper' if self.active_backend() == 'faster-whisper' else 'openai-whisper'}")
             return None, None
         except FileNotFoundError as e:
             print(f"❌ FFmpeg não encontrado pelo Whisper")
@@ -539,91 +3173,510 @@ class EnhancedVideoTranscriber:
             traceback.print_exc()
             return None, None
 
+    def get_batch_scheduler(self):
+        """Agendador de decodificação em lote (compartilhado por atribuição entre transcribers)"""
+        if self.batch_scheduler is None and self.decode_batch_size > 1:
+            self.batch_scheduler = BatchedDecoder(self.decode_batch_size)
+        return self.batch_scheduler
+
+    def transcribe_batched(self, scheduler, engine, audio, on_segment=None):
+        """Transcrever em janelas de até 30 s decodificadas em lote com as de outros jobs"""
+        bounds = self.plan_chunks(audio, chunk_seconds=30, overlap_seconds=0, search_seconds=5)
+        print(f"🔄 Transcrevendo em lote ({len(bounds)} janela(s) de até 30s)...")
+        # O idioma é detectado uma vez, na primeira janela; as demais são decodificadas nele
+        futures = scheduler.submit(engine.model, audio, bounds[:1])
+        if len(bounds) > 1:
+            language = futures[0].result()['language']
+            futures += scheduler.submit(engine.model, audio, bounds[1:], language=language)
+        chunk_bounds = [(start / SAMPLE_RATE, end / SAMPLE_RATE) for start, end in bounds]
+        results = []
+        emitted = 0
+        for index, future in enumerate(futures):
+            results.append(future.result())
+            if on_segment:
+                for segment in self.stitch_chunk_segments(chunk_bounds, index, results[-1]):
+                    on_segment(dict(segment, id=emitted))
+                    emitted += 1
+        return self.merge_chunk_results([(start, end, result) for (start, end), result in zip(chunk_bounds, results)])
+
+    def apply_vad(self, audio):
+        """Filtrar silêncio antes do modelo
+
+        Retorna (áudio, linha do tempo): (None, None) se não houver fala, o áudio
+        original com linha do tempo None se quase tudo for fala, ou o áudio
+        compacto (só regiões com fala) e sua linha do tempo.
+        """
+        started = time.perf_counter()
+        regions = detect_speech_regions(audio)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if not regions:
+            print(f"🔇 Nenhuma fala detectada (VAD, {elapsed_ms:.0f} ms) - transcrição ignorada")
+            return None, None
+        speech = sum(end - start for start, end in regions)
+        if len(audio) - speech < len(audio) * self.vad_min_silence:
+            # Pouco silêncio: compactar não compensa a cópia
+            return audio, None
+        compact, timeline = compact_speech(audio, regions)
+        print(f"🔇 VAD: {speech / SAMPLE_RATE:.1f}s de fala em {len(audio) / SAMPLE_RATE:.1f}s "
+              f"({len(regions)} regiões, {elapsed_ms:.0f} ms) - silêncio removido antes do modelo")
+        return compact, timeline
+
+    def is_long_form(self, audio):
+        """Verificar se o áudio em memória deve usar o modo longo (trechos em paralelo)"""
+        if not self.long_form_min_seconds or isinstance(audio, (str, Path)):
+            return False
+        return len(audio) / SAMPLE_RATE >= self.long_form_min_seconds
+
+    def plan_chunks(self, audio, chunk_seconds=None, overlap_seconds=None, search_seconds=15):
+        """Dividir o áudio em trechos com sobreposição, cortando no ponto mais silencioso
+
+        Cada corte é procurado nos últimos search_seconds antes do limite nominal,
+        usando a energia RMS em quadros de 100 ms. Retorna [(início, fim)] em amostras.
+        """
+        import numpy as np
+        chunk = int((chunk_seconds or self.chunk_seconds) * SAMPLE_RATE)
+        overlap = int((self.chunk_overlap_seconds if overlap_seconds is None else overlap_seconds) * SAMPLE_RATE)
+        search = int(search_seconds * SAMPLE_RATE)
+        frame = SAMPLE_RATE // 10
+        total = len(audio)
+        chunks = []
+        start = 0
+        while start < total:
+            end = start + chunk
+            if end >= total:
+                chunks.append((start, total))
+                break
+            # Procurar o quadro de menor energia perto do limite nominal
+            window_start = max(start + overlap + frame, end - search)
+            window = audio[window_start:end]
+            n_frames = len(window) // frame
+            if n_frames > 0:
+                frames = window[:n_frames * frame].reshape(n_frames, frame)
+                rms = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1))
+                end = window_start + int(np.argmin(rms)) * frame + frame // 2
+            chunks.append((start, end))
+            start = end - overlap
+        return chunks
+
+    def stitch_chunk_segments(self, chunk_bounds, index, result):
+        """Segmentos de um trecho na linha do tempo global, sem os duplicados da sobreposição
+
+        chunk_bounds: lista ordenada de (início_s, fim_s) de todos os trechos. Na
+        região de sobreposição entre dois trechos vale o segmento cujo centro cai
+        do lado correspondente do ponto médio da sobreposição. Como os limites só
+        dependem do plano, cada trecho pode ser costurado assim que termina.
+        """
+        start, end = chunk_bounds[index]
+        lower = (start + chunk_bounds[index - 1][1]) / 2 if index > 0 else float('-inf')
+        upper = (chunk_bounds[index + 1][0] + end) / 2 if index + 1 < len(chunk_bounds) else float('inf')
+        segments = []
+        for segment in result.get('segments', []):
+            seg_start = segment['start'] + start
+            seg_end = segment['end'] + start
+            middle = (seg_start + seg_end) / 2
+            if not lower <= middle < upper:
+                continue
+            merged = dict(segment)
+            merged['start'] = seg_start
+            merged['end'] = seg_end
+            if segment.get('words'):
+                merged['words'] = [
+                    dict(word, start=word['start'] + start, end=word['end'] + start)
+                    for word in segment['words']
+                ]
+            segments.append(merged)
+        return segments
+
+    def merge_chunk_results(self, chunk_results):
+        """Juntar resultados dos trechos numa linha do tempo global
+
+        chunk_results: lista ordenada de (início_s, fim_s, resultado).
+        """
+        chunk_bounds = [(start, end) for start, end, _ in chunk_results]
+        segments = []
+        languages = {}
+        for i, (start, end, result) in enumerate(chunk_results):
+            lang = result.get('language')
+            if lang:
+                languages[lang] = languages.get(lang, 0) + (end - start)
+            segments.extend(self.stitch_chunk_segments(chunk_bounds, i, result))
+        segments.sort(key=lambda seg: seg['start'])
+        for index, segment in enumerate(segments):
+            segment['id'] = index
+            segment['seek'] = int(segment['start'] * 100)
+        language = max(languages, key=languages.get) if languages else 'unknown'
+        return {
+            'text': ''.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': language
+        }
+
+    def _get_chunk_executor(self, workers):
+        """Pool persistente de processos para os trechos (modelos ficam aquecidos)
+
+        Cada worker recebe torch_threads ou, sem ele, sua parte dos núcleos:
+        sem isso cada processo abriria um thread por núcleo e disputaria a CPU.
+        """
+        if self._chunk_executor is None or self._chunk_executor_workers != workers:
+            self._shutdown_chunk_executor()
+            context = multiprocessing.get_context('spawn')
+            threads = self.torch_threads or max(1, (os.cpu_count() or 1) // workers)
+            self._chunk_executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=context, initializer=_init_worker,
+                initargs=(threads, self.torch_interop_threads, str(self.base_dir))
+            )
+            self._chunk_executor_workers = workers
+        return self._chunk_executor
+
+    def _shutdown_chunk_executor(self):
+        if self._chunk_executor is not None:
+            self._chunk_executor.shutdown(wait=True)
+            self._chunk_executor = None
+            self._chunk_executor_workers = 0
+
+    def checkpoint_for(self, audio, model_name=None):
+        """Pasta de checkpoints do job, endereçada pelo áudio + modelo + opções"""
+        key = TranscriptionCache.make_key(audio, self.cache_model_name(model_name), self.decoding_options(audio))
+        return TranscriptionCheckpoint(self.folders['checkpoints'] / key[:24])
+
+    def transcribe_long_audio(self, audio, model_name=None, workers=None, on_segment=None, source_audio=None):
+        """Transcrever áudio longo em trechos paralelos com costura das sobreposições
+
+        on_segment(segmento) é chamado em ordem cronológica assim que cada trecho
+        (e todos os anteriores) termina, permitindo gravar legendas parciais.
+        Com checkpoint_long_form, cada trecho concluído é gravado no disco e uma
+        nova execução com o mesmo áudio continua a partir deles. source_audio é o
+        áudio guardado para a retomada (o original, antes do VAD), se diferente.
+        """
+        workers = max(1, int(workers or self.chunk_workers))
+        model_name = model_name or self.model_name
+        chunks = self.plan_chunks(audio)
+        chunk_bounds = [(start / SAMPLE_RATE, end / SAMPLE_RATE) for start, end in chunks]
+        duration = len(audio) / SAMPLE_RATE
+        print(f"✂️ Áudio longo ({duration / 60:.1f} min): {len(chunks)} trechos, {workers} worker(s)")
+        options = {'verbose': None}
+        results = [None] * len(chunks)
+        emitted = {'next': 0, 'count': 0}
+        checkpoint = None
+        if self.checkpoint_long_form:
+            checkpoint = self.checkpoint_for(audio, model_name)
+            for index, result in checkpoint.start(chunk_bounds, model_name, options, self.current_title,
+                                                  self.resume_transcriptions).items():
+                results[index] = result
+            done = sum(result is not None for result in results)
+            if done:
+                resumed_until = next((chunk_bounds[i][0] for i, r in enumerate(results) if r is None), duration)
+                print(f"♻️ Retomando: {done}/{len(chunks)} trechos já concluídos "
+                      f"(contínuo até {resumed_until / 60:.1f} min)")
+
+        def emit_ready():
+            # Emite os trechos contíguos já concluídos, na ordem da linha do tempo
+            while emitted['next'] < len(results) and results[emitted['next']] is not None:
+                if on_segment:
+                    for segment in self.stitch_chunk_segments(chunk_bounds, emitted['next'], results[emitted['next']]):
+                        on_segment(dict(segment, id=emitted['count']))
+                        emitted['count'] += 1
+                emitted['next'] += 1
+
+        def chunk_done(index, result):
+            results[index] = result
+            if checkpoint:
+                checkpoint.save_chunk(index, result)
+                # Áudio só é guardado quando há algo a retomar: trecho pronto e job inacabado
+                if any(r is None for r in results):
+                    checkpoint.save_audio(audio if source_audio is None else source_audio)
+            emit_ready()
+
+        emit_ready()
+        remaining = [i for i, result in enumerate(results) if result is None]
+        if workers == 1 or len(remaining) <= 1:
+            if remaining:
+                model = self.get_asr_engine(model_name)
+            for i in remaining:
+                start, end = chunks[i]
+                print(f"🔄 Trecho {i + 1}/{len(chunks)}...")
+                chunk_done(i, model.transcribe(audio[start:end], **options))
+        else:
+            executor = self._get_chunk_executor(workers)
+            futures = {
+                executor.submit(_transcribe_chunk, model_name, audio[chunks[i][0]:chunks[i][1]], options,
+                                self.inference_mode, self.active_backend()): i
+                for i in remaining
+            }
+            errors = []
+            for done_count, future in enumerate(as_completed(futures), 1):
+                try:
+                    chunk_done(futures[future], future.result())
+                except Exception as e:
+                    # Os outros trechos continuam e ficam salvos para a retomada
+                    errors.append(e)
+                    continue
+                print(f"🔄 Trecho {done_count}/{len(remaining)} concluído")
+            if errors:
+                raise errors[0]
+        merged = self.merge_chunk_results([
+            (start, end, result) for (start, end), result in zip(chunk_bounds, results)
+        ])
+        if checkpoint:
+            checkpoint.remove()
+        return merged
+
+    def pending_checkpoints(self):
+        """Jobs longos interrompidos que podem ser retomados: [(checkpoint, manifest)]"""
+        pending = []
+        for manifest_path in sorted(self.folders['checkpoints'].glob('*/manifest.json')):
+            checkpoint = TranscriptionCheckpoint(manifest_path.parent)
+            manifest = checkpoint.load_manifest()
+            if manifest and manifest.get('status') == 'running' and checkpoint.source_path().exists():
+                pending.append((checkpoint, manifest))
+        return pending
+
+    def resume_pending_transcriptions(self, target_lang='pt', detect_speakers=False):
+        """Retomar todos os jobs longos interrompidos a partir dos checkpoints"""
+        pending = self.pending_checkpoints()
+        if not pending:
+            print("✅ Nenhuma transcrição interrompida")
+            return True
+        print(f"♻️ {len(pending)} transcrição(ões) interrompida(s)")
+        results = []
+        for checkpoint, manifest in pending:
+            done = len(checkpoint.completed(len(manifest['chunks'])))
+            title = manifest.get('title') or checkpoint.job_dir.name
+            print(f"\n▶️ {title}: {done}/{len(manifest['chunks'])} trechos prontos")
+            results.append(self.process_audio_file(str(checkpoint.source_path()), title, target_lang, detect_speakers))
+        return all(results)
+
     def translate_text(self, text, target_lang, source_lang):
         """Função de tradução desativada - retorna o texto original"""
         # Tradução offline removida
         print("ℹ️ Função de tradução automática offline foi removida.")
         return text
 
-    def save_all_formats(self, title, transcription_data, translated_text, source_lang, target_lang):
-        """Salvar em todos os formatos disponíveis"""
+    def active_incremental_formats(self):
+        """Formatos incrementais que também foram pedidos em output_formats"""
+        return [fmt for fmt in self.incremental_formats if fmt in self.output_formats]
+
+    def output_base_path(self, title):
+        """Caminho base (sem sufixo) dos arquivos de saída de um título"""
         safe_title = re.sub(r'[<>:"/\\|?*]', '_', title)
-        base_path = self.folders['transcripts'] / safe_title
-        # Texto da transcrição
+        return self.folders['transcripts'] / safe_title
+
+    def export_to_txt(self, title, transcription_data, source_lang, output_path):
+        """Exportar para TXT formatado"""
         original_text = transcription_data['text'] if isinstance(transcription_data, dict) else transcription_data
-        results = {}
-        # 1. TXT tradicional
-        txt_path = f"{base_path}_transcription.txt"
         try:
-            with open(txt_path, 'w', encoding='utf-8') as f:
+            with open(output_path, 'w', encoding='utf-8') as f:
                 f.write(f"TRANSCRIÇÃO - {title}\n")
                 f.write("=" * 60 + "\n")
                 f.write(f"TRANSCRIÇÃO ORIGINAL ({self.languages.get(source_lang, source_lang)}):\n")
                 f.write("-" * 40 + "\n")
                 f.write(original_text + "\n")
+                dialogue = self.format_speaker_dialogue(transcription_data)
+                if dialogue:
+                    f.write("\nTRANSCRIÇÃO POR SPEAKER:\n")
+                    f.write("-" * 40 + "\n")
+                    f.write(dialogue + "\n")
                 f.write("\nGerado por Enhanced Video Transcriber\n")
-            results['txt'] = txt_path
-            print(f"✅ TXT salvo: {Path(txt_path).name}")
+            print(f"✅ TXT salvo: {Path(output_path).name}")
+            return True
         except Exception as e:
             print(f"❌ Erro salvando TXT: {e}")
-        # 2. JSON
-        json_path = f"{base_path}_data.json"
-        if self.export_to_json(transcription_data, json_path):
-            results['json'] = json_path
-        # 3. SRT
-        srt_path = f"{base_path}_subtitles.srt"
-        if self.export_to_srt(transcription_data, srt_path):
-            results['srt'] = srt_path
-        # 4. PDF
-        pdf_path = f"{base_path}_document.pdf"
-        # Passa o mesmo texto para original e traduzido para evitar bloco de tradução no PDF
-        if self.export_to_pdf(title, original_text, original_text, source_lang, target_lang, pdf_path):
-            results['pdf'] = pdf_path
+            return False
+
+    def _get_export_executor(self):
+        """Pool de threads dos exportadores (compartilhado entre jobs)"""
+        if self._export_executor is None:
+            self._export_executor = ThreadPoolExecutor(
+                max_workers=len(EXPORT_FORMATS), thread_name_prefix='export'
+            )
+        return self._export_executor
+
+    @traced('save_all_formats', _describe_save)
+    def save_all_formats(self, title, transcription_data, translated_text, source_lang, target_lang,
+                         formats=None, background_slow=None):
+        """Salvar nos formatos escolhidos, com os exportadores em paralelo
+
+        Retorna os arquivos já gravados. Com background_slow, formatos lentos
+        (PDF) continuam em segundo plano e ficam em self.pending_exports.
+        """
+        base_path = self.output_base_path(title)
+        # Texto da transcrição
+        original_text = transcription_data['text'] if isinstance(transcription_data, dict) else transcription_data
+        formats = [fmt for fmt in (formats or self.output_formats) if fmt in EXPORT_FORMATS]
+        if background_slow is None:
+            background_slow = self.background_slow_exports
+        # Só faz sentido deixar para depois se houver formatos rápidos para reportar já
+        background_slow = background_slow and any(fmt not in SLOW_EXPORT_FORMATS for fmt in formats)
+        exporters = {
+            'txt': lambda path: self.export_to_txt(title, transcription_data, source_lang, path),
+            'json': lambda path: self.export_to_json(transcription_data, path),
+            'srt': lambda path: self.export_to_srt(transcription_data, path),
+            'vtt': lambda path: self.export_to_vtt(transcription_data, path),
+            'jsonl': lambda path: self.export_to_jsonl(transcription_data, path),
+            # Passa o mesmo texto para original e traduzido para evitar bloco de tradução no PDF
+            'pdf': lambda path: self.export_to_pdf(title, original_text, original_text, source_lang, target_lang, path)
+        }
+        executor = self._get_export_executor()
+        futures = {}
+        for fmt in formats:
+            path = f"{base_path}{EXPORT_FORMATS[fmt]}"
+            exporter = exporters[fmt]
+            if isinstance(sys.stdout, ThreadOutputRouter):
+                # Jobs em threads (serviço/batch): mensagens vão para a saída do job
+                exporter = sys.stdout.bind(exporter)
+            futures[fmt] = (executor.submit(exporter, path), path)
+        results = {}
+        for fmt, (future, path) in futures.items():
+            if background_slow and fmt in SLOW_EXPORT_FORMATS and not future.done():
+                print(f"⏳ {fmt.upper()} sendo gerado em segundo plano...")
+                self.pending_exports.append((fmt, path, future))
+                continue
+            try:
+                if future.result():
+                    results[fmt] = path
+            except Exception as e:
+                print(f"❌ Erro salvando {fmt.upper()}: {e}")
         return results
 
+    def wait_for_pending_exports(self):
+        """Aguardar exportações em segundo plano; retorna {formato: caminho} concluídos"""
+        finished = {}
+        pending, self.pending_exports = self.pending_exports, []
+        if pending:
+            print(f"⏳ Aguardando {len(pending)} exportação(ões) em segundo plano...")
+        for fmt, path, future in pending:
+            try:
+                if future.result():
+                    finished[fmt] = path
+            except Exception as e:
+                print(f"❌ Erro salvando {fmt.upper()}: {e}")
+        return finished
+
+    def decoding_options(self, audio):
+        """Opções que alteram o resultado da transcrição (entram na chave do cache)"""
+        options = {'task': 'transcribe'}
+        if self.active_backend() != 'whisper':
+            options['backend'] = self.active_backend()
+        if self.inference_mode != 'default':
+            options['inference_mode'] = self.inference_mode
+        if self.vad_filter:
+            options['vad'] = True
+        if self.decode_batch_size > 1 and self.active_backend() == 'whisper' and not self.is_long_form(audio):
+            # Janelas fixas de 30 s, sem contexto do trecho anterior
+            options['batched_decoding'] = True
+        if self.is_long_form(audio):
+            options['long_form'] = {
+                'chunk_seconds': self.chunk_seconds,
+                'chunk_overlap_seconds': self.chunk_overlap_seconds
+            }
+        return options
+
+    def cache_model_name(self, model_name=None):
+        """Modelo na chave do cache e dos checkpoints (o modelo falso nunca se mistura aos reais)"""
+        model_name = model_name or self.model_name
+        return f"stub:{model_name}" if self.stub_model else model_name
+
+    def result_cache_key(self, audio, detect_speakers=False):
+        """Calcular a chave do cache; caminhos são decodificados uma única vez
+
+        Retorna (áudio, chave): o áudio decodificado é reaproveitado na
+        transcrição. Em caso de falha retorna a entrada original e chave None.
+        """
+        if isinstance(audio, (str, Path)):
+            try:
+                audio = self.load_audio(audio)
+            except Exception as e:
+                print(f"⚠️ Cache de resultados indisponível para este arquivo: {e}")
+                return audio, None
+        key = TranscriptionCache.make_key(audio, self.cache_model_name(), self.decoding_options(audio), detect_speakers)
+        return audio, key
+
     def process_audio_file(self, audio_path, title, target_lang='pt', detect_speakers=False):
-        """Processar arquivo de áudio direto"""
+        """Processar arquivo de áudio direto (caminho ou array PCM em memória)"""
         print(f"🔊 Processando arquivo de áudio: {title}")
+        self.current_title = title
         try:
-            # Escolher método de transcrição
-            if detect_speakers:
-                transcription_data, source_lang = self.transcribe_with_speakers(audio_path)
+            cache_key = None
+            cached = None
+            if self.use_result_cache:
+                audio_path, cache_key = self.result_cache_key(audio_path, detect_speakers)
+                cached = self.result_cache.get(cache_key) if cache_key else None
+            if cached:
+                print("♻️ Resultado encontrado no cache - pulando transcrição")
+                transcription_data, source_lang = cached['transcription'], cached['language']
             else:
-                transcription_data, source_lang = self.transcribe_audio(audio_path)
-            if not transcription_data:
-                return False
-            # Extrair texto principal
-            original_text = transcription_data['text'] if isinstance(transcription_data, dict) else transcription_data
-            # Mostrar transcrição
-            print("\n" + "="*60)
-            print("TRANSCRIÇÃO:")
-            print("="*60)
-            preview = original_text[:300] + ("..." if len(original_text) > 300 else "")
-            print(preview)
-            print()
-            # Tradução removida - não perguntar mais
-            translated_text = original_text # Sempre usar o texto original
-            print("✅ Salvando transcrição")
-
-            # Salvar em todos os formatos
-            saved_files = self.save_all_formats(
-                title, transcription_data, translated_text,
-                source_lang, target_lang
-            )
-            print(f"\n📁 Arquivos salvos: {len(saved_files)}")
-            for format_type, file_path in saved_files.items():
-                print(f"  {format_type.upper()}: {Path(file_path).name}")
-            return len(saved_files) > 0
+                # Áudios longos gravam legendas parciais enquanto os trechos terminam
+                writers = None
+                if self.active_incremental_formats() and self.is_long_form(audio_path):
+                    writers = SegmentWriterGroup(self.output_base_path(title), self.active_incremental_formats())
+                    print(f"📝 Legendas parciais: {', '.join(Path(p).name for p in writers.paths().values())}")
+                on_segment = writers.write if writers else None
+                try:
+                    # Escolher método de transcrição
+                    if detect_speakers:
+                        transcription_data, source_lang = self.transcribe_with_speakers(audio_path, on_segment)
+                    else:
+                        transcription_data, source_lang = self.transcribe_audio(audio_path, on_segment)
+                finally:
+                    if writers:
+                        writers.close()
+                if not transcription_data:
+                    return False
+                # Diarização que falhou não é guardada como resultado com speakers
+                speakers = transcription_data.get('speakers') if isinstance(transcription_data, dict) else None
+                if cache_key and (speakers or not detect_speakers):
+                    try:
+                        self.result_cache.put(cache_key, transcription_data, source_lang, speakers)
+                    except Exception as e:
+                        print(f"⚠️ Não foi possível gravar no cache: {e}")
+            return self.finish_transcription(title, transcription_data, source_lang, target_lang)
         except Exception as e:
             print(f"❌ Erro no processamento: {e}")
             return False
 
-    def process_video(self, video_source, target_lang='pt', detect_speakers=False):
+    def finish_transcription(self, title, transcription_data, source_lang, target_lang='pt'):
+        """Mostrar prévia e salvar uma transcrição pronta em todos os formatos"""
+        # Extrair texto principal
+        original_text = transcription_data['text'] if isinstance(transcription_data, dict) else transcription_data
+        # Mostrar transcrição
+        print("\n" + "="*60)
+        print("TRANSCRIÇÃO:")
+        print("="*60)
+        preview = original_text[:300] + ("..." if len(original_text) > 300 else "")
+        print(preview)
+        print()
+        # Tradução removida - não perguntar mais
+        translated_text = original_text # Sempre usar o texto original
+        print("✅ Salvando transcrição")
+
+        # Salvar em todos os formatos
+        saved_files = self.save_all_formats(
+            title, transcription_data, translated_text,
+            source_lang, target_lang
+        )
+        self.last_saved_files = saved_files
+        print(f"\n📁 Arquivos salvos: {len(saved_files)}")
+        for format_type, file_path in saved_files.items():
+            print(f"  {format_type.upper()}: {Path(file_path).name}")
+        return len(saved_files) > 0
+
+    def process_video(self, video_source, target_lang='pt', detect_speakers=False, in_memory=None):
         """Processar vídeo (URL ou arquivo local)"""
         title = None
         video_path = None
+        if in_memory is None:
+            in_memory = self.in_memory_audio
+        if is_url(video_source) and in_memory and self.audio_only_downloads:
+            # Só a faixa de áudio, direto da rede para o ffmpeg (sem baixar o vídeo)
+            if not self.setup_ffmpeg():
+                print("❌ FFmpeg necessário!")
+                return False
+            audio, title = self.stream_audio_from_url(video_source)
+            if audio is None:
+                return False
+            return self.process_audio_file(audio, title, target_lang, detect_speakers)
         # Determinar se é URL ou arquivo
-        if video_source.startswith(('http://', 'https://', 'www.')):
+        if is_url(video_source):
             video_path, title = self.download_video(video_source)
             if not video_path:
                 return False
@@ -638,20 +3691,217 @@ class EnhancedVideoTranscriber:
         if not ffmpeg_cmd:
             print("❌ FFmpeg necessário!")
             return False
+        if in_memory:
+            # PCM direto do ffmpeg para o modelo, sem arquivo intermediário
+            audio = self.extract_audio_array(video_path, ffmpeg_cmd)
+            if audio is None:
+                return False
+            return self.process_audio_file(audio, title, target_lang, detect_speakers)
         # Extrair áudio
         audio_path = self.extract_audio(video_path, title, ffmpeg_cmd)
         if not audio_path:
             return False
+        result = False
         try:
             # Processar áudio
             result = self.process_audio_file(audio_path, title, target_lang, detect_speakers)
             return result
         finally:
-            # Limpeza
-            try:
-                os.remove(audio_path)
-            except:
-                pass
+            # Limpeza (job incompleto mantém o áudio extraído para nova tentativa)
+            if result:
+                try:
+                    os.remove(audio_path)
+                except:
+                    pass
+            else:
+                print(f"💾 Áudio extraído mantido: {audio_path}")
+
+    def process_source(self, source, title=None, target_lang='pt', detect_speakers=False):
+        """Processar uma fonte qualquer (URL, vídeo ou áudio local) sem interação"""
+        self.last_saved_files = {}
+        if not is_url(source) and Path(source).suffix.lower() in AUDIO_EXTENSIONS:
+            if not os.path.exists(source):
+                print(f"❌ Arquivo não encontrado: {source}")
+                return False
+            return self.process_audio_file(source, title or Path(source).stem, target_lang, detect_speakers)
+        return self.process_video(source, target_lang, detect_speakers)
+
+    def collect_batch_sources(self, inputs):
+        """Expandir lista de URLs, caminhos, globs, pastas e manifestos em jobs"""
+        jobs = []
+        for item in inputs:
+            item = item.strip().strip('"')
+            if not item:
+                continue
+            if is_url(item):
+                jobs.append({'source': item})
+                continue
+            path = Path(item)
+            if path.is_file() and path.suffix.lower() in MANIFEST_EXTENSIONS:
+                jobs.extend(self.read_batch_manifest(path))
+            elif path.is_dir():
+                for file_path in sorted(path.iterdir()):
+                    if file_path.suffix.lower() in AUDIO_EXTENSIONS | VIDEO_EXTENSIONS:
+                        jobs.append({'source': str(file_path)})
+            elif path.is_file():
+                jobs.append({'source': str(path)})
+            else:
+                matches = sorted(glob.glob(item, recursive=True))
+                if not matches:
+                    print(f"⚠️ Nada encontrado para: {item}")
+                jobs.extend({'source': match} for match in matches if Path(match).is_file())
+        return jobs
+
+    def read_batch_manifest(self, manifest_path):
+        """Ler manifesto (.txt uma fonte por linha, .json lista, .jsonl um job por linha)"""
+        manifest_path = Path(manifest_path)
+        entries = []
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            if manifest_path.suffix.lower() == '.json':
+                entries = json.load(f)
+            elif manifest_path.suffix.lower() == '.jsonl':
+                entries = [json.loads(line) for line in f if line.strip()]
+            else:
+                entries = [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+        jobs = []
+        for entry in entries:
+            job = {'source': entry} if isinstance(entry, str) else dict(entry)
+            if not job.get('source'):
+                print(f"⚠️ Entrada de manifesto sem 'source' ignorada: {entry}")
+                continue
+            # Caminhos relativos são resolvidos a partir da pasta do manifesto
+            if not is_url(job['source']) and not os.path.isabs(job['source']):
+                candidate = manifest_path.parent / job['source']
+                if candidate.exists():
+                    job['source'] = str(candidate)
+            jobs.append(job)
+        return jobs
+
+    def run_batch(self, inputs, workers=2, detect_speakers=False, max_pending=None,
+                  target_lang='pt', report_path=None, use_cache=True, formats=None):
+        """Processar vários arquivos/URLs em paralelo sem interação (modo headless)"""
+        jobs = self.collect_batch_sources(inputs)
+        if not jobs:
+            print("❌ Nenhum arquivo ou URL para processar")
+            return []
+        workers = max(1, int(workers))
+        # Limite de jobs enviados ao pool ao mesmo tempo (executando + aguardando)
+        max_pending = max(workers, int(max_pending or workers * 2))
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        log_dir = self.folders['transcripts'] / 'batch_logs' / timestamp
+        log_dir.mkdir(parents=True, exist_ok=True)
+        for index, job in enumerate(jobs, 1):
+            job['index'] = index
+            job.setdefault('detect_speakers', detect_speakers)
+            job.setdefault('target_lang', target_lang)
+            job.setdefault('use_cache', use_cache)
+            job.setdefault('formats', list(formats or self.output_formats))
+            job.setdefault('resume', self.resume_transcriptions)
+            job.setdefault('vad', self.vad_filter)
+            job.setdefault('keep_streamed_audio', self.keep_streamed_audio)
+            job.setdefault('stub_model', self.stub_model)
+            job.setdefault('model', self.model_name)
+            job.setdefault('backend', self.asr_backend)
+            job.setdefault('inference_mode', self.inference_mode)
+            job.setdefault('torch_threads', self.torch_threads)
+            job.setdefault('torch_interop_threads', self.torch_interop_threads)
+            job['log_path'] = str(log_dir / f"job_{index:04d}.log")
+        # Workers gravam os registros de etapas no mesmo JSONL; as métricas são agregadas aqui no fim
+        trace_path = self.tracer.trace_path
+        if self.tracer.metrics_path and not trace_path:
+            trace_path = self.tracer.metrics_path.with_suffix('.jsonl')
+        trace_offset = trace_path.stat().st_size if trace_path and trace_path.exists() else 0
+        if trace_path:
+            for job in jobs:
+                job['trace_path'] = str(trace_path)
+        batched = self.decode_batch_size > 1 and self.active_backend() == 'whisper'
+        results = []
+        started = time.time()
+        previous_stdout = sys.stdout
+        if batched:
+            # Jobs em threads de um só processo: o mesmo modelo e o mesmo
+            # agendador recebem as janelas de todos os jobs em andamento
+            print(f"📦 Modo batch: {len(jobs)} jobs, {workers} thread(s), decodificação em lote de {self.decode_batch_size}")
+            scheduler = self.get_batch_scheduler()
+            idle = queue.Queue()
+            for _ in range(workers):
+                transcriber = _headless_transcriber(self.base_dir)
+                transcriber.model_registry = self.model_registry
+                transcriber.diarization_registry = self.diarization_registry
+                transcriber.batch_scheduler = scheduler
+                transcriber.decode_batch_size = self.decode_batch_size
+                idle.put(transcriber)
+            router = sys.stdout if isinstance(sys.stdout, ThreadOutputRouter) else ThreadOutputRouter(sys.stdout)
+            sys.stdout = router
+
+            def run_job(job):
+                transcriber = idle.get()
+                try:
+                    return _run_batch_job(job, transcriber, router)
+                finally:
+                    idle.put(transcriber)
+
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-job')
+            submit = lambda job: executor.submit(run_job, job)
+        else:
+            print(f"📦 Modo batch: {len(jobs)} jobs, {workers} processo(s)")
+            # 'spawn' evita herdar estado do torch/CUDA do processo pai
+            context = multiprocessing.get_context('spawn')
+            # Cada processo recebe sua parte dos núcleos (ou torch_threads), como no modo longo
+            threads = self.torch_threads or max(1, (os.cpu_count() or 1) // workers)
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                           initargs=(threads, self.torch_interop_threads, str(self.base_dir)))
+            submit = lambda job: executor.submit(_run_batch_job, job)
+        try:
+            with executor:
+                pending = set()
+                submitted = {}
+                backlog = list(reversed(jobs))
+                while backlog or pending:
+                    while backlog and len(pending) < max_pending:
+                        job = backlog.pop()
+                        future = submit(job)
+                        submitted[future] = job
+                        pending.add(future)
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = submitted.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            # Worker perdido (ex.: BrokenProcessPool): o job ainda aparece no relatório
+                            result = {'index': job['index'], 'source': job['source'], 'status': 'error',
+                                      'files': {}, 'error': f"{type(e).__name__}: {e}", 'log': job['log_path']}
+                        results.append(result)
+                        icon = "✅" if result['status'] == 'ok' else "❌"
+                        detail = f"{len(result.get('files', {}))} arquivo(s)" if result['status'] == 'ok' else result.get('error')
+                        print(f"{icon} [{len(results)}/{len(jobs)}] {result.get('source', '?')} - {detail}")
+        finally:
+            sys.stdout = previous_stdout
+            if batched:
+                # A thread do agendador não sobrevive ao batch
+                scheduler.close()
+                self.batch_scheduler = None
+        results.sort(key=lambda r: r.get('index', 0))
+        if trace_path and self.tracer.metrics_path:
+            self.tracer.replay(trace_path, trace_offset)
+        succeeded = sum(1 for r in results if r['status'] == 'ok')
+        report = {
+            'generated_at': datetime.now().isoformat(),
+            'workers': workers,
+            'decode_batch_size': self.decode_batch_size if batched else None,
+            'total': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'elapsed_seconds': round(time.time() - started, 2),
+            'jobs': results
+        }
+        report_path = Path(report_path) if report_path else self.folders['transcripts'] / f"batch_report_{timestamp}.json"
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n📊 Batch concluído: {succeeded}/{len(results)} com sucesso em {report['elapsed_seconds']:.1f}s")
+        print(f"📄 Relatório: {report_path}")
+        return results
 
     def live_recording_session(self, target_lang='pt', detect_speakers=False):
         """Sessão de gravação ao vivo"""
@@ -659,8 +3909,21 @@ class EnhancedVideoTranscriber:
         print("Escolha o modo de gravação:")
         print("1. ⏱️ Tempo determinado")
         print("2. 🔴 Pressionar Enter para parar")
-        choice = input("Modo (1 ou 2): ").strip()
+        print("3. ⚡ Transcrição em tempo real (Enter para parar)")
+        choice = input("Modo (1, 2 ou 3): ").strip()
         duration = None
+        if choice == '3':
+            if detect_speakers:
+                print("ℹ️ Detecção de speakers não é aplicada no modo tempo real")
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            title = f"Gravação_{timestamp}"
+            transcription_data, source_lang, audio_path = self.record_and_transcribe_live(title)
+            result = False
+            if transcription_data:
+                result = self.finish_transcription(title, transcription_data, source_lang, target_lang)
+            if audio_path:
+                self._ask_keep_recording(audio_path)
+            return result
         if choice == '1':
             try:
                 duration = int(input("Duração em segundos: "))
@@ -675,7 +3938,11 @@ class EnhancedVideoTranscriber:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         title = f"Gravação_{timestamp}"
         result = self.process_audio_file(audio_path, title, target_lang, detect_speakers)
-        # Opção de manter arquivo de áudio
+        self._ask_keep_recording(audio_path)
+        return result
+
+    def _ask_keep_recording(self, audio_path):
+        """Opção de manter arquivo de áudio"""
         keep_audio = input("\n💾 Manter arquivo de áudio original? (s/n): ").strip().lower()
         if keep_audio not in ['s', 'sim', 'y', 'yes']:
             try:
@@ -683,9 +3950,8 @@ class EnhancedVideoTranscriber:
                 print("🗑️ Arquivo de áudio removido")
             except:
                 pass
-        return result
 
-    def run(self):
+    def run(self, install_deps=False):
         """Menu principal"""
         print("=" * 70)
         print("      VIDEO TRANSCRIBER - VERSÃO AVANÇADA")
@@ -693,9 +3959,13 @@ class EnhancedVideoTranscriber:
         print("=" * 70)
         # Setup automático
         print("\n🚀 Configuração automática...")
-        if not self.setup_dependencies():
+        if not self.setup_dependencies(install_missing=install_deps):
             print("❌ Falha na configuração!")
             return
+        if self.missing_dependencies and self.interactive:
+            answer = input("\n📦 Instalar dependências ausentes agora? (s/n): ").strip().lower()
+            if answer in ['s', 'sim', 'y', 'yes']:
+                self.setup_dependencies(install_missing=True)
         # setup_translation_models REMOVIDO
         print("\n✅ Sistema avançado pronto!")
         # Menu principal
@@ -717,13 +3987,17 @@ class EnhancedVideoTranscriber:
             # Status da detecção de speakers
             speakers_enabled = getattr(self, 'speakers_enabled', False)
             print(f"👥 Detecção de speakers: {'✅ Ativada' if speakers_enabled else '❌ Desativada'}")
-            print("📝 Formatos de saída: TXT, JSON, SRT, PDF")
+            print(f"📝 Formatos de saída: {', '.join(fmt.upper() for fmt in self.output_formats)}")
             try:
                 choice = input("\nEscolha: ").strip()
                 if choice == '1':
-                    url = input("\n🔗 URL do YouTube: ").strip()
-                    if url:
-                        success = self.process_video(url, target_language, speakers_enabled)
+                    urls = input("\n🔗 URL do YouTube (várias separadas por espaço): ").split()
+                    if len(urls) > 1:
+                        success = self.process_urls(urls, target_language, speakers_enabled,
+                                                    self.max_concurrent_downloads)
+                        print("\n🎉 Concluído!" if success else "\n❌ Erro no processo")
+                    elif urls:
+                        success = self.process_video(urls[0], target_language, speakers_enabled)
                         print("\n🎉 Concluído!" if success else "\n❌ Erro no processo")
                 elif choice == '2':
                     file_path = input("\n📁 Caminho do arquivo de vídeo: ").strip().replace('"', '')
@@ -781,6 +4055,9 @@ class EnhancedVideoTranscriber:
                     print("  📊 JSON - Dados completos com metadados")
                     print("  🎬 SRT - Legendas para vídeos")
                     print("  📄 PDF - Documento profissional")
+                    print("  🌐 VTT - Legendas WebVTT para players web")
+                    print("  🧾 JSONL - Um segmento por linha (streaming)")
+                    print("  ⏳ SRT, VTT e JSONL são gravados segmento a segmento durante a transcrição")
                     print("\n🔊 FONTES DE ÁUDIO:")
                     print("  📺 YouTube (yt-dlp)")
                     print("  📁 Arquivos de vídeo locais")
@@ -790,21 +4067,728 @@ class EnhancedVideoTranscriber:
                     print("  ❌ Tradução automática offline foi removida.")
                     print("  💡 Use a transcrição e um serviço online manualmente.")
                 elif choice == '9':
+                    self.wait_for_pending_exports()
                     print("\n👋 Obrigado por usar o Video Transcriber Avançado!")
                     break
                 else:
                     print("\n❌ Opção inválida!")
             except KeyboardInterrupt:
                 print("\n👋 Saindo...")
+                self.wait_for_pending_exports()
                 break
             except Exception as e:
                 print(f"\n❌ Erro: {e}")
 
+# Transcriber residente de cada processo worker (modelo fica aquecido entre jobs)
+_worker_transcriber = None
+
+
+def _headless_transcriber(base_dir=None):
+    """Transcriber sem interação para workers do batch (processos ou threads)"""
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        transcriber = EnhancedVideoTranscriber(base_dir=base_dir)
+    transcriber.interactive = False
+    # Workers não abrem pools próprios (evita processos aninhados)
+    transcriber.chunk_workers = 1
+    transcriber.parallel_diarization = False
+    # Cada job só é reportado depois que todos os formatos estiverem no disco
+    transcriber.background_slow_exports = False
+    return transcriber
+
+
+def _init_worker(threads=None, interop_threads=None, base_dir=None):
+    """Inicializar o transcriber residente de um processo worker (batch/chunks)
+
+    threads/interop_threads: orçamento de threads do torch deste processo
+    (também usado como cpu_threads do faster-whisper). base_dir: pastas de
+    trabalho do processo principal (transcrições, cache, ferramentas).
+    """
+    global _worker_transcriber
+    _worker_transcriber = _headless_transcriber(base_dir)
+    if threads or interop_threads:
+        _worker_transcriber.torch_threads = threads
+        _worker_transcriber.torch_interop_threads = interop_threads
+        try:
+            configure_torch_threads(threads, interop_threads)
+        except ImportError:
+            # Sem torch (stub/faster-whisper) o orçamento vale só para o motor
+            pass
+
+
+def _init_diarization_worker(num_threads, base_dir=None):
+    """Inicializar o processo de diarização com seu orçamento de threads"""
+    _init_worker(num_threads, base_dir=base_dir)
+
+
+def _share_audio(audio):
+    """Copiar áudio para memória compartilhada; retorna (shm, referência serializável)"""
+    from multiprocessing import shared_memory
+    import numpy as np
+    shm = shared_memory.SharedMemory(create=True, size=max(1, audio.nbytes))
+    shared = np.ndarray(audio.shape, dtype=audio.dtype, buffer=shm.buf)
+    shared[:] = audio
+    del shared
+    return shm, {'shm': shm.name, 'shape': audio.shape, 'dtype': str(audio.dtype)}
+
+
+def _detect_speakers_job(audio_ref):
+    """Detectar speakers no processo de diarização (caminho ou memória compartilhada)"""
+    if not isinstance(audio_ref, dict):
+        return _worker_transcriber.detect_speakers(audio_ref)
+    from multiprocessing import shared_memory, resource_tracker
+    import numpy as np
+    shm = shared_memory.SharedMemory(name=audio_ref['shm'])
+    # Quem cria o segmento (processo principal) é quem remove
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    try:
+        audio = np.ndarray(audio_ref['shape'], dtype=audio_ref['dtype'], buffer=shm.buf)
+        result = _worker_transcriber.detect_speakers(audio)
+        del audio
+        return result
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            pass
+
+
+def _transcribe_chunk(model_name, chunk, options, mode='default', backend='whisper'):
+    """Transcrever um trecho de áudio no processo worker"""
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        model = _worker_transcriber.get_asr_engine(model_name, mode=mode, backend=backend)
+    return model.transcribe(chunk, **options)
+
+
+def _last_error_line(log_path):
+    """Última mensagem de erro registrada no log de um job"""
+    try:
+        with open(log_path, 'r', encoding='utf-8') as f:
+            errors = [line.strip() for line in f if line.lstrip().startswith('❌')]
+        return errors[-1] if errors else "Falha sem mensagem de erro"
+    except OSError:
+        return "Falha sem mensagem de erro"
+
+
+def _run_batch_job(job, transcriber=None, router=None):
+    """Executar um job do batch no processo worker, com log próprio
+
+    Com router (ThreadOutputRouter), o job roda numa thread e só os prints
+    dessa thread vão para o log.
+    """
+    transcriber = transcriber or _worker_transcriber
+    started = time.time()
+    result = {
+        'index': job.get('index'),
+        'source': job['source'],
+        'status': 'error',
+        'files': {},
+        'error': None,
+        'log': job['log_path']
+    }
+    transcriber.use_result_cache = job.get('use_cache', True)
+    transcriber.output_formats = list(job.get('formats') or DEFAULT_EXPORT_FORMATS)
+    transcriber.resume_transcriptions = job.get('resume', True)
+    transcriber.vad_filter = job.get('vad', True)
+    transcriber.keep_streamed_audio = job.get('keep_streamed_audio', False)
+    transcriber.stub_model = job.get('stub_model', False)
+    transcriber.model_name = job.get('model') or 'base'
+    transcriber.asr_backend = job.get('backend') or 'whisper'
+    transcriber.inference_mode = job.get('inference_mode') or 'default'
+    # Sem valor no job vale o orçamento do processo (definido em _init_worker)
+    transcriber.torch_threads = job.get('torch_threads') or transcriber.torch_threads
+    transcriber.torch_interop_threads = job.get('torch_interop_threads') or transcriber.torch_interop_threads
+    if job.get('trace_path') and str(transcriber.tracer.trace_path) != job['trace_path']:
+        transcriber.tracer = StageTracer(job['trace_path'])
+    try:
+        with open(job['log_path'], 'w', encoding='utf-8') as log, \
+                (router.redirect(log) if router else contextlib.redirect_stdout(log)), \
+                (contextlib.nullcontext() if router else contextlib.redirect_stderr(log)), \
+                transcriber.tracer.context(job=job['source']):
+            success = transcriber.process_source(
+                job['source'], job.get('title'), job.get('target_lang', 'pt'),
+                job.get('detect_speakers', False)
+            )
+        result['files'] = transcriber.last_saved_files
+        if success:
+            result['status'] = 'ok'
+        else:
+            result['error'] = _last_error_line(job['log_path'])
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        with open(job['log_path'], 'a', encoding='utf-8') as log:
+            traceback.print_exc(file=log)
+    result['elapsed_seconds'] = round(time.time() - started, 2)
+    return result
+
+
+SERVICE_DB_PATH = Path(__file__).parent / 'transcription_queue.db'
+JOB_OPTIONS = ('title', 'target_lang', 'detect_speakers', 'formats', 'use_cache', 'model', 'backend',
+               'inference_mode')
+
+
+class JobStore:
+    """Fila persistente de jobs do modo serviço (SQLite)
+
+    Jobs e eventos de progresso sobrevivem a reinícios; jobs que estavam em
+    execução quando o serviço caiu voltam para a fila ao reabrir o banco.
+    """
+
+    def __init__(self, db_path):
+        import sqlite3
+        self.db_path = Path(db_path)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        # Acordado a cada job novo, evento ou conclusão (workers e streams de progresso)
+        self.changed = threading.Condition(self._lock)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY, source TEXT NOT NULL, options TEXT NOT NULL,
+                    status TEXT NOT NULL, created_at TEXT, started_at TEXT, finished_at TEXT,
+                    result TEXT, error TEXT
+                );
+                CREATE TABLE IF NOT EXISTS events (
+                    job_id TEXT NOT NULL, seq INTEGER NOT NULL, time REAL NOT NULL, message TEXT NOT NULL,
+                    PRIMARY KEY (job_id, seq)
+                );
+            """)
+            self._conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+
+    @staticmethod
+    def _row_to_job(row):
+        job = dict(row)
+        job['options'] = json.loads(job['options'] or '{}')
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def add(self, source, options=None):
+        job_id = uuid.uuid4().hex[:12]
+        with self.changed, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, source, options, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, source, json.dumps(options or {}, ensure_ascii=False), datetime.now().isoformat())
+            )
+            self.changed.notify_all()
+        return self.get(job_id)
+
+    def claim(self):
+        """Retirar o próximo job da fila (marca como running) ou None"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY rowid LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?",
+                               (datetime.now().isoformat(), row['id']))
+        return self.get(row['id'])
+
+    def finish(self, job_id, status, result=None, error=None):
+        with self.changed, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE id = ?",
+                (status, datetime.now().isoformat(),
+                 json.dumps(result, ensure_ascii=False) if result is not None else None, error, job_id)
+            )
+            self.changed.notify_all()
+
+    def add_event(self, job_id, message):
+        with self.changed, self._conn:
+            self._conn.execute(
+                "INSERT INTO events (job_id, seq, time, message) "
+                "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ? FROM events WHERE job_id = ?",
+                (job_id, time.time(), message, job_id)
+            )
+            self.changed.notify_all()
+
+    def events(self, job_id, after=0):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, time, message FROM events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            last = self._conn.execute(
+                "SELECT seq, message FROM events WHERE job_id = ? ORDER BY seq DESC LIMIT 1", (job_id,)
+            ).fetchone()
+        job = self._row_to_job(row)
+        job['events'] = last['seq'] if last else 0
+        job['progress'] = last['message'] if last else None
+        return job
+
+    def list(self, limit=100):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY rowid DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def wait(self, timeout=1.0):
+        """Bloquear até alguma mudança na fila (ou timeout)"""
+        with self.changed:
+            self.changed.wait(timeout)
+
+
+class ThreadOutputRouter(io.TextIOBase):
+    """sys.stdout que envia os prints de cada thread para a saída do seu job"""
+
+    def __init__(self, default):
+        self.default = default
+        self._local = threading.local()
+
+    @property
+    def encoding(self):
+        return getattr(self.default, 'encoding', 'utf-8')
+
+    @contextlib.contextmanager
+    def redirect(self, sink):
+        previous = getattr(self._local, 'sink', None)
+        self._local.sink = sink
+        try:
+            yield sink
+        finally:
+            self._local.sink = previous
+
+    def bind(self, fn):
+        """Envolver fn para rodar em outra thread com a saída da thread atual"""
+        sink = getattr(self._local, 'sink', None)
+
+        def run(*args, **kwargs):
+            with self.redirect(sink):
+                return fn(*args, **kwargs)
+        return run
+
+    def _target(self):
+        return getattr(self._local, 'sink', None) or self.default
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+
+class JobOutput(io.TextIOBase):
+    """Saída de um job: cada linha impressa vira um evento de progresso"""
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+        self.last_error = None
+        self._buffer = ''
+
+    def write(self, text):
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split('\n')
+        for line in lines:
+            self._emit(line)
+        return len(text)
+
+    def _emit(self, line):
+        line = line.rstrip()
+        if not line.strip():
+            return
+        if '❌' in line:
+            self.last_error = line.strip()
+        self.store.add_event(self.job_id, line)
+
+    def close(self):
+        if self._buffer:
+            self._emit(self._buffer)
+            self._buffer = ''
+        super().close()
+
+
+class TranscriptionService:
+    """Serviço residente: jobs da fila persistente executados em transcribers aquecidos
+
+    Cada thread worker mantém o seu próprio EnhancedVideoTranscriber. Com
+    decodificação em lote os workers dividem modelos e agendador; como o Whisper
+    instala hooks no modelo durante a decodificação, todo uso do modelo passa
+    por model_lock. A API HTTP apenas enfileira e consulta.
+    """
+
+    def __init__(self, db_path=SERVICE_DB_PATH, workers=2, stub_model=False, formats=None,
+                 use_cache=True, detect_speakers=False, preload=True, tracer=None,
+                 model_name='base', inference_mode='default', asr_backend='whisper', decode_batch_size=0,
+                 vad_filter=True):
+        self.store = JobStore(db_path)
+        # Sempre ligado no serviço: alimenta o endpoint /metrics (compartilhado pelos workers)
+        self.tracer = tracer or StageTracer(enabled=True)
+        self.workers = max(1, int(workers))
+        self.stub_model = stub_model
+        self.formats = list(formats or DEFAULT_EXPORT_FORMATS)
+        self.use_cache = use_cache
+        self.detect_speakers = detect_speakers
+        self.preload = preload
+        self.model_name = model_name
+        self.inference_mode = inference_mode
+        self.asr_backend = asr_backend
+        self.vad_filter = vad_filter
+        # Com decodificação em lote os workers dividem modelos e agendador,
+        # para que janelas de jobs diferentes entrem no mesmo lote
+        self.decode_batch_size = decode_batch_size
+        self.batch_scheduler = BatchedDecoder(decode_batch_size) if decode_batch_size > 1 else None
+        self.model_registry = ModelRegistry() if self.batch_scheduler else None
+        self.diarization_registry = ModelRegistry() if self.batch_scheduler else None
+        self.router = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def submit(self, payload):
+        """Validar o pedido (JSON da API) e enfileirar o job"""
+        if not isinstance(payload, dict):
+            raise ValueError("corpo deve ser um objeto JSON")
+        source = payload.get('source')
+        if not isinstance(source, str) or not source.strip():
+            raise ValueError("campo 'source' obrigatório (URL ou caminho)")
+        options = {key: payload[key] for key in JOB_OPTIONS if key in payload}
+        if 'formats' in options:
+            formats = options['formats']
+            if isinstance(formats, str):
+                formats = [fmt.strip() for fmt in formats.split(',') if fmt.strip()]
+            invalid = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+            if invalid or not formats:
+                raise ValueError(f"formatos inválidos: {', '.join(invalid) or 'nenhum'}")
+            options['formats'] = formats
+        if options.get('inference_mode', 'default') not in INFERENCE_MODES:
+            raise ValueError(f"inference_mode inválido ({', '.join(INFERENCE_MODES)})")
+        if options.get('backend', 'whisper') not in ASR_BACKENDS:
+            raise ValueError(f"backend inválido ({', '.join(ASR_BACKENDS)})")
+        return self.store.add(source.strip(), options)
+
+    def start(self):
+        if not isinstance(sys.stdout, ThreadOutputRouter):
+            sys.stdout = ThreadOutputRouter(sys.stdout)
+        self.router = sys.stdout
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f'job-worker-{index + 1}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        with self.store.changed:
+            self.store.changed.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self.batch_scheduler:
+            self.batch_scheduler.close(timeout)
+
+    def _make_transcriber(self):
+        with self.router.redirect(io.StringIO()):
+            transcriber = EnhancedVideoTranscriber()
+        transcriber.interactive = False
+        transcriber.stub_model = self.stub_model
+        transcriber.tracer = self.tracer
+        transcriber.model_name = self.model_name
+        transcriber.inference_mode = self.inference_mode
+        transcriber.asr_backend = self.asr_backend
+        transcriber.vad_filter = self.vad_filter
+        if self.batch_scheduler:
+            transcriber.decode_batch_size = self.decode_batch_size
+            transcriber.batch_scheduler = self.batch_scheduler
+            transcriber.model_registry = self.model_registry
+            transcriber.diarization_registry = self.diarization_registry
+        # A concorrência vem das threads do serviço (sem pools aninhados por job)
+        transcriber.chunk_workers = 1
+        transcriber.parallel_diarization = False
+        # O job só termina depois que todos os formatos estiverem no disco
+        transcriber.background_slow_exports = False
+        return transcriber
+
+    def _worker_loop(self):
+        transcriber = self._make_transcriber()
+        if self.preload:
+            try:
+                with self.router.redirect(io.StringIO()):
+                    transcriber.get_asr_engine()
+            except Exception as e:
+                print(f"⚠️ Modelo não pré-carregado: {e}")
+        while not self._stop.is_set():
+            job = self.store.claim()
+            if job is None:
+                self.store.wait(timeout=1.0)
+                continue
+            self._run_job(transcriber, job)
+
+    def _run_job(self, transcriber, job):
+        options = job['options']
+        started = time.time()
+        print(f"▶️ Job {job['id']}: {job['source']}")
+        transcriber.last_saved_files = {}
+        transcriber.use_result_cache = options.get('use_cache', self.use_cache)
+        transcriber.model_name = options.get('model') or self.model_name
+        transcriber.inference_mode = options.get('inference_mode') or self.inference_mode
+        transcriber.asr_backend = options.get('backend') or self.asr_backend
+        transcriber.output_formats = list(options.get('formats') or self.formats)
+        output = JobOutput(self.store, job['id'])
+        status, result, error = 'error', None, None
+        try:
+            with self.router.redirect(output), self.tracer.context(job=job['id']):
+                success = transcriber.process_source(
+                    job['source'], options.get('title'), options.get('target_lang', 'pt'),
+                    options.get('detect_speakers', self.detect_speakers)
+                )
+            result = {'files': transcriber.last_saved_files, 'elapsed_seconds': round(time.time() - started, 2)}
+            if success:
+                status = 'done'
+            else:
+                error = output.last_error or "falha no processamento"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            output.write(traceback.format_exc())
+        finally:
+            output.close()
+        self.store.finish(job['id'], status, result, error)
+        print(f"{'✅' if status == 'done' else '❌'} Job {job['id']}: {status} ({time.time() - started:.1f}s)")
+
+    def serve(self, host='127.0.0.1', port=8765):
+        """Iniciar workers e a API HTTP (bloqueia até Ctrl+C)"""
+        from http.server import ThreadingHTTPServer
+        server = ThreadingHTTPServer((host, port), make_service_handler(self))
+        server.daemon_threads = True
+        self.start()
+        counts = self.store.counts()
+        print(f"🛰️ Serviço em http://{host}:{server.server_address[1]} "
+              f"({self.workers} worker(s), {counts.get('queued', 0)} job(s) na fila)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Encerrando serviço...")
+        finally:
+            server.server_close()
+            self.stop()
+        return server
+
+
+def make_service_handler(service):
+    """Handler HTTP da API do serviço
+
+    POST /jobs                 {"source": ..., "title", "target_lang", "detect_speakers", "formats", "use_cache"}
+    GET  /jobs                 últimos jobs
+    GET  /jobs/<id>            estado, último progresso, arquivos gerados
+    GET  /jobs/<id>/events     progresso em stream (NDJSON) até o job terminar; ?after=N retoma
+    GET  /metrics              totais por etapa (formato texto do Prometheus)
+    GET  /health
+    """
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import urlsplit, parse_qs
+
+    class ServiceHandler(BaseHTTPRequestHandler):
+        server_version = 'VideoTranscriber/1.0'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, data, headers=None):
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            segments = [part for part in parts.path.split('/') if part]
+            if segments == ['health']:
+                return self._send_json(200, {'status': 'ok', 'workers': service.workers, 'jobs': service.store.counts()})
+            if segments == ['jobs']:
+                return self._send_json(200, {'jobs': service.store.list()})
+            if segments == ['metrics']:
+                body = service.tracer.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if len(segments) in (2, 3) and segments[0] == 'jobs':
+                job = service.store.get(segments[1])
+                if job is None:
+                    return self._send_json(404, {'error': 'job não encontrado'})
+                if len(segments) == 2:
+                    return self._send_json(200, job)
+                if segments[2] == 'events':
+                    try:
+                        after = int(parse_qs(parts.query).get('after', ['0'])[0])
+                    except ValueError:
+                        after = 0
+                    return self._stream_events(job['id'], after)
+            self._send_json(404, {'error': 'rota não encontrada'})
+
+        def do_POST(self):
+            if urlsplit(self.path).path.rstrip('/') != '/jobs':
+                return self._send_json(404, {'error': 'rota não encontrada'})
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                job = service.submit(json.loads(self.rfile.read(length) or b'{}'))
+            except ValueError as e:
+                return self._send_json(400, {'error': str(e)})
+            self._send_json(202, job, {'Location': f"/jobs/{job['id']}"})
+
+        def _stream_events(self, job_id, after):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            try:
+                while True:
+                    events = service.store.events(job_id, after)
+                    for event in events:
+                        self.wfile.write((json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8'))
+                        after = event['seq']
+                    self.wfile.flush()
+                    job = service.store.get(job_id)
+                    if job['status'] in ('done', 'error') and not events:
+                        end = {'status': job['status'], 'error': job['error'], 'result': job['result']}
+                        self.wfile.write((json.dumps(end, ensure_ascii=False) + '\n').encode('utf-8'))
+                        break
+                    if not events:
+                        service.store.wait(timeout=1.0)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return ServiceHandler
+
+
+def parse_args(argv=None):
+    """Argumentos de linha de comando (sem argumentos abre o menu interativo)"""
+    parser = argparse.ArgumentParser(description="Video Transcriber - versão avançada")
+    parser.add_argument('--batch', nargs='+', metavar='FONTE',
+                        help="URLs, arquivos, pastas, globs ou manifestos (.txt/.json/.jsonl) para processar sem interação")
+    parser.add_argument('--workers', type=int, default=2,
+                        help="Jobs executando ao mesmo tempo (processos do batch / threads do serviço)")
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help="Máximo de jobs enviados ao pool de uma vez (padrão: 2x workers)")
+    parser.add_argument('--speakers', action='store_true', help="Ativar detecção de speakers")
+    parser.add_argument('--report', default=None, help="Caminho do relatório JSON do batch")
+    parser.add_argument('--no-cache', action='store_true', help="Não usar o cache de resultados em disco")
+    parser.add_argument('--install-deps', action='store_true', help="Instalar via pip as dependências ausentes")
+    parser.add_argument('--formats', default=','.join(DEFAULT_EXPORT_FORMATS),
+                        help=f"Formatos de saída separados por vírgula ({', '.join(EXPORT_FORMATS)})")
+    parser.add_argument('--serve', action='store_true',
+                        help="Modo serviço: API HTTP local com fila persistente e modelos aquecidos")
+    parser.add_argument('--host', default='127.0.0.1', help="Endereço do modo serviço")
+    parser.add_argument('--port', type=int, default=8765, help="Porta do modo serviço")
+    parser.add_argument('--queue-db', default=str(SERVICE_DB_PATH), help="Banco SQLite da fila de jobs")
+    parser.add_argument('--trace', default=None, metavar='ARQUIVO.jsonl',
+                        help="Gravar tempo/CPU/memória/bytes de cada etapa em JSON lines")
+    parser.add_argument('--metrics', default=None, metavar='ARQUIVO.prom',
+                        help="Manter totais por etapa neste arquivo no formato do Prometheus")
+    parser.add_argument('--resume', action='store_true',
+                        help="Retomar transcrições longas interrompidas (checkpoints)")
+    parser.add_argument('--no-resume', action='store_true',
+                        help="Ignorar checkpoints existentes e transcrever do início")
+    parser.add_argument('--model', default='base',
+                        help="Modelo Whisper (tiny, base, small, medium, large...; por job nos manifestos/serviço)")
+    parser.add_argument('--backend', choices=[name for name in ASR_BACKENDS if name != 'stub'], default='whisper',
+                        help="Motor de transcrição: whisper (PyTorch) ou faster-whisper (CTranslate2, int8 em CPU)")
+    parser.add_argument('--inference-mode', choices=INFERENCE_MODES, default='default',
+                        help="default (fp16 em GPU / fp32 em CPU) ou int8 (Linear quantizado, só CPU)")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="Threads intra-op do torch (cpu_threads no faster-whisper)")
+    parser.add_argument('--interop-threads', type=int, default=None, help="Threads inter-op do torch")
+    parser.add_argument('--decode-batch', type=int, default=0, metavar='N',
+                        help="Decodificar janelas de 30s de vários jobs juntas, em lotes de N (motor whisper)")
+    parser.add_argument('--no-vad', action='store_true',
+                        help="Enviar o áudio inteiro ao modelo (sem remover silêncio)")
+    parser.add_argument('--keep-streamed-audio', action='store_true',
+                        help="Guardar o áudio das URLs (WAV) no índice de downloads para não baixar de novo")
+    parser.add_argument('--stub-model', action='store_true',
+                        help="Usar modelo falso em vez do Whisper (testes locais)")
+    return parser.parse_args(argv)
+
+
+def parse_formats(value):
+    """Converter 'srt,json' em lista de formatos válidos"""
+    formats = [fmt.strip().lower() for fmt in value.split(',') if fmt.strip()]
+    invalid = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+    if invalid:
+        print(f"⚠️ Formatos ignorados: {', '.join(invalid)}")
+    return [fmt for fmt in formats if fmt in EXPORT_FORMATS] or list(DEFAULT_EXPORT_FORMATS)
+
+
+def apply_model_args(app, args):
+    """Motor, modelo, modo de inferência e threads vindos da linha de comando"""
+    app.asr_backend = args.backend
+    app.model_name = args.model
+    app.inference_mode = args.inference_mode
+    app.torch_threads = args.threads
+    app.torch_interop_threads = args.interop_threads
+    app.decode_batch_size = args.decode_batch
+
+
 def main():
     """Função principal"""
+    args = parse_args()
+    formats = parse_formats(args.formats)
+    tracer = StageTracer(args.trace, args.metrics)
+    if args.resume:
+        app = EnhancedVideoTranscriber()
+        app.interactive = False
+        app.tracer = tracer
+        app.stub_model = args.stub_model
+        app.vad_filter = not args.no_vad
+        apply_model_args(app, args)
+        app.output_formats = formats
+        app.use_result_cache = not args.no_cache
+        sys.exit(0 if app.resume_pending_transcriptions(detect_speakers=args.speakers) else 1)
+    if args.serve:
+        if args.install_deps:
+            EnhancedVideoTranscriber().setup_dependencies(install_missing=True)
+        service = TranscriptionService(args.queue_db, workers=args.workers, stub_model=args.stub_model,
+                                       formats=formats, use_cache=not args.no_cache,
+                                       detect_speakers=args.speakers,
+                                       tracer=StageTracer(args.trace, args.metrics, enabled=True),
+                                       model_name=args.model, inference_mode=args.inference_mode,
+                                       asr_backend=args.backend, decode_batch_size=args.decode_batch,
+                                       vad_filter=not args.no_vad)
+        configure_torch_threads(args.threads, args.interop_threads)
+        service.serve(args.host, args.port)
+        return
+    if args.batch:
+        app = EnhancedVideoTranscriber()
+        app.interactive = False
+        app.tracer = tracer
+        app.stub_model = args.stub_model
+        app.resume_transcriptions = not args.no_resume
+        app.vad_filter = not args.no_vad
+        app.keep_streamed_audio = args.keep_streamed_audio
+        apply_model_args(app, args)
+        if args.install_deps:
+            app.setup_dependencies(install_missing=True)
+        results = app.run_batch(args.batch, workers=args.workers, detect_speakers=args.speakers,
+                                max_pending=args.max_pending, report_path=args.report,
+                                use_cache=not args.no_cache, formats=formats)
+        sys.exit(0 if results and all(r['status'] == 'ok' for r in results) else 1)
     try:
         app = EnhancedVideoTranscriber()
-        app.run()
+        app.speakers_enabled = args.speakers
+        app.stub_model = args.stub_model
+        app.tracer = tracer
+        app.resume_transcriptions = not args.no_resume
+        app.vad_filter = not args.no_vad
+        app.keep_streamed_audio = args.keep_streamed_audio
+        apply_model_args(app, args)
+        app.use_result_cache = not args.no_cache
+        app.output_formats = formats
+        app.run(install_deps=args.install_deps)
     except Exception as e:
         print(f"❌ Erro fatal: {e}")
         import traceback